@@ -0,0 +1,104 @@
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from routor.cli import set_log_level
+
+from . import suite
+
+DIRECTORY = Path(__file__).parent
+
+
+@click.group()
+def main() -> None:
+    pass
+
+
+@main.command()
+@click.option('--log-level', type=click.Choice(["INFO", "DEBUG"]), default="INFO")
+@click.option(
+    '--size',
+    type=click.IntRange(min=2),
+    default=100,
+    show_default=True,
+    help="Number of junctions per side of the synthetic map",
+)
+@click.option('--rounds', type=click.IntRange(min=1), default=5, show_default=True)
+@click.option(
+    '--routes',
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="Number of routes per round",
+)
+@click.option('--seed', type=int, default=0, show_default=True)
+@click.option(
+    '--maps',
+    type=click.Path(file_okay=False, path_type=Path),
+    default=DIRECTORY / "maps",
+    help="Directory to store the synthetic maps",
+)
+@click.option(
+    '--output',
+    type=click.Path(file_okay=False, path_type=Path),
+    default=DIRECTORY / "results",
+    help="Directory to store the results",
+)
+def run(
+    size: int,
+    rounds: int,
+    routes: int,
+    seed: int,
+    maps: Path,
+    output: Path,
+    log_level: Optional[str],
+) -> None:
+    """
+    Run all benchmarks on a synthetic map and save the results.
+    """
+    set_log_level(log_level)
+    maps.mkdir(parents=True, exist_ok=True)
+
+    result = suite.run(maps, size, rounds=rounds, routes=routes, seed=seed)
+    for name, timing in result["results"].items():
+        click.echo(
+            f"{name:24} {timing['median'] * 1000:10.3f} ms {timing['ops_per_second']:12.1f} ops/s"
+        )
+    for name, peak in result["memory"].items():
+        click.echo(f"{name:24} {peak / 2 ** 20:10.1f} MiB peak")
+    click.echo(f"Saved results as {suite.save(result, output)}")
+
+
+@main.command()
+@click.option(
+    '--threshold',
+    type=float,
+    default=0.1,
+    show_default=True,
+    help="Relative slowdown reported as regression",
+)
+@click.argument(
+    'baseline', type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument('result', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def compare(baseline: Path, result: Path, threshold: float) -> None:
+    """
+    Compare the median timings of two runs, fails if any benchmark regressed.
+    """
+    rows = suite.compare(
+        json.loads(baseline.read_text()), json.loads(result.read_text()), threshold
+    )
+    for name, before, after, ratio, regression in rows:
+        marker = "REGRESSION" if regression else ""
+        click.echo(
+            f"{name:24} {before * 1000:10.3f} ms {after * 1000:10.3f} ms {ratio:6.2f}x {marker}"
+        )
+    if any(regression for *_, regression in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import gc
+import json
+import logging
+import platform
+import resource
+import statistics
+import subprocess  # nosec
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy
+
+from routor import exceptions, models, weights
+from routor.engine import Engine
+from routor.utils import graph as graph_utils
+
+from .synthetic import save_road_grid
+
+logger = logging.getLogger()
+
+Result = Dict[str, Any]
+
+
+def measure(func: Callable[[], Any], rounds: int, items: int = 1) -> Result:
+    """
+    Call `func` once to warm up and `rounds` more times, return the timings of these
+    rounds in seconds and the throughput (`items` per round) based on the median.
+    """
+    func()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    median = statistics.median(timings)
+    return {
+        "rounds": rounds,
+        "min": timings[0],
+        "median": median,
+        "mean": statistics.mean(timings),
+        "p95": timings[min(len(timings) - 1, int(0.95 * len(timings)))],
+        "ops_per_second": items / median if median > 0 else None,
+    }
+
+
+def peak_memory(func: Callable[[], Any]) -> int:
+    """
+    Return the peak of memory allocated by Python and numpy while calling `func`.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def random_locations(
+    engine: Engine, count: int, seed: int = 0
+) -> List[models.Location]:
+    """
+    Return random locations within the bounds of the map of an engine.
+    """
+    rng = numpy.random.default_rng(seed)
+    latitudes = engine.graph.node_data["y"]
+    longitudes = engine.graph.node_data["x"]
+    return [
+        models.Location(latitude=latitude, longitude=longitude)
+        for latitude, longitude in zip(
+            rng.uniform(latitudes.min(), latitudes.max(), count).tolist(),
+            rng.uniform(longitudes.min(), longitudes.max(), count).tolist(),
+        )
+    ]
+
+
+def random_pairs(
+    engine: Engine, count: int, seed: int = 0
+) -> List[Tuple[models.Location, models.Location]]:
+    """
+    Return random pairs of locations, which are connected by a route.
+    """
+    locations = random_locations(engine, 4 * count, seed)
+    pairs = []
+    for origin, destination in zip(locations[::2], locations[1::2]):
+        try:
+            engine.route(origin, destination, weights.length, weights.travel_time)
+        except exceptions.RoutorException:
+            continue
+        pairs.append((origin, destination))
+        if len(pairs) == count:
+            break
+    return pairs
+
+
+def _route_all(
+    engine: Engine,
+    pairs: List[Tuple[models.Location, models.Location]],
+    weight: weights.WeightFunction,
+    **options: Any,
+) -> Callable[[], None]:
+    def _run() -> None:
+        for origin, destination in pairs:
+            engine.route(origin, destination, weight, weights.travel_time, **options)
+
+    return _run
+
+
+def _api_route(
+    engine: Engine,
+    map_path: Path,
+    pairs: List[Tuple[models.Location, models.Location]],
+    geometry: str,
+) -> Callable[[], None]:
+    from fastapi.testclient import TestClient
+
+    from routor.api import config
+    from routor.api.main import app, get_engine, get_settings
+
+    app.dependency_overrides[get_settings] = lambda: config.Settings(map_path=map_path)
+    app.dependency_overrides[get_engine] = lambda: engine
+    client = TestClient(app)
+
+    def _run() -> None:
+        for origin, destination in pairs:
+            response = client.get(
+                "/route",
+                json={
+                    "origin": origin.dict(),
+                    "destination": destination.dict(),
+                    "weight": "travel_time",
+                    "geometry": geometry,
+                },
+            )
+            response.raise_for_status()
+
+    return _run
+
+
+def run(
+    directory: Path,
+    size: int,
+    rounds: int = 5,
+    routes: int = 20,
+    matrix_size: int = 20,
+    seed: int = 0,
+) -> Result:
+    """
+    Run all benchmarks on a synthetic map of `size` x `size` junctions.
+
+    Maps are created in `directory` and reused by later runs.
+    """
+    map_path = save_road_grid(directory, size, size, seed)
+    graphml_path = map_path.with_suffix(".graphml")
+    results: Dict[str, Result] = {}
+
+    logger.info("Benchmarking map loading")
+    results["load_graphml"] = measure(lambda: Engine(graphml_path), rounds)
+    results["load_npz"] = measure(lambda: Engine(map_path), rounds)
+    results["load_npz_mmap"] = measure(lambda: Engine(map_path, mmap=True), rounds)
+    memory = {
+        "load_graphml": peak_memory(lambda: graph_utils.load_map(graphml_path)),
+        "load_npz": peak_memory(lambda: Engine(map_path)),
+        "load_npz_mmap": peak_memory(lambda: Engine(map_path, mmap=True)),
+    }
+
+    engine = Engine(map_path)
+    locations = random_locations(engine, 1000, seed)
+    logger.info("Benchmarking snapping")
+    results["snap_single"] = measure(
+        lambda: engine.get_closest_node(locations[0]), rounds
+    )
+    results["snap_many"] = measure(
+        lambda: engine.get_closest_nodes(locations), rounds, items=len(locations)
+    )
+
+    pairs = random_pairs(engine, routes, seed)
+    logger.info(f"Benchmarking {len(pairs)} routes")
+    for name, weight in (
+        ("length", weights.length),
+        ("travel_time", weights.travel_time),
+    ):
+        results[f"route_{name}"] = measure(
+            _route_all(engine, pairs, weight), rounds, items=len(pairs)
+        )
+    results["route_bidirectional"] = measure(
+        _route_all(engine, pairs, weights.travel_time, bidirectional=True),
+        rounds,
+        items=len(pairs),
+    )
+    results["route_scalar"] = measure(
+        _route_all(engine, pairs, lambda prev_edge, edge: edge.travel_time),
+        rounds,
+        items=len(pairs),
+    )
+    results["route_batch"] = measure(
+        lambda: list(
+            engine.route_batch(pairs, weights.travel_time, weights.travel_time)
+        ),
+        rounds,
+        items=len(pairs),
+    )
+
+    origins = locations[:matrix_size]
+    destinations = locations[matrix_size : 2 * matrix_size]
+    results["matrix"] = measure(
+        lambda: engine.matrix(
+            origins, destinations, weights.travel_time, weights.travel_time
+        ),
+        rounds,
+        items=len(origins) * len(destinations),
+    )
+
+    logger.info("Benchmarking the API")
+    from routor.api.main import app
+
+    try:
+        for geometry in ("locations", "polyline"):
+            results[f"api_route_{geometry}"] = measure(
+                _api_route(engine, map_path, pairs, geometry), rounds, items=len(pairs)
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+    return {
+        "metadata": metadata(size, rounds, seed, engine),
+        "results": results,
+        "memory": memory,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        output = subprocess.run(  # nosec
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.decode().strip()
+
+
+def metadata(size: int, rounds: int, seed: int, engine: Engine) -> Result:
+    """
+    Return information about the run to compare results across versions.
+    """
+    return {
+        "revision": _git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": size,
+        "rounds": rounds,
+        "seed": seed,
+        "nodes": engine.graph.node_count,
+        "edges": engine.graph.edge_count,
+        # kilobytes on Linux
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def save(result: Result, directory: Path) -> Path:
+    """
+    Save the result of a run as JSON file named after its revision and time.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    meta = result["metadata"]
+    timestamp = meta["timestamp"][:19].replace(":", "")
+    path = (
+        directory / f"{timestamp}-{meta['revision'] or 'unknown'}-{meta['size']}.json"
+    )
+    path.write_text(json.dumps(result, indent=2))
+    return path
+
+
+def compare(
+    baseline: Result, result: Result, threshold: float = 0.1
+) -> List[Tuple[str, float, float, float, bool]]:
+    """
+    Compare the median timings of two runs.
+
+    Returns the name, both medians, their ratio and whether it is a regression
+    (slower by more than `threshold`) for each benchmark of both runs.
+    """
+    rows = []
+    for name, timing in result["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before, after = baseline["results"][name]["median"], timing["median"]
+        ratio = after / before if before else float("inf")
+        rows.append((name, before, after, ratio, ratio > 1 + threshold))
+    return rows
@@ -0,0 +1,155 @@
+from pathlib import Path
+from typing import Tuple
+
+import networkx
+import numpy
+
+from routor.spatial import EARTH_RADIUS
+from routor.utils import graph as graph_utils
+
+# south west corner of synthetic maps (Bristol)
+ORIGIN = (51.44, -2.62)
+# distance between neighbouring junctions in meters
+SPACING = 100.0
+# every n-th street is an arterial road
+ARTERIAL_EVERY = 10
+SPEEDS_KPH = {"primary": 50.0, "residential": 30.0}
+
+
+def _haversine(
+    lat1: numpy.ndarray, lon1: numpy.ndarray, lat2: numpy.ndarray, lon2: numpy.ndarray
+) -> numpy.ndarray:
+    lat1, lon1, lat2, lon2 = map(numpy.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        numpy.sin((lat2 - lat1) / 2) ** 2
+        + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(a))
+
+
+def _bearing(
+    lat1: numpy.ndarray, lon1: numpy.ndarray, lat2: numpy.ndarray, lon2: numpy.ndarray
+) -> numpy.ndarray:
+    lat1, lon1, lat2, lon2 = map(numpy.radians, (lat1, lon1, lat2, lon2))
+    y = numpy.sin(lon2 - lon1) * numpy.cos(lat2)
+    x = numpy.cos(lat1) * numpy.sin(lat2) - numpy.sin(lat1) * numpy.cos(
+        lat2
+    ) * numpy.cos(lon2 - lon1)
+    return (numpy.degrees(numpy.arctan2(y, x)) + 360) % 360
+
+
+def road_grid(rows: int, columns: int, seed: int = 0) -> networkx.MultiDiGraph:
+    """
+    Return a road-like grid with the attributes of a map downloaded by osmnx.
+
+    Junctions are jittered, about 5% of the streets are missing and 15% of the
+    residential streets are one-way. Every tenth street is a faster arterial road.
+    The same arguments always result in the same map.
+    """
+    rng = numpy.random.default_rng(seed)
+    meters_per_degree = numpy.radians(1) * EARTH_RADIUS
+    row_index, column_index = numpy.divmod(numpy.arange(rows * columns), columns)
+    jitter = rng.uniform(-0.2, 0.2, (2, rows * columns)) * SPACING
+    latitudes = ORIGIN[0] + (row_index * SPACING + jitter[0]) / meters_per_degree
+    longitudes = ORIGIN[1] + (column_index * SPACING + jitter[1]) / (
+        meters_per_degree * numpy.cos(numpy.radians(ORIGIN[0]))
+    )
+
+    # streets between horizontal and vertical neighbours
+    nodes = numpy.arange(rows * columns).reshape(rows, columns)
+    starts = numpy.concatenate([nodes[:, :-1].ravel(), nodes[:-1, :].ravel()])
+    ends = numpy.concatenate([nodes[:, 1:].ravel(), nodes[1:, :].ravel()])
+    arterial = numpy.concatenate(
+        [
+            (row_index.reshape(rows, columns)[:, :-1] % ARTERIAL_EVERY == 0).ravel(),
+            (column_index.reshape(rows, columns)[:-1, :] % ARTERIAL_EVERY == 0).ravel(),
+        ]
+    )
+    keep = arterial | (rng.random(len(starts)) > 0.05)
+    starts, ends, arterial = starts[keep], ends[keep], arterial[keep]
+    oneway = ~arterial & (rng.random(len(starts)) < 0.15)
+
+    graph = networkx.MultiDiGraph(crs="epsg:4326", simplified=True)
+    for node in range(rows * columns):
+        graph.add_node(
+            node + 1,
+            osmid=node + 1,
+            x=float(longitudes[node]),
+            y=float(latitudes[node]),
+            street_count=0,
+        )
+
+    osm_id = 0
+    for start, end, is_arterial, is_oneway in zip(
+        starts.tolist(), ends.tolist(), arterial.tolist(), oneway.tolist()
+    ):
+        osm_id += 1
+        highway = "primary" if is_arterial else "residential"
+        directions = [(start, end)] if is_oneway else [(start, end), (end, start)]
+        for source, target in directions:
+            graph.add_edge(
+                source + 1,
+                target + 1,
+                osmid=osm_id,
+                highway=highway,
+                oneway=is_oneway,
+                speed_kph=SPEEDS_KPH[highway],
+            )
+    _add_geometry_attributes(graph)
+    return graph
+
+
+def _add_geometry_attributes(graph: networkx.MultiDiGraph) -> None:
+    """
+    Add length, bearing and travel time of all edges and the street count of
+    all nodes.
+    """
+    edges = list(graph.edges(keys=True, data=True))
+    x = networkx.get_node_attributes(graph, "x")
+    y = networkx.get_node_attributes(graph, "y")
+    lat1 = numpy.array([y[start] for start, _, _, _ in edges])
+    lon1 = numpy.array([x[start] for start, _, _, _ in edges])
+    lat2 = numpy.array([y[end] for _, end, _, _ in edges])
+    lon2 = numpy.array([x[end] for _, end, _, _ in edges])
+    lengths = _haversine(lat1, lon1, lat2, lon2).round(3)
+    bearings = _bearing(lat1, lon1, lat2, lon2).round(1)
+
+    for (_, _, _, data), length, bearing in zip(
+        edges, lengths.tolist(), bearings.tolist()
+    ):
+        data["length"] = length
+        data["bearing"] = bearing
+        data["travel_time"] = round(length / (data["speed_kph"] / 3.6), 1)
+
+    for node in graph.nodes:
+        graph.nodes[node]["street_count"] = len(
+            set(graph.successors(node)) | set(graph.predecessors(node))
+        )
+
+
+def bounds(graph: networkx.MultiDiGraph) -> Tuple[float, float, float, float]:
+    """
+    Return south, west, north and east bounds of a graph.
+    """
+    latitudes = list(networkx.get_node_attributes(graph, "y").values())
+    longitudes = list(networkx.get_node_attributes(graph, "x").values())
+    return min(latitudes), min(longitudes), max(latitudes), max(longitudes)
+
+
+def save_road_grid(
+    directory: Path, rows: int, columns: int, seed: int = 0, graphml: bool = True
+) -> Path:
+    """
+    Save a synthetic map as compiled map (and .graphml) and return the path of
+    the compiled map. Existing maps are reused.
+    """
+    path = directory / f"grid-{rows}x{columns}-{seed}.npz"
+    graphml_path = path.with_suffix(".graphml")
+    if path.exists() and (graphml_path.exists() or not graphml):
+        return path
+
+    graph = road_grid(rows, columns, seed)
+    graph_utils.save_map(graph, path)
+    if graphml:
+        graph_utils.save_map(graph, graphml_path)
+    return path
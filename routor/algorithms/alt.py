@@ -0,0 +1,167 @@
+import json
+import logging
+from heapq import heappop, heappush
+from math import inf
+from pathlib import Path
+from typing import Dict, List
+
+import numpy
+
+from .. import exceptions
+from ..compiled import CompiledGraph, read_npz
+from ..utils.debug import timeit
+from .astar import Heuristic
+from .ch import fingerprint
+
+logger = logging.getLogger()
+
+# increase whenever the file format changes in an incompatible way
+FORMAT_VERSION = 1
+
+# number of landmarks selected by default
+LANDMARK_COUNT = 16
+
+
+def landmarks_path(map_path: Path, weight_name: str) -> Path:
+    """
+    Return the path of the landmarks for a map and weight function.
+    """
+    return map_path.parent / f"{map_path.stem}.alt.{weight_name}.npz"
+
+
+def _dijkstra(
+    offsets: numpy.ndarray, neighbors: numpy.ndarray, costs: numpy.ndarray, source: int
+) -> numpy.ndarray:
+    """
+    Return the costs from `source` to all nodes (`inf` if unreachable).
+    """
+    offsets_list = offsets.tolist()
+    neighbors_list = neighbors.tolist()
+    costs_list = costs.tolist()
+
+    distances = [inf] * (len(offsets_list) - 1)
+    distances[source] = 0.0
+    queue = [(0.0, source)]
+    while queue:
+        dist, node = heappop(queue)
+        if dist > distances[node]:
+            continue
+        for edge in range(offsets_list[node], offsets_list[node + 1]):
+            neighbor = neighbors_list[edge]
+            ncost = dist + costs_list[edge]
+            if ncost < distances[neighbor]:
+                distances[neighbor] = ncost
+                heappush(queue, (ncost, neighbor))
+    return numpy.array(distances, dtype=numpy.float64)
+
+
+class Landmarks:
+    """
+    Precalculated costs from and to landmarks for the ALT heuristic.
+
+    `from_landmarks[node, i]` are the costs from landmark `i` to the node,
+    `to_landmarks[node, i]` the costs from the node to landmark `i` (`inf` if
+    unreachable). Due to the triangle inequality, the costs from a node to a
+    target are at least `from_landmarks[target] - from_landmarks[node]` and
+    `to_landmarks[node] - to_landmarks[target]`.
+    """
+
+    def __init__(self, arrays: Dict[str, numpy.ndarray], fingerprint: str) -> None:
+        self.landmarks = arrays["landmarks"]
+        self.from_landmarks = arrays["from_landmarks"]
+        self.to_landmarks = arrays["to_landmarks"]
+        self.fingerprint = fingerprint
+
+    @classmethod
+    @timeit
+    def build(
+        cls, graph: CompiledGraph, costs: numpy.ndarray, count: int = LANDMARK_COUNT
+    ) -> "Landmarks":
+        """
+        Select landmarks far away from each other and calculate their costs.
+
+        The first landmark is the node farthest from the first node, every further
+        one the node farthest from all landmarks selected so far (in any direction).
+        """
+        logger.info(f"Selecting {count} landmarks for {graph.node_count} nodes")
+        reverse_offsets, order = graph.reverse_adjacency()
+        reverse_neighbors, reverse_costs = graph.sources[order], costs[order]
+
+        landmarks: List[int] = []
+        from_landmarks: List[numpy.ndarray] = []
+        to_landmarks: List[numpy.ndarray] = []
+        # costs from or to the closest landmark (from the first node before one is
+        # selected), nodes not connected to any landmark are the farthest
+        closest = _dijkstra(graph.offsets, graph.targets, costs, 0)
+        while len(landmarks) < min(count, graph.node_count):
+            candidates = closest.copy()
+            candidates[landmarks] = -1.0
+            landmark = int(numpy.argmax(candidates))
+
+            from_landmark = _dijkstra(graph.offsets, graph.targets, costs, landmark)
+            to_landmark = _dijkstra(
+                reverse_offsets, reverse_neighbors, reverse_costs, landmark
+            )
+            distances = numpy.fmin(from_landmark, to_landmark)
+            closest = numpy.minimum(closest, distances) if landmarks else distances
+            landmarks.append(landmark)
+            from_landmarks.append(from_landmark)
+            to_landmarks.append(to_landmark)
+
+        arrays = {
+            "landmarks": numpy.array(landmarks, dtype=numpy.int64),
+            "from_landmarks": numpy.column_stack(from_landmarks),
+            "to_landmarks": numpy.column_stack(to_landmarks),
+        }
+        return cls(arrays, fingerprint(graph, costs))
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = False) -> "Landmarks":
+        """
+        Load landmarks from a `.npz` file.
+        """
+        arrays = read_npz(path, mmap=mmap)
+        version = int(arrays.pop("format_version"))
+        if version != FORMAT_VERSION:
+            raise exceptions.GraphException(
+                f"Unsupported landmarks format version {version} (expected {FORMAT_VERSION})."
+            )
+        metadata = json.loads(str(arrays.pop("metadata")))
+        return cls(arrays, metadata["fingerprint"])
+
+    def save(self, path: Path) -> None:
+        """
+        Save the landmarks as uncompressed `.npz` file.
+        """
+        with open(path, "wb") as file:
+            numpy.savez(
+                file,
+                format_version=numpy.array(FORMAT_VERSION),
+                metadata=numpy.array(json.dumps({"fingerprint": self.fingerprint})),
+                landmarks=self.landmarks,
+                from_landmarks=self.from_landmarks,
+                to_landmarks=self.to_landmarks,
+            )
+
+    def heuristic(self) -> Heuristic:
+        """
+        Return the ALT heuristic, a lower bound of the costs from a node to a target.
+        """
+        from_landmarks = self.from_landmarks
+        to_landmarks = self.to_landmarks
+        targets: Dict[int, numpy.ndarray] = {}
+
+        def _heuristic(node: int, target: int) -> float:
+            try:
+                target_costs = targets[target]
+            except KeyError:
+                target_costs = targets[target] = numpy.concatenate(
+                    [from_landmarks[target], -to_landmarks[target]]
+                )
+            node_costs = numpy.concatenate([from_landmarks[node], -to_landmarks[node]])
+            with numpy.errstate(invalid="ignore"):
+                # inf - inf (neither reachable) is nan and ignored by fmax
+                bound = numpy.fmax.reduce(target_costs - node_costs, initial=0.0)
+            return float(bound)
+
+        return _heuristic
@@ -0,0 +1,144 @@
+from heapq import heappop, heappush
+from itertools import count
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .. import exceptions
+from ..compiled import CompiledGraph
+from .statistics import SearchStatistics
+
+EdgeWeight = Callable[[Optional[int], int], float]
+Heuristic = Callable[[int, int], float]
+# priority, counter (tie breaker), node, cost to reach, edge used to reach
+QueueItem = Tuple[float, int, int, float, Optional[int]]
+
+
+def _default_heuristic(node: int, target: int) -> float:
+    return 0
+
+
+def _reconstruct_path(
+    graph: CompiledGraph, explored: Dict[int, Optional[int]], via: Optional[int]
+) -> List[int]:
+    path = []
+    edge = via
+    while edge is not None:
+        path.append(edge)
+        edge = explored[int(graph.sources[edge])]
+    path.reverse()
+    return path
+
+
+def astar_path(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    weight: EdgeWeight,
+    heuristic: Optional[Heuristic] = None,
+) -> List[int]:
+    """
+    Return the node indices of the shortest path from `source` to `target`.
+
+    `weight` is called with the index of the previous edge (`None` for the
+    first edge) and the index of the current edge.
+    """
+    _, edges = astar_search(graph, source, target, weight, heuristic)
+    return [source, *(int(graph.targets[edge]) for edge in edges)]
+
+
+def _is_outdated(
+    explored: Dict[int, Optional[int]],
+    enqueued: Dict[int, Tuple[float, float]],
+    node: int,
+    dist: float,
+) -> bool:
+    """
+    Check whether a node has already been explored with lower costs.
+    """
+    if node not in explored:
+        return False
+    # do not override the parent of the starting node
+    if explored[node] is None:
+        return True
+    # skip bad paths that were enqueued before finding a better one
+    return enqueued[node][0] < dist
+
+
+def _relax(
+    graph: CompiledGraph,
+    node: int,
+    dist: float,
+    via: Optional[int],
+    weight: EdgeWeight,
+    heuristic: Heuristic,
+    target: int,
+    queue: List[QueueItem],
+    enqueued: Dict[int, Tuple[float, float]],
+    c: Iterator[int],
+) -> int:
+    """
+    Enqueue all neighbors of a node, which are reached cheaper than before.
+
+    Return the number of relaxed edges.
+    """
+    edges = graph.neighbors(node)
+    for edge in edges:
+        neighbor = int(graph.targets[edge])
+        ncost = dist + weight(via, edge)
+
+        if neighbor in enqueued:
+            qcost, h = enqueued[neighbor]
+            if qcost <= ncost:
+                continue
+        else:
+            h = heuristic(neighbor, target)
+        enqueued[neighbor] = ncost, h
+        heappush(queue, (ncost + h, next(c), neighbor, ncost, edge))
+    return len(edges)
+
+
+def astar_search(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    weight: EdgeWeight,
+    heuristic: Optional[Heuristic] = None,
+    statistics: Optional[SearchStatistics] = None,
+) -> Tuple[float, List[int]]:
+    """
+    Return the costs and edge indices of the shortest path from `source` to `target`.
+
+    The costs are accumulated during the search in the order of the path, see
+    `astar_path` for the arguments.
+    """
+    if heuristic is None:
+        # h=0 - same as Dijkstra's algorithm
+        heuristic = _default_heuristic
+
+    c = count()
+    queue: List[QueueItem] = [(0, next(c), source, 0, None)]
+    # node -> (cost to reach, heuristic to target)
+    enqueued: Dict[int, Tuple[float, float]] = {}
+    # node -> edge used to reach it
+    explored: Dict[int, Optional[int]] = {}
+    relaxed = 0
+
+    while queue:
+        _, __, node, dist, via = heappop(queue)
+
+        if node == target:
+            if statistics is not None:
+                statistics.explored, statistics.relaxed = len(explored) + 1, relaxed
+            return dist, _reconstruct_path(graph, explored, via)
+
+        if _is_outdated(explored, enqueued, node, dist):
+            continue
+        explored[node] = via
+        relaxed += _relax(
+            graph, node, dist, via, weight, heuristic, target, queue, enqueued, c
+        )
+
+    if statistics is not None:
+        statistics.explored, statistics.relaxed = len(explored), relaxed
+    raise exceptions.PathDoesNotExist(
+        f"Node {graph.node_ids[target]} not reachable from {graph.node_ids[source]}"
+    )
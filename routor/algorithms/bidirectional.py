@@ -0,0 +1,129 @@
+from heapq import heappop, heappush
+from math import inf
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy
+
+from .. import exceptions
+from ..compiled import CompiledGraph
+from .statistics import SearchStatistics
+
+# node -> (costs, edge used to reach)
+Distances = Dict[int, Tuple[float, Optional[int]]]
+
+
+def _opposite(direction: str) -> str:
+    return "backward" if direction == "forward" else "forward"
+
+
+def _edges(
+    graph: CompiledGraph,
+    reverse_adjacency: Tuple[numpy.ndarray, numpy.ndarray],
+    direction: str,
+    node: int,
+) -> Tuple[Sequence[int], numpy.ndarray]:
+    """
+    Return the edges leaving a node in a direction and the nodes they lead to
+    (indexed by edge).
+    """
+    if direction == "forward":
+        return graph.neighbors(node), graph.targets
+    reverse_offsets, reverse_edges = reverse_adjacency
+    start, end = reverse_offsets[node], reverse_offsets[node + 1]
+    return reverse_edges[start:end].tolist(), graph.sources
+
+
+def _relax(
+    edges: Sequence[int],
+    ends: numpy.ndarray,
+    costs: numpy.ndarray,
+    dist: float,
+    own: Distances,
+    other: Distances,
+    queue: List[Tuple[float, int]],
+    best: Tuple[float, int],
+) -> Tuple[float, int]:
+    """
+    Enqueue all nodes reached cheaper than before by the edges of a node.
+
+    Return the costs and meeting node of the best path found so far.
+    """
+    for edge in edges:
+        neighbor = int(ends[edge])
+        ncost = dist + costs.item(edge)
+        if ncost < own.get(neighbor, (inf, None))[0]:
+            own[neighbor] = (ncost, edge)
+            heappush(queue, (ncost, neighbor))
+            if neighbor in other and ncost + other[neighbor][0] < best[0]:
+                best = ncost + other[neighbor][0], neighbor
+    return best
+
+
+def bidirectional_dijkstra(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    costs: numpy.ndarray,
+    statistics: Optional[SearchStatistics] = None,
+) -> Tuple[float, List[int]]:
+    """
+    Return the costs and edge indices of the shortest path from `source` to `target`.
+
+    A forward search from the source and a backward search (on the incoming edges)
+    from the target run alternately until they meet, which settles about half the
+    nodes of a single search on long routes. The costs of each edge must not depend
+    on the previous edge.
+    """
+    reverse_adjacency = graph.reverse_adjacency()
+    # direction -> node -> (costs, edge used to reach)
+    distances: Dict[str, Distances] = {
+        "forward": {source: (0.0, None)},
+        "backward": {target: (0.0, None)},
+    }
+    queues = {"forward": [(0.0, source)], "backward": [(0.0, target)]}
+    best, meeting = (0.0, source) if source == target else (inf, -1)
+    explored = relaxed = 0
+
+    while queues["forward"] and queues["backward"]:
+        forward_top, backward_top = queues["forward"][0][0], queues["backward"][0][0]
+        if forward_top + backward_top >= best:
+            break
+        direction = "forward" if forward_top <= backward_top else "backward"
+        dist, node = heappop(queues[direction])
+        own, other = distances[direction], distances[_opposite(direction)]
+        if dist > own[node][0]:
+            continue
+        explored += 1
+
+        edges, ends = _edges(graph, reverse_adjacency, direction, node)
+        relaxed += len(edges)
+        best, meeting = _relax(
+            edges, ends, costs, dist, own, other, queues[direction], (best, meeting)
+        )
+
+    if statistics is not None:
+        statistics.explored, statistics.relaxed = explored, relaxed
+    if meeting == -1:
+        raise exceptions.PathDoesNotExist(
+            f"Node {graph.node_ids[target]} not reachable from {graph.node_ids[source]}"
+        )
+
+    forward = _trace(distances["forward"], meeting, graph.sources)[::-1]
+    backward = _trace(distances["backward"], meeting, graph.targets)
+    return best, forward + backward
+
+
+def _trace(
+    distances: Distances,
+    node: int,
+    ends: numpy.ndarray,
+) -> List[int]:
+    """
+    Return the edges from `node` back to the start of a search.
+    """
+    path = []
+    edge = distances[node][1]
+    while edge is not None:
+        path.append(edge)
+        edge = distances[int(ends[edge])][1]
+    return path
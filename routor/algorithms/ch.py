@@ -0,0 +1,364 @@
+import hashlib
+import json
+import logging
+from heapq import heappop, heappush
+from math import inf
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
+from .. import exceptions
+from ..compiled import CompiledGraph, read_npz
+from ..utils.debug import timeit
+from .statistics import SearchStatistics
+
+logger = logging.getLogger()
+
+# increase whenever the file format changes in an incompatible way
+FORMAT_VERSION = 1
+
+# limits the number of nodes settled during a witness search
+WITNESS_SEARCH_LIMIT = 64
+
+# neighbor -> (costs, contracted node of a shortcut or -1)
+Adjacency = Dict[int, Tuple[float, int]]
+
+
+def fingerprint(graph: CompiledGraph, costs: numpy.ndarray) -> str:
+    """
+    Identify the graph structure and edge costs a hierarchy has been built for.
+    """
+    digest = hashlib.sha1()
+    for array in (graph.offsets, graph.targets, costs):
+        digest.update(numpy.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def hierarchy_path(map_path: Path, weight_name: str) -> Path:
+    """
+    Return the path of the hierarchy for a map and weight function.
+    """
+    return map_path.parent / f"{map_path.stem}.ch.{weight_name}.npz"
+
+
+class _Contraction:
+    """
+    State of the node contraction.
+    """
+
+    def __init__(self, graph: CompiledGraph, costs: numpy.ndarray) -> None:
+        node_count = graph.node_count
+        self.outgoing: List[Adjacency] = [{} for _ in range(node_count)]
+        self.incoming: List[Adjacency] = [{} for _ in range(node_count)]
+        self.deleted_neighbors = [0] * node_count
+
+        for start, end, cost in zip(
+            graph.sources.tolist(), graph.targets.tolist(), costs.tolist()
+        ):
+            if start != end:
+                self.add_edge(start, end, cost, -1)
+
+        # upward edges: node -> [(neighbor, costs, middle)], rank[node] < rank[neighbor]
+        self.up: List[List[Tuple[int, float, int]]] = [[] for _ in range(node_count)]
+        # downward edges, stored at their end: node -> [(neighbor, costs, middle)]
+        # for edges neighbor -> node with rank[neighbor] > rank[node]
+        self.down: List[List[Tuple[int, float, int]]] = [[] for _ in range(node_count)]
+
+    def add_edge(self, start: int, end: int, cost: float, middle: int) -> None:
+        current = self.outgoing[start].get(end)
+        if current is None or cost < current[0]:
+            self.outgoing[start][end] = (cost, middle)
+            self.incoming[end][start] = (cost, middle)
+
+    def _witness_distances(
+        self, source: int, ignore: int, max_cost: float
+    ) -> Dict[int, float]:
+        """
+        Limited local Dijkstra search, which ignores the node being contracted.
+        """
+        distances = {source: 0.0}
+        queue = [(0.0, source)]
+        settled = 0
+        while queue and settled < WITNESS_SEARCH_LIMIT:
+            dist, node = heappop(queue)
+            if dist > max_cost:
+                break
+            if dist > distances[node]:
+                continue
+            settled += 1
+            for neighbor, (cost, _) in self.outgoing[node].items():
+                ncost = dist + cost
+                if neighbor != ignore and ncost < distances.get(neighbor, inf):
+                    distances[neighbor] = ncost
+                    heappush(queue, (ncost, neighbor))
+        return distances
+
+    def shortcuts(self, node: int) -> List[Tuple[int, int, float]]:
+        """
+        Return all shortcuts necessary to contract the node.
+        """
+        outgoing = self.outgoing[node]
+        result = []
+        for start, (start_cost, _) in self.incoming[node].items():
+            max_cost = start_cost + max(
+                (cost for end, (cost, _) in outgoing.items() if end != start),
+                default=-inf,
+            )
+            if max_cost == -inf:
+                continue
+
+            distances = self._witness_distances(start, node, max_cost)
+            for end, (end_cost, _) in outgoing.items():
+                cost = start_cost + end_cost
+                if end != start and distances.get(end, inf) > cost:
+                    result.append((start, end, cost))
+        return result
+
+    def priority(self, node: int) -> int:
+        """
+        Edge difference plus number of contracted neighbors.
+        """
+        removed = len(self.incoming[node]) + len(self.outgoing[node])
+        return len(self.shortcuts(node)) - removed + self.deleted_neighbors[node]
+
+    def contract(self, node: int) -> None:
+        for start, end, cost in self.shortcuts(node):
+            self.add_edge(start, end, cost, node)
+
+        for start, (cost, middle) in self.incoming[node].items():
+            self.down[node].append((start, cost, middle))
+            del self.outgoing[start][node]
+            self.deleted_neighbors[start] += 1
+        for end, (cost, middle) in self.outgoing[node].items():
+            self.up[node].append((end, cost, middle))
+            del self.incoming[end][node]
+            self.deleted_neighbors[end] += 1
+        self.incoming[node] = {}
+        self.outgoing[node] = {}
+
+
+def _to_csr(
+    adjacency: List[List[Tuple[int, float, int]]],
+) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    offsets = numpy.zeros(len(adjacency) + 1, dtype=numpy.int64)
+    offsets[1:] = numpy.cumsum([len(edges) for edges in adjacency])
+    edges = [edge for node_edges in adjacency for edge in node_edges]
+    neighbors = numpy.array([edge[0] for edge in edges], dtype=numpy.int64)
+    costs = numpy.array([edge[1] for edge in edges], dtype=numpy.float64)
+    middles = numpy.array([edge[2] for edge in edges], dtype=numpy.int64)
+    return offsets, neighbors, costs, middles
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy of a compiled graph for fixed edge costs.
+
+    Each node has a rank. `up_*` describe edges from a node to higher ranked
+    nodes, `down_*` edges from higher ranked nodes, stored at their (lower
+    ranked) end. Both are CSR arrays and include shortcuts, which skip the
+    node given in `*_middles` (`-1` for original edges).
+    """
+
+    def __init__(self, arrays: Dict[str, numpy.ndarray], fingerprint: str) -> None:
+        self.rank = arrays["rank"]
+        self.up_offsets = arrays["up_offsets"]
+        self.up_neighbors = arrays["up_neighbors"]
+        self.up_costs = arrays["up_costs"]
+        self.up_middles = arrays["up_middles"]
+        self.down_offsets = arrays["down_offsets"]
+        self.down_neighbors = arrays["down_neighbors"]
+        self.down_costs = arrays["down_costs"]
+        self.down_middles = arrays["down_middles"]
+        self.fingerprint = fingerprint
+
+    @classmethod
+    @timeit
+    def build(
+        cls, graph: CompiledGraph, costs: numpy.ndarray
+    ) -> "ContractionHierarchy":
+        """
+        Contract all nodes of the graph, least important nodes first.
+        """
+        logger.info(f"Contracting {graph.node_count} nodes")
+        contraction = _Contraction(graph, costs)
+        rank = numpy.zeros(graph.node_count, dtype=numpy.int64)
+
+        queue = [(contraction.priority(node), node) for node in range(graph.node_count)]
+        queue.sort()
+        next_rank = 0
+        while queue:
+            _, node = heappop(queue)
+            # lazy update: priorities of the remaining nodes might be outdated
+            priority = contraction.priority(node)
+            if queue and priority > queue[0][0]:
+                heappush(queue, (priority, node))
+                continue
+
+            contraction.contract(node)
+            rank[node] = next_rank
+            next_rank += 1
+
+        arrays = {"rank": rank}
+        for direction in ("up", "down"):
+            offsets, neighbors, edge_costs, middles = _to_csr(
+                getattr(contraction, direction)
+            )
+            arrays[f"{direction}_offsets"] = offsets
+            arrays[f"{direction}_neighbors"] = neighbors
+            arrays[f"{direction}_costs"] = edge_costs
+            arrays[f"{direction}_middles"] = middles
+        return cls(arrays, fingerprint(graph, costs))
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = False) -> "ContractionHierarchy":
+        """
+        Load a hierarchy from a `.npz` file.
+        """
+        arrays = read_npz(path, mmap=mmap)
+        version = int(arrays.pop("format_version"))
+        if version != FORMAT_VERSION:
+            raise exceptions.GraphException(
+                f"Unsupported hierarchy format version {version} (expected {FORMAT_VERSION})."
+            )
+        metadata = json.loads(str(arrays.pop("metadata")))
+        return cls(arrays, metadata["fingerprint"])
+
+    def save(self, path: Path) -> None:
+        """
+        Save the hierarchy as uncompressed `.npz` file.
+        """
+        arrays = {
+            "format_version": numpy.array(FORMAT_VERSION),
+            "metadata": numpy.array(json.dumps({"fingerprint": self.fingerprint})),
+        }
+        for key in (
+            "rank",
+            "up_offsets",
+            "up_neighbors",
+            "up_costs",
+            "up_middles",
+            "down_offsets",
+            "down_neighbors",
+            "down_costs",
+            "down_middles",
+        ):
+            arrays[key] = getattr(self, key)
+
+        with open(path, "wb") as file:
+            numpy.savez(file, **arrays)
+
+    def _edges(
+        self, direction: str, node: int
+    ) -> Tuple[List[int], List[float], List[int]]:
+        offsets = getattr(self, f"{direction}_offsets")
+        start, end = offsets[node], offsets[node + 1]
+        return (
+            getattr(self, f"{direction}_neighbors")[start:end].tolist(),
+            getattr(self, f"{direction}_costs")[start:end].tolist(),
+            getattr(self, f"{direction}_middles")[start:end].tolist(),
+        )
+
+    def _middle(self, start: int, end: int) -> int:
+        """
+        Return the contracted node of the edge from `start` to `end`.
+        """
+        if self.rank[start] < self.rank[end]:
+            neighbors, _, middles = self._edges("up", start)
+            other = end
+        else:
+            neighbors, _, middles = self._edges("down", end)
+            other = start
+        return middles[neighbors.index(other)]
+
+    def _unpack(self, path: List[int]) -> List[int]:
+        """
+        Replace all shortcuts of a path with the original edges.
+        """
+        result = [path[0]]
+        stack = list(zip(path[1:], path))[::-1]
+        while stack:
+            end, start = stack.pop()
+            middle = self._middle(start, end)
+            if middle == -1:
+                result.append(end)
+            else:
+                stack.append((end, middle))
+                stack.append((middle, start))
+        return result
+
+    def _relax(
+        self,
+        direction: str,
+        node: int,
+        dist: float,
+        distances: Dict[int, Tuple[float, Optional[int]]],
+        queue: List[Tuple[float, int]],
+    ) -> int:
+        """
+        Enqueue all neighbors of a node in one direction, which are reached cheaper
+        than before. Return the number of relaxed edges.
+        """
+        neighbors, costs, _ = self._edges(direction, node)
+        for neighbor, cost in zip(neighbors, costs):
+            ncost = dist + cost
+            if ncost < distances.get(neighbor, (inf, None))[0]:
+                distances[neighbor] = (ncost, node)
+                heappush(queue, (ncost, neighbor))
+        return len(neighbors)
+
+    def shortest_path(
+        self,
+        source: int,
+        target: int,
+        statistics: Optional[SearchStatistics] = None,
+    ) -> Tuple[float, List[int]]:
+        """
+        Return costs and node indices of the shortest path using a bidirectional search.
+        """
+        # direction -> node -> (costs, parent)
+        distances: Dict[str, Dict[int, Tuple[float, Optional[int]]]] = {
+            "up": {source: (0.0, None)},
+            "down": {target: (0.0, None)},
+        }
+        queues = {"up": [(0.0, source)], "down": [(0.0, target)]}
+        best, meeting = inf, -1
+        explored = relaxed = 0
+
+        while any(queue and queue[0][0] < best for queue in queues.values()):
+            for direction, queue in queues.items():
+                if not queue or queue[0][0] >= best:
+                    continue
+                dist, node = heappop(queue)
+                own, other = distances[direction], distances[_opposite(direction)]
+                if dist > own[node][0]:
+                    continue
+                explored += 1
+                if node in other and dist + other[node][0] < best:
+                    best, meeting = dist + other[node][0], node
+
+                relaxed += self._relax(direction, node, dist, own, queue)
+
+        if statistics is not None:
+            statistics.explored, statistics.relaxed = explored, relaxed
+        if meeting == -1:
+            raise exceptions.PathDoesNotExist(
+                f"Node {target} not reachable from {source}"
+            )
+
+        forward = _trace(distances["up"], meeting)[::-1]
+        backward = _trace(distances["down"], meeting)[1:]
+        return best, self._unpack(forward + backward)
+
+
+def _opposite(direction: str) -> str:
+    return "down" if direction == "up" else "up"
+
+
+def _trace(distances: Dict[int, Tuple[float, Optional[int]]], node: int) -> List[int]:
+    path = [node]
+    parent = distances[node][1]
+    while parent is not None:
+        path.append(parent)
+        parent = distances[parent][1]
+    return path
@@ -0,0 +1,149 @@
+from heapq import heappop, heappush
+from itertools import count
+from typing import Callable, Collection, Dict, List, Optional, Tuple
+
+import numpy
+
+from ..compiled import CompiledGraph
+from .astar import EdgeWeight
+from .time_dependent import TimeDependentWeight
+
+# costs to reach the target of an edge from the costs to reach its source, the
+# previous edge (`None` for the first edge) and the edge
+Relax = Callable[[float, Optional[int], int], float]
+
+
+class ShortestPathTree:
+    """
+    Shortest paths from a source to all settled nodes.
+
+    `edges` contains the edge used to reach each settled node (`None` for the
+    source), `order` the nodes in the order they have been settled.
+    """
+
+    def __init__(
+        self,
+        graph: CompiledGraph,
+        costs: Dict[int, float],
+        edges: Dict[int, Optional[int]],
+        order: List[int],
+    ) -> None:
+        self.graph = graph
+        self.costs = costs
+        self.edges = edges
+        self.order = order
+
+    def edge_path(self, node: int) -> List[int]:
+        """
+        Return the edge indices along the path to a settled node.
+        """
+        path = []
+        edge = self.edges[node]
+        while edge is not None:
+            path.append(edge)
+            edge = self.edges[int(self.graph.sources[edge])]
+        path.reverse()
+        return path
+
+    def sums(self, values: numpy.ndarray) -> Dict[int, float]:
+        """
+        Return the sum of the given edge values along the path to each settled node.
+        """
+        values_list = values.tolist()
+        sources = self.graph.sources
+        result: Dict[int, float] = {}
+        # parents are always settled before their children
+        for node in self.order:
+            edge = self.edges[node]
+            if edge is None:
+                result[node] = 0.0
+            else:
+                result[node] = result[int(sources[edge])] + values_list[edge]
+        return result
+
+
+def _dijkstra(
+    graph: CompiledGraph,
+    source: int,
+    relax: Relax,
+    targets: Optional[Collection[int]],
+    max_costs: Optional[float],
+) -> ShortestPathTree:
+    limit = max_costs if max_costs is not None else numpy.inf
+    remaining = set(targets) if targets is not None else None
+
+    c = count()
+    # cost to reach, counter (tie breaker), node, edge used to reach
+    queue: List[Tuple[float, int, int, Optional[int]]] = [(0.0, next(c), source, None)]
+    costs: Dict[int, float] = {}
+    edges: Dict[int, Optional[int]] = {}
+    enqueued: Dict[int, float] = {source: 0.0}
+    order: List[int] = []
+
+    while queue:
+        dist, _, node, via = heappop(queue)
+        if node in costs:
+            continue
+        costs[node] = dist
+        edges[node] = via
+        order.append(node)
+
+        if remaining is not None:
+            remaining.discard(node)
+            if not remaining:
+                break
+
+        for edge in graph.neighbors(node):
+            neighbor = int(graph.targets[edge])
+            if neighbor in costs:
+                continue
+            ncost = relax(dist, via, edge)
+            if ncost <= limit and ncost < enqueued.get(neighbor, numpy.inf):
+                enqueued[neighbor] = ncost
+                heappush(queue, (ncost, next(c), neighbor, edge))
+
+    return ShortestPathTree(graph, costs, edges, order)
+
+
+def shortest_path_tree(
+    graph: CompiledGraph,
+    source: int,
+    weight: EdgeWeight,
+    targets: Optional[Collection[int]] = None,
+    max_costs: Optional[float] = None,
+) -> ShortestPathTree:
+    """
+    Run Dijkstra's algorithm from `source` until all `targets` are settled.
+
+    Without targets, all reachable nodes are settled. With `max_costs`, only
+    nodes reachable within these costs are settled. `weight` is called with
+    the index of the previous edge (`None` for the first edge) and the index of
+    the current edge.
+    """
+    return _dijkstra(
+        graph,
+        source,
+        lambda dist, via, edge: dist + weight(via, edge),
+        targets,
+        max_costs,
+    )
+
+
+def time_dependent_tree(
+    graph: CompiledGraph,
+    source: int,
+    weight: TimeDependentWeight,
+    targets: Optional[Collection[int]] = None,
+    max_costs: Optional[float] = None,
+) -> ShortestPathTree:
+    """
+    Same as `shortest_path_tree` for time-dependent costs, each edge is entered
+    at the costs of reaching its source (see `time_dependent_search`).
+    """
+    return _dijkstra(
+        graph,
+        source,
+        lambda dist, via, edge: dist + weight(edge, dist),
+        targets,
+        max_costs,
+    )
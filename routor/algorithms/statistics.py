@@ -0,0 +1,14 @@
+class SearchStatistics:
+    """
+    Counters of a search, filled by the search algorithms if passed to them.
+
+    `explored` is the number of nodes settled by the search (in all directions),
+    `relaxed` the number of edges scanned from these nodes. The engine counts the
+    calls of scalar weight functions and their time (in seconds).
+    """
+
+    def __init__(self) -> None:
+        self.explored = 0
+        self.relaxed = 0
+        self.weight_calls = 0
+        self.weight_time = 0.0
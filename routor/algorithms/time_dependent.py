@@ -0,0 +1,108 @@
+from heapq import heappop, heappush
+from itertools import count
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .. import exceptions
+from ..compiled import CompiledGraph
+from .astar import Heuristic, _default_heuristic, _reconstruct_path
+from .statistics import SearchStatistics
+
+# edge index, seconds since departure when entering the edge -> costs
+TimeDependentWeight = Callable[[int, float], float]
+# priority, counter (tie breaker), node, arrival
+QueueItem = Tuple[float, int, int, float]
+
+
+def _relax(
+    graph: CompiledGraph,
+    node: int,
+    arrival: float,
+    weight: TimeDependentWeight,
+    heuristic: Heuristic,
+    target: int,
+    settled: Set[int],
+    enqueued: Dict[int, Tuple[float, float]],
+    parents: Dict[int, Optional[int]],
+    queue: List[QueueItem],
+    c: Iterator[int],
+) -> int:
+    """
+    Enqueue all neighbors of a node, which are reached earlier than before.
+
+    Return the number of relaxed edges.
+    """
+    edges = graph.neighbors(node)
+    for edge in edges:
+        neighbor = int(graph.targets[edge])
+        if neighbor in settled:
+            continue
+        narrival = arrival + weight(edge, arrival)
+
+        if neighbor in enqueued:
+            qarrival, h = enqueued[neighbor]
+            if qarrival <= narrival:
+                continue
+        else:
+            h = heuristic(neighbor, target)
+        enqueued[neighbor] = narrival, h
+        parents[neighbor] = edge
+        heappush(queue, (narrival + h, next(c), neighbor, narrival))
+    return len(edges)
+
+
+def time_dependent_search(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    weight: TimeDependentWeight,
+    heuristic: Optional[Heuristic] = None,
+    statistics: Optional[SearchStatistics] = None,
+) -> Tuple[float, List[int]]:
+    """
+    Return the arrival time and edge indices of the quickest path from `source`
+    to `target`, departing at 0.
+
+    `weight` is called with the index of an edge and the time it is entered.
+    Costs have to be FIFO (entering an edge later never leaves it earlier), then
+    each node is settled once at its earliest arrival, same as A*.
+    """
+    if heuristic is None:
+        heuristic = _default_heuristic
+
+    c = count()
+    queue: List[QueueItem] = [(0, next(c), source, 0)]
+    # node -> (earliest arrival found so far, heuristic to target)
+    enqueued: Dict[int, Tuple[float, float]] = {source: (0, 0)}
+    # node -> edge used to reach it
+    parents: Dict[int, Optional[int]] = {source: None}
+    settled: Set[int] = set()
+    relaxed = 0
+
+    while queue:
+        _, __, node, arrival = heappop(queue)
+        if node in settled:
+            continue
+        if node == target:
+            if statistics is not None:
+                statistics.explored, statistics.relaxed = len(settled) + 1, relaxed
+            return arrival, _reconstruct_path(graph, parents, parents[node])
+        settled.add(node)
+        relaxed += _relax(
+            graph,
+            node,
+            arrival,
+            weight,
+            heuristic,
+            target,
+            settled,
+            enqueued,
+            parents,
+            queue,
+            c,
+        )
+
+    if statistics is not None:
+        statistics.explored, statistics.relaxed = len(settled), relaxed
+    raise exceptions.PathDoesNotExist(
+        f"Node {graph.node_ids[target]} not reachable from {graph.node_ids[source]}"
+    )
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Optional
 
 from pydantic import BaseSettings, validator
 
@@ -8,7 +9,25 @@ from routor.weights import WeightFunction
 
 class Settings(BaseSettings):
     map_path: Path
+    # memory map compiled maps (.npz), so that all workers share the same memory
+    map_mmap: bool = False
+    # reload the map once its file has been replaced, e.g. by `routor update`
+    map_reload: bool = False
+    # live travel times (CSV or .npy), reloaded once the file has been replaced
+    traffic_file: Optional[Path] = None
     travel_time_func: str = "routor.weights.travel_time"
+    # number of cached routes, the cache is disabled if 0
+    route_cache_size: int = 0
+    # seconds to cache routes, no limit if not set
+    route_cache_ttl: Optional[float] = None
+    # searches running at the same time, further ones are queued
+    search_workers: int = 4
+    # searches waiting for a worker, further ones are rejected (HTTP 429)
+    search_queue_size: int = 16
+    # seconds to wait for a search result (HTTP 504), no limit if not set
+    search_timeout: Optional[float] = 30
+    # measure all routes and export them as Prometheus histograms at /metrics
+    metrics: bool = False
 
     class Config:
         env_file = '.env'
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+logger = logging.getLogger()
+
+T = TypeVar("T")
+
+
+class ExecutorSaturated(Exception):
+    """
+    All workers are busy and the queue is full.
+    """
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a limited queue to run searches outside of the event loop.
+
+    At most `workers` searches run at the same time and `queue_size` further ones
+    wait for a free worker. Searches, which can not be queued anymore, are rejected
+    immediately. A search, which timed out while running, keeps its worker busy
+    until it has finished, since threads can not be cancelled.
+    """
+
+    def __init__(
+        self, workers: int, queue_size: int, timeout: Optional[float] = None
+    ) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="routor"
+        )
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run a function in a worker thread and wait for its result.
+
+        Raises `ExecutorSaturated` if the queue is full and `asyncio.TimeoutError`
+        if the result is not available within the timeout.
+        """
+        with self._lock:
+            if self.pending >= self.capacity:
+                raise ExecutorSaturated(f"{self.pending} searches pending.")
+            self.pending += 1
+
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(self._release)
+        # cancels queued searches on timeout
+        return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+
+    def shutdown(self) -> None:
+        """
+        Wait for all running searches and stop the workers.
+        """
+        self.executor.shutdown(wait=True)
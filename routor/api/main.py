@@ -1,17 +1,24 @@
+import asyncio
 import logging
+import time
 from functools import lru_cache
-from typing import List
+from typing import Any, Callable, List, TypeVar, Union
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from .. import engine
 from .. import models as engine_models
 from .. import weights
-from . import config, models
+from ..cache import RouteCache
+from . import config, models, prometheus
+from .executor import BoundedExecutor, ExecutorSaturated
 
 logger = logging.getLogger()
 app = FastAPI()
 
+T = TypeVar("T")
+
 
 @lru_cache()
 def get_settings() -> config.Settings:
@@ -28,13 +35,50 @@ def get_engine(
     """
     Return an initialised routing engine.
 
-    This is a singletone and the engine is only initialised once.
+    This is a singletone and the engine is only initialised once, unless the map
+    is reloaded after it has been replaced (`MAP_RELOAD`).
+    Running searches finish on the previous engine. Live travel times of
+    `TRAFFIC_FILE` are applied again once it has been replaced.
     """
     cached_value = getattr(get_engine, "__cache", None)
+    if cached_value and settings.map_reload and cached_value.map_changed():
+        logger.info(f"Reloading {settings.map_path}")
+        cached_value = None
     if not cached_value:
         logger.debug("initialise engine")
-        cached_value = engine.Engine(settings.map_path)
+        route_cache = None
+        if settings.route_cache_size > 0:
+            route_cache = RouteCache(
+                settings.route_cache_size, ttl=settings.route_cache_ttl
+            )
+        cached_value = engine.Engine(
+            settings.map_path, mmap=settings.map_mmap, route_cache=route_cache
+        )
+        if settings.traffic_file is not None:
+            cached_value.watch_traffic(settings.traffic_file)
         get_engine.__cache = cached_value  # type: ignore
+    elif settings.traffic_file is not None:
+        cached_value.refresh_traffic()
+    return cached_value
+
+
+def get_executor(
+    settings: config.Settings = Depends(get_settings),  # noqa: B008
+) -> BoundedExecutor:
+    """
+    Return the executor to run searches outside of the event loop.
+
+    This is a singletone and the executor is only initialised once.
+    """
+    cached_value = getattr(get_executor, "__cache", None)
+    if not cached_value:
+        logger.debug("initialise executor")
+        cached_value = BoundedExecutor(
+            settings.search_workers,
+            settings.search_queue_size,
+            settings.search_timeout,
+        )
+        get_executor.__cache = cached_value  # type: ignore
     return cached_value
 
 
@@ -46,18 +90,188 @@ def read_weights() -> List[str]:
     return weights.get_function_names()
 
 
-@app.get("/route", response_model=engine_models.Route)
-def read_route(
+@app.put("/traffic", response_model=models.TrafficResponse)
+def update_traffic(
+    data: models.TrafficRequest,
+    engine: engine.Engine = Depends(get_engine),  # noqa: B008
+) -> models.TrafficResponse:
+    """
+    Set live travel times of edges, which are used without reloading the map.
+
+    Live travel times are kept until they are removed, replaced or the map is
+    reloaded. Edges, which are not part of the map, are skipped.
+    """
+    edges, travel_times = engine.traffic.parse_rows(
+        edge.dict(exclude_none=True) for edge in data.edges
+    )
+    try:
+        engine.update_traffic(edges, travel_times, replace=data.replace)
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error)) from error
+    return models.TrafficResponse.from_overlay(engine.traffic)
+
+
+@app.delete("/traffic", response_model=models.TrafficResponse)
+def delete_traffic(
+    engine: engine.Engine = Depends(get_engine),  # noqa: B008
+) -> models.TrafficResponse:
+    """
+    Remove all live travel times, the travel times of the map are used again.
+    """
+    engine.traffic.clear()
+    engine.apply_traffic()
+    return models.TrafficResponse.from_overlay(engine.traffic)
+
+
+async def run_search(
+    executor: BoundedExecutor, func: Callable[..., T], *args: Any
+) -> T:
+    """
+    Run a search in the executor and translate its limits into HTTP errors.
+    """
+    try:
+        return await executor.run(func, *args)
+    except ExecutorSaturated as error:
+        logger.warning(f"Rejecting search: {error}")
+        raise HTTPException(
+            status_code=429, detail="Too many requests, try again later."
+        ) from error
+    except asyncio.TimeoutError as error:
+        raise HTTPException(
+            status_code=504, detail="Search did not finish in time."
+        ) from error
+
+
+@app.get(
+    "/route",
+    response_model=Union[models.RouteResponse, models.SlimRouteResponse],
+    response_model_exclude_none=True,
+)
+async def read_route(
     data: models.RouteRequest,
     engine: engine.Engine = Depends(get_engine),  # noqa: B008
     settings: config.Settings = Depends(get_settings),  # noqa: B008
-) -> engine_models.Route:
+    executor: BoundedExecutor = Depends(get_executor),  # noqa: B008
+) -> Union[engine_models.Route, JSONResponse]:
     """
     Calculate a route from A to B.
+
+    Set `geometry` to `polyline` or `coordinates` for a slim response, which is
+    considerably smaller and faster for long routes.
     """
     weight_func = weights.get_function(data.weight)
+    metrics = engine_models.RouteMetrics() if data.metrics or settings.metrics else None
+
+    route = await run_search(
+        executor,
+        engine.route,
+        data.origin,
+        data.destination,
+        weight_func,
+        settings.get_travel_time_func(),
+        data.edges,
+        data.bidirectional,
+        metrics,
+    )
+    if metrics is None and data.geometry == models.Geometry.locations:
+        return route
+
+    # skip validating the response, it is built from a validated route
+    start = time.perf_counter()
+    if data.geometry == models.Geometry.locations:
+        content = route.dict(exclude_none=True)
+    else:
+        content = models.SlimRouteResponse.from_route(route, data.geometry).dict(
+            exclude_none=True
+        )
+    if metrics is not None:
+        metrics.serialization_time = time.perf_counter() - start
+        if settings.metrics:
+            prometheus.observe_route(metrics)
+        if data.metrics:
+            content["metrics"] = metrics.dict()
+    return JSONResponse(content)
+
 
-    route = engine.route(
-        data.origin, data.destination, weight_func, settings.get_travel_time_func()
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics(
+    engine: engine.Engine = Depends(get_engine),  # noqa: B008
+    settings: config.Settings = Depends(get_settings),  # noqa: B008
+) -> str:
+    """
+    Return route metrics as Prometheus histograms, if enabled (`METRICS`).
+    """
+    if not settings.metrics:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    cache_stats = engine.route_cache.stats() if engine.route_cache else None
+    return prometheus.render(cache_stats)
+
+
+@app.api_route(
+    "/route/batch",
+    methods=["GET", "POST"],
+    response_model=List[engine_models.RouteResult],
+)
+async def read_route_batch(
+    data: models.RouteBatchRequest,
+    engine: engine.Engine = Depends(get_engine),  # noqa: B008
+    settings: config.Settings = Depends(get_settings),  # noqa: B008
+    executor: BoundedExecutor = Depends(get_executor),  # noqa: B008
+) -> List[engine_models.RouteResult]:
+    """
+    Calculate routes for many pairs of origins and destinations at once.
+
+    Results are returned in the same order as the pairs.
+    """
+    weight_func = weights.get_function(data.weight)
+    travel_time_func = settings.get_travel_time_func()
+
+    def _route_batch() -> List[engine_models.RouteResult]:
+        pairs = ((pair.origin, pair.destination) for pair in data.pairs)
+        return list(engine.route_batch(pairs, weight_func, travel_time_func))
+
+    return await run_search(executor, _route_batch)
+
+
+@app.api_route("/matrix", methods=["GET", "POST"], response_model=models.MatrixResponse)
+async def read_matrix(
+    data: models.MatrixRequest,
+    engine: engine.Engine = Depends(get_engine),  # noqa: B008
+    settings: config.Settings = Depends(get_settings),  # noqa: B008
+    executor: BoundedExecutor = Depends(get_executor),  # noqa: B008
+) -> models.MatrixResponse:
+    """
+    Calculate costs, lengths and travel times from all origins to all destinations.
+    """
+    weight_func = weights.get_function(data.weight)
+    travel_time_func = settings.get_travel_time_func()
+
+    def _matrix() -> models.MatrixResponse:
+        matrix = engine.matrix(
+            data.origins, data.destinations, weight_func, travel_time_func
+        )
+        return models.MatrixResponse.from_matrix(matrix)
+
+    return await run_search(executor, _matrix)
+
+
+@app.api_route(
+    "/isochrone", methods=["GET", "POST"], response_model=engine_models.Isochrone
+)
+async def read_isochrone(
+    data: models.IsochroneRequest,
+    engine: engine.Engine = Depends(get_engine),  # noqa: B008
+    executor: BoundedExecutor = Depends(get_executor),  # noqa: B008
+) -> engine_models.Isochrone:
+    """
+    Find all nodes reachable from a location within the given costs.
+    """
+    weight_func = weights.get_function(data.weight)
+    return await run_search(
+        executor,
+        engine.isochrone,
+        data.origin,
+        data.max_costs,
+        weight_func,
+        data.polygon,
     )
-    return route
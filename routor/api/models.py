@@ -1,15 +1,20 @@
-from pydantic import BaseModel, validator
+from enum import Enum
+from math import isnan
+from typing import Any, Dict, List, Optional
+
+import numpy
+from pydantic import BaseModel, Field, root_validator, validator
 
 from .. import models, weights
+from ..traffic import TrafficOverlay
+from ..utils import polyline
 
 
 class VersionResponse(BaseModel):
     version: str
 
 
-class RouteRequest(BaseModel):
-    origin: models.Location
-    destination: models.Location
+class WeightRequest(BaseModel):
     weight: str
 
     @validator("weight")
@@ -20,3 +25,145 @@ class RouteRequest(BaseModel):
                 f"Invalid weight function. Possible values are: {valid_values}"
             )
         return value
+
+
+class Geometry(str, Enum):
+    locations = "locations"
+    polyline = "polyline"
+    coordinates = "coordinates"
+
+
+class RouteRequest(WeightRequest):
+    origin: models.Location
+    destination: models.Location
+    # format of the path, see `SlimRouteResponse` for the others than locations
+    geometry: Geometry = Geometry.locations
+    # add details of each edge along the path
+    edges: bool = False
+    # search from both ends at once instead of using A*
+    bidirectional: bool = False
+    # add measurements of the route to the response
+    metrics: bool = False
+
+
+class RouteResponse(models.Route):
+    metrics: Optional[models.RouteMetrics] = None
+
+
+class SlimRouteResponse(BaseModel):
+    """
+    Route with the path as encoded polyline (precision 5) or [latitude, longitude]
+    pairs instead of a list of locations.
+    """
+
+    costs: float
+    length: float
+    travel_time: float
+    polyline: Optional[str] = None
+    coordinates: Optional[List[List[float]]] = None
+    edges: Optional[List[models.RouteEdge]] = None
+    metrics: Optional[models.RouteMetrics] = None
+
+    @classmethod
+    def from_route(cls, route: models.Route, geometry: Geometry) -> "SlimRouteResponse":
+        latitudes = [location.latitude for location in route.path]
+        longitudes = [location.longitude for location in route.path]
+        slim_route = cls.construct(
+            costs=route.costs,
+            length=route.length,
+            travel_time=route.travel_time,
+            edges=route.edges,
+        )
+        if geometry == Geometry.polyline:
+            slim_route.polyline = polyline.encode(latitudes, longitudes)
+        else:
+            slim_route.coordinates = [
+                [latitude, longitude]
+                for latitude, longitude in zip(latitudes, longitudes)
+            ]
+        return slim_route
+
+
+class LocationPair(BaseModel):
+    origin: models.Location
+    destination: models.Location
+
+
+class RouteBatchRequest(WeightRequest):
+    pairs: List[LocationPair]
+
+
+class MatrixRequest(WeightRequest):
+    origins: List[models.Location]
+    destinations: List[models.Location]
+
+
+class IsochroneRequest(WeightRequest):
+    origin: models.Location
+    # costs of the weight function, eg. seconds for travel time
+    max_costs: float = Field(..., gt=0)
+    # add the convex hull of the reached nodes
+    polygon: bool = False
+
+
+class MatrixResponse(BaseModel):
+    """
+    Rows are origins, columns destinations, `null` if there is no route.
+    """
+
+    costs: List[List[Optional[float]]]
+    lengths: List[List[Optional[float]]]
+    travel_times: List[List[Optional[float]]]
+
+    @classmethod
+    def from_matrix(cls, matrix: models.Matrix) -> "MatrixResponse":
+        def _to_list(values: numpy.ndarray) -> List[List[Optional[float]]]:
+            return [
+                [None if isnan(value) else round(value, 2) for value in row]
+                for row in values.tolist()
+            ]
+
+        return cls(
+            costs=_to_list(matrix.costs),
+            lengths=_to_list(matrix.lengths),
+            travel_times=_to_list(matrix.travel_times),
+        )
+
+
+class TrafficEdge(BaseModel):
+    """
+    Live travel time of an edge, selected by the OSM ids of its nodes, or of all
+    edges of a way. Without travel time and speed, it is removed.
+    """
+
+    start: Optional[int] = None
+    end: Optional[int] = None
+    osmid: Optional[int] = None
+    # seconds
+    travel_time: Optional[float] = Field(None, ge=0)
+    # used for the travel time, if not set
+    speed_kph: Optional[float] = Field(None, gt=0)
+
+    @root_validator
+    def validate_edge(cls, values: Dict[str, Any]) -> Dict[str, Any]:  # noqa: N805
+        has_nodes = values.get("start") is not None and values.get("end") is not None
+        if not has_nodes and values.get("osmid") is None:
+            raise ValueError("Either start and end or osmid are required.")
+        return values
+
+
+class TrafficRequest(BaseModel):
+    edges: List[TrafficEdge]
+    # remove the live travel times of all other edges
+    replace: bool = False
+
+
+class TrafficResponse(BaseModel):
+    # number of edges with live travel times
+    edges: int
+    # increased with every update
+    version: int
+
+    @classmethod
+    def from_overlay(cls, overlay: TrafficOverlay) -> "TrafficResponse":
+        return cls(edges=overlay.edge_count, version=overlay.version)
@@ -0,0 +1,120 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence
+
+from .. import models
+
+# upper bounds of the buckets for durations (seconds) and counters
+TIME_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+COUNT_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+class Histogram:
+    """
+    Thread-safe histogram in the Prometheus text exposition format.
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = list(buckets)
+        # observations per bucket, the last one is +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def render(self) -> List[str]:
+        """
+        Return the lines of the histogram with cumulative buckets.
+        """
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip([*map(repr, self.buckets), "+Inf"], counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total!r}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+# route metric -> histogram
+ROUTE_HISTOGRAMS: Dict[str, Histogram] = {
+    "explored": Histogram(
+        "routor_route_explored_nodes", "Nodes settled per route.", COUNT_BUCKETS
+    ),
+    "relaxed": Histogram(
+        "routor_route_relaxed_edges", "Edges relaxed per route.", COUNT_BUCKETS
+    ),
+    "weight_calls": Histogram(
+        "routor_route_weight_calls",
+        "Calls of scalar weight functions per route.",
+        COUNT_BUCKETS,
+    ),
+    "weight_time": Histogram(
+        "routor_route_weight_seconds",
+        "Time spent in scalar weight functions per route.",
+        TIME_BUCKETS,
+    ),
+    "snapping_time": Histogram(
+        "routor_route_snapping_seconds",
+        "Time to find the closest nodes per route.",
+        TIME_BUCKETS,
+    ),
+    "search_time": Histogram(
+        "routor_route_search_seconds", "Time to search a route.", TIME_BUCKETS
+    ),
+    "summary_time": Histogram(
+        "routor_route_summary_seconds",
+        "Time to calculate the length, travel time and path of a route.",
+        TIME_BUCKETS,
+    ),
+    "serialization_time": Histogram(
+        "routor_route_serialization_seconds",
+        "Time to serialize a route response.",
+        TIME_BUCKETS,
+    ),
+}
+
+
+# metrics measured for every request, also for cached routes
+PER_REQUEST_METRICS = ("snapping_time", "serialization_time")
+
+
+def observe_route(metrics: models.RouteMetrics) -> None:
+    """
+    Add the metrics of a route to the histograms.
+
+    Only snapping and serialization are observed for cached routes.
+    """
+    for field, histogram in ROUTE_HISTOGRAMS.items():
+        if not metrics.cached or field in PER_REQUEST_METRICS:
+            histogram.observe(getattr(metrics, field))
+
+
+def render(cache_stats: Optional[Dict[str, int]] = None) -> str:
+    """
+    Return all histograms and the statistics of the route cache (if enabled) in
+    the Prometheus text exposition format.
+    """
+    lines = [
+        line for histogram in ROUTE_HISTOGRAMS.values() for line in histogram.render()
+    ]
+    if cache_stats is not None:
+        for stat, value in cache_stats.items():
+            if stat == "size":
+                name, kind = "routor_route_cache_size", "gauge"
+            else:
+                name, kind = f"routor_route_cache_{stat}_total", "counter"
+            lines.extend([f"# TYPE {name} {kind}", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
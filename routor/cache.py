@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from . import models
+
+
+class RouteCache:
+    """
+    Thread-safe LRU cache for routes with optional time to live (in seconds).
+
+    The cache is cleared whenever `validate` is called with a different token,
+    eg. because the map or the registered weight functions have changed.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._token: Any = None
+        # key -> (expiry, route)
+        self._routes: "OrderedDict[Hashable, Tuple[float, models.Route]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def validate(self, token: Any) -> None:
+        """
+        Clear the cache if the token has changed since the last call.
+        """
+        with self._lock:
+            if token != self._token:
+                self._routes.clear()
+                self._token = token
+
+    def get(self, key: Hashable) -> Optional[models.Route]:
+        """
+        Return a cached route or `None`.
+        """
+        with self._lock:
+            try:
+                expiry, route = self._routes[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            if expiry < self.clock():
+                del self._routes[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._routes.move_to_end(key)
+            self.hits += 1
+            return route
+
+    def put(self, key: Hashable, route: models.Route) -> None:
+        """
+        Cache a route, the least recently used ones are evicted if the cache is full.
+        """
+        if self.max_size <= 0:
+            return
+
+        expiry = self.clock() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            self._routes[key] = (expiry, route)
+            self._routes.move_to_end(key)
+            while len(self._routes) > self.max_size:
+                self._routes.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Remove all cached routes.
+        """
+        with self._lock:
+            self._routes.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of cached routes, hits, misses and evictions.
+        """
+        return {
+            "size": len(self._routes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
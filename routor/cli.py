@@ -1,15 +1,23 @@
 import json
 import logging
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Iterable, List, Optional, TextIO, Tuple
 
 import click
 
-from . import models
-from .engine import Engine
+from . import models, weights
+from .algorithms.alt import LANDMARK_COUNT
+from .engine import BATCH_SIZE, Engine
+from .parallel import EnginePool
+from .utils import batch as batch_utils
+from .utils import build as build_utils
 from .utils import click as click_utils
 from .utils import core as core_utils
 from .utils import graph as graph_utils
+from .utils import tiles as tiles_utils
+from .utils import update as update_utils
+
+logger = logging.getLogger()
 
 
 def set_log_level(log_level: Optional[str]) -> None:
@@ -18,6 +26,23 @@ def set_log_level(log_level: Optional[str]) -> None:
         logging.basicConfig(level=level)
 
 
+def get_weight_functions(names: Tuple[str, ...]) -> List[weights.WeightFunction]:
+    """
+    Return the registered weight functions with the given names, all by default.
+    """
+    return [
+        weights.get_function(name) for name in names or weights.get_function_names()
+    ]
+
+
+def echo_route_results(results: Iterable[models.RouteResult]) -> None:
+    """
+    Print one route result per line as JSON, without the details of each edge.
+    """
+    for result in results:
+        click.echo(result.json(exclude={"route": {"edges"}}))
+
+
 @click.group()
 def main() -> None:
     pass
@@ -37,6 +62,36 @@ def main() -> None:
 @click.option(
     '-e', '--edge-tags', multiple=True, type=str, help="Additional edge tags to fetch."
 )
+@click.option(
+    '--tile-size',
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help=f"Download the map in tiles of this size in degrees, e.g. {tiles_utils.TILE_SIZE}.",
+)
+@click.option(
+    '--tile-cache',
+    type=click_utils.Path(file_okay=False),
+    default=None,
+    help="Directory to cache downloaded tiles. [default: cache/tiles]",
+)
+@click.option(
+    '--processes',
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of tiles downloaded in parallel. [default: number of CPUs]",
+)
+@click.option(
+    '--osm-file',
+    type=click_utils.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Read streets from an OSM XML file instead of the Overpass API (tiled).",
+)
+@click.option(
+    '--overpass-endpoint',
+    type=str,
+    default=None,
+    help="URL of the Overpass API used for tiled downloads.",
+)
 @click.argument('regions', nargs=-1, type=str)
 @click.argument('target', type=click_utils.Path(exists=False, dir_okay=False))
 def download(
@@ -46,24 +101,217 @@ def download(
     node_tags: Tuple[str],
     edge_tags: Tuple[str],
     api_key: Optional[str] = None,
+    tile_size: Optional[float] = None,
+    tile_cache: Optional[Path] = None,
+    processes: Optional[int] = None,
+    osm_file: Optional[Path] = None,
+    overpass_endpoint: Optional[str] = None,
 ) -> None:
     """
     Download a compatible map.
+
+    With `--tile-size` (or `--osm-file`), the regions are split into tiles, which
+    are downloaded in parallel and cached, so interrupted downloads resume.
     """
     set_log_level(log_level)
 
-    graph = graph_utils.download_map(
-        list(regions),
-        node_tags=list(node_tags),
-        edge_tags=list(edge_tags),
-        api_key=api_key,
+    if tile_size is None and osm_file is None and overpass_endpoint is None:
+        graph = graph_utils.download_map(
+            list(regions),
+            node_tags=list(node_tags),
+            edge_tags=list(edge_tags),
+            api_key=api_key,
+        )
+    elif regions or osm_file:
+        graph = tiles_utils.download_tiled_map(
+            list(regions),
+            tile_size=tile_size or tiles_utils.TILE_SIZE,
+            cache_dir=tile_cache,
+            processes=processes,
+            node_tags=list(node_tags),
+            edge_tags=list(edge_tags),
+            api_key=api_key,
+            osm_file=osm_file,
+            overpass_endpoint=overpass_endpoint,
+        )
+    else:
+        raise click.UsageError("Either REGIONS or --osm-file are required.")
+    graph_utils.save_map(graph, target)
+
+
+@main.command()
+@click.option('--log-level', type=click.Choice(["INFO", "DEBUG"]), default="INFO")
+@click.option(
+    '-n', '--node-tags', multiple=True, type=str, help="Additional node tags to keep."
+)
+@click.option(
+    '-e', '--edge-tags', multiple=True, type=str, help="Additional edge tags to keep."
+)
+@click.argument('source', type=click_utils.Path(exists=True, dir_okay=False))
+@click.argument('target', type=click_utils.Path(exists=False, dir_okay=False))
+def build(
+    source: Path,
+    target: Path,
+    log_level: Optional[str],
+    node_tags: Tuple[str],
+    edge_tags: Tuple[str],
+) -> None:
+    """
+    Build a compatible map from a local OSM extract.
+
+    The extract is streamed, so that neither the extract nor the map are held
+    in memory as networkx graph.
+
+    \b
+    SOURCE Path to the OSM extract. Format: .osm.pbf, .osm or .osm.bz2
+    TARGET Path to the map. Format: .npz (compiled, fast to load) or .graphml
+    """
+    set_log_level(log_level)
+
+    graph = build_utils.build_map(
+        source, node_tags=list(node_tags), edge_tags=list(edge_tags)
     )
+    graph_utils.save_compiled_map(graph, target)
+
+
+@main.command()
+@click.option('--log-level', type=click.Choice(["INFO", "DEBUG"]), default="INFO")
+@click.argument('source', type=click_utils.Path(exists=True, dir_okay=False))
+@click.argument('target', type=click_utils.Path(exists=False, dir_okay=False))
+@click.option(
+    '--enhance',
+    is_flag=True,
+    help="Recalculate street counts, bearings, speeds and travel times.",
+)
+def convert(
+    source: Path, target: Path, log_level: Optional[str], enhance: bool
+) -> None:
+    """
+    Convert a map into a different format.
+
+    \b
+    SOURCE Path to the map to convert. Format: .graphml or .npz
+    TARGET Path to the converted map. Format: .graphml or .npz (compiled, fast to load)
+    """
+    set_log_level(log_level)
+
+    if graph_utils.is_compiled_map(target):
+        compiled_graph = graph_utils.load_compiled_map(source)
+        if enhance:
+            graph_utils.enhance_compiled_map(compiled_graph)
+        graph_utils.save_compiled_map(compiled_graph, target)
+        return
+
+    graph = graph_utils.load_map(source)
+    if enhance:
+        graph_utils.enhance_map(graph)
     graph_utils.save_map(graph, target)
 
 
+@main.command()
+@click.option('--log-level', type=click.Choice(["INFO", "DEBUG"]), default="INFO")
+@click.option(
+    '--target',
+    type=click_utils.Path(exists=False, dir_okay=False),
+    default=None,
+    help="Save the updated map here instead of replacing MAP.",
+)
+@click.argument('map_path', type=click_utils.Path(exists=True, dir_okay=False))
+@click.argument('changes', type=click_utils.Path(exists=True, dir_okay=False))
+def update(
+    map_path: Path, changes: Path, target: Optional[Path], log_level: Optional[str]
+) -> None:
+    """
+    Apply changes to a map without rebuilding it.
+
+    Outdated contraction hierarchies and landmarks stored next to the map are
+    rebuilt, the map is replaced last.
+
+    \b
+    MAP Path to an OSM graphml file or a compiled map. Format: .graphml or .npz
+    CHANGES Path to changed edge attributes (.csv) or to changed nodes and ways (.osc, .osc.gz)
+      CSV columns: start,end (OSM node ids) or osmid (way id), followed by the attributes to set
+    """
+    set_log_level(log_level)
+
+    update_utils.update_map(map_path, changes, target=target)
+
+
 @main.command()
 @click.option('--log-level', type=click.Choice(["INFO", "DEBUG"]), default="INFO")
 @click.argument('map_path', type=click_utils.Path(exists=True, dir_okay=False))
+@click.argument('weight_names', nargs=-1, type=str)
+def contract(
+    map_path: Path, weight_names: Tuple[str], log_level: Optional[str]
+) -> None:
+    """
+    Build contraction hierarchies to speed up routing.
+
+    The hierarchies are stored next to the map and are used automatically.
+    They have to be rebuilt whenever the map changes.
+
+    \b
+    MAP Path to an OSM graphml file or a compiled map. Format: .graphml or .npz
+    WEIGHT_NAMES Names of registered vectorized weight functions, eg. "length". Default: all
+    """
+    set_log_level(log_level)
+
+    engine = Engine(map_path)
+    for func in get_weight_functions(weight_names):
+        if not weights.is_vectorized(func):
+            logger.warning(
+                f"Skipping {func}, only vectorized weights can be contracted."
+            )
+            continue
+        engine.build_hierarchy(func)
+
+
+@main.command()
+@click.option('--log-level', type=click.Choice(["INFO", "DEBUG"]), default="INFO")
+@click.option(
+    '--count', type=click.IntRange(min=1), default=LANDMARK_COUNT, show_default=True
+)
+@click.argument('map_path', type=click_utils.Path(exists=True, dir_okay=False))
+@click.argument('weight_names', nargs=-1, type=str)
+def landmarks(
+    map_path: Path, weight_names: Tuple[str], count: int, log_level: Optional[str]
+) -> None:
+    """
+    Select landmarks to speed up routing with A* (ALT).
+
+    The costs from and to the landmarks are stored next to the map and are used
+    automatically as A* heuristic. They have to be rebuilt whenever the map changes.
+
+    \b
+    MAP Path to an OSM graphml file or a compiled map. Format: .graphml or .npz
+    WEIGHT_NAMES Names of registered vectorized weight functions, eg. "length". Default: all
+    """
+    set_log_level(log_level)
+
+    engine = Engine(map_path)
+    for func in get_weight_functions(weight_names):
+        if not weights.is_vectorized(func):
+            logger.warning(
+                f"Skipping {func}, landmarks are only available for vectorized weights."
+            )
+            continue
+        engine.build_landmarks(func, count)
+
+
+@main.command()
+@click.option('--log-level', type=click.Choice(["INFO", "DEBUG"]), default="INFO")
+@click.option(
+    '--bidirectional',
+    is_flag=True,
+    help="Search from both ends at once (vectorized weight functions only)",
+)
+@click.option(
+    '--traffic',
+    type=click_utils.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Live travel times of edges. Format: .csv or .npy",
+)
+@click.argument('map_path', type=click_utils.Path(exists=True, dir_okay=False))
 @click.argument('origin', type=click_utils.LocationParamType())
 @click.argument('destination', type=click_utils.LocationParamType())
 @click.argument('weight', type=str)
@@ -75,12 +323,14 @@ def route(
     weight: str,
     travel_time: str,
     log_level: Optional[str],
+    bidirectional: bool,
+    traffic: Optional[Path],
 ) -> None:
     """
     Calculate a shortest path.
 
     \b
-    MAP Path to an OSM graphml file. Format: .graphml
+    MAP Path to an OSM graphml file or a compiled map. Format: .graphml or .npz
     ORIGIN GPS location. Format: latitude,longitude
     DESTINATION GPS location. Format: latitude,longitude
     WEIGHT Module path to weight function, eg. "routor.weights.length"
@@ -94,6 +344,82 @@ def route(
 
     # do routing
     engine = Engine(map_path)
-    data = engine.route(origin, destination, weight_func, travel_time_func)
+    if traffic:
+        engine.watch_traffic(traffic)
+    data = engine.route(
+        origin, destination, weight_func, travel_time_func, bidirectional=bidirectional
+    )
+
+    print(json.dumps(data.dict(exclude_none=True), indent=2))
+
+
+@main.command(name="route-batch")
+@click.option('--log-level', type=click.Choice(["INFO", "DEBUG"]), default="INFO")
+@click.option(
+    '--format',
+    'input_format',
+    type=click.Choice(batch_utils.FORMATS),
+    help="Format of the input. Default: derived from the file name, otherwise jsonl",
+)
+@click.option(
+    '--batch-size', type=click.IntRange(min=1), default=BATCH_SIZE, show_default=True
+)
+@click.option(
+    '--processes',
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of worker processes",
+)
+@click.argument('map_path', type=click_utils.Path(exists=True, dir_okay=False))
+@click.argument('input_file', type=click.File('r'))
+@click.argument('weight', type=str)
+@click.argument('travel_time', type=str)
+def route_batch(
+    map_path: Path,
+    input_file: TextIO,
+    weight: str,
+    travel_time: str,
+    input_format: Optional[str],
+    batch_size: int,
+    processes: int,
+    log_level: Optional[str],
+) -> None:
+    """
+    Calculate shortest paths for many pairs of origins and destinations.
+
+    The pairs are read lazily and one result per pair is printed as JSON line to
+    `stdout` in the same order. Pairs without a path result in an error.
+
+    \b
+    MAP Path to an OSM graphml file or a compiled map. Format: .graphml or .npz
+    INPUT_FILE Path to a CSV or JSONL file with the pairs, "-" for stdin.
+      CSV columns: origin_latitude,origin_longitude,destination_latitude,destination_longitude
+      JSONL: {"origin": {"latitude": ..., "longitude": ...}, "destination": {...}}
+    WEIGHT Module path to weight function, eg. "routor.weights.length"
+    TRAVEL_TIME Module path to weight function, which returns the travel time for an edge, eg. "routor.weights.travel_time"
+    """
+    set_log_level(log_level)
+
+    weight_func = core_utils.import_weight_function(weight)
+    travel_time_func = core_utils.import_weight_function(travel_time)
+    if not input_format:
+        is_csv = getattr(input_file, "name", "").lower().endswith(".csv")
+        input_format = "csv" if is_csv else "jsonl"
+
+    engine = Engine(map_path)
+    pairs = batch_utils.read_pairs(input_file, input_format)
+    if processes == 1:
+        echo_route_results(
+            engine.route_batch(
+                pairs, weight_func, travel_time_func, batch_size=batch_size
+            )
+        )
+        return
 
-    print(json.dumps(data.dict(), indent=2))
+    with EnginePool(engine, processes) as pool:
+        echo_route_results(
+            pool.route_batch(
+                pairs, weight_func, travel_time_func, batch_size=batch_size
+            )
+        )
@@ -0,0 +1,450 @@
+import json
+import logging
+import math
+import struct
+import zipfile
+from numbers import Integral, Real
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+import networkx
+import numpy
+
+from . import exceptions
+
+logger = logging.getLogger()
+
+Column = numpy.ndarray
+
+# increase whenever the file format changes in an incompatible way
+FORMAT_VERSION = 1
+
+
+def to_column(values: List[Any]) -> Column:
+    """
+    Convert a list of attribute values into a typed column.
+
+    Missing values are given as `None`.
+    Numeric attributes are stored as `int64` (no missing values), `bool`
+    (no missing values) or `float64` (missing values are `nan`).
+    Everything else is stored as an object column.
+    """
+    present = [value for value in values if value is not None]
+    has_missing = len(present) != len(values)
+
+    if present and all(isinstance(value, bool) for value in present):
+        if not has_missing:
+            return numpy.array(values, dtype=numpy.bool_)
+    elif present and all(
+        isinstance(value, Real) and not isinstance(value, bool) for value in present
+    ):
+        if not has_missing and all(isinstance(value, Integral) for value in present):
+            return numpy.array(values, dtype=numpy.int64)
+        return numpy.array(
+            [numpy.nan if value is None else value for value in values],
+            dtype=numpy.float64,
+        )
+
+    column = numpy.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def is_missing(value: Any) -> bool:
+    """
+    Check whether a single value of a column marks a missing value.
+    """
+    if value is None:
+        return True
+    return isinstance(value, float) and math.isnan(value)
+
+
+def encode_column(column: Column) -> Tuple[Column, Optional[Column]]:
+    """
+    Encode an object column, so that it can be stored without pickling.
+
+    Object columns are dictionary encoded: the JSON representations of all
+    unique values and an `int32` code for each row (`-1` for missing values).
+    All other columns are returned unchanged.
+    """
+    if column.dtype != object:
+        return column, None
+
+    categories: Dict[str, int] = {}
+    codes = numpy.empty(len(column), dtype=numpy.int32)
+    for row, value in enumerate(column):
+        if value is None:
+            codes[row] = -1
+            continue
+        codes[row] = categories.setdefault(
+            json.dumps(value, default=str), len(categories)
+        )
+    return codes, numpy.array(list(categories), dtype=str)
+
+
+def decode_column(codes: Column, categories: Optional[Column]) -> Column:
+    """
+    Revert `encode_column`.
+    """
+    if categories is None:
+        return codes
+
+    values = numpy.empty(len(categories) + 1, dtype=object)
+    values[:-1] = [json.loads(category) for category in categories]
+    # `-1` points to the last item, which is `None`
+    return values[codes]
+
+
+def _memmap_npy(file: BinaryIO, offset: int) -> Optional[numpy.ndarray]:
+    """
+    Memory map a `.npy` array stored at `offset` within the file.
+
+    Returns `None` if the array can not be mapped.
+    """
+    file.seek(offset)
+    version = numpy.lib.format.read_magic(file)
+    if version == (1, 0):
+        shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(file)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(file)
+    else:
+        return None
+
+    if dtype.hasobject or len(shape) != 1 or shape[0] == 0:
+        return None
+    return numpy.memmap(
+        file,
+        dtype=dtype,
+        mode="r",
+        offset=file.tell(),
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+def read_npz(path: Path, mmap: bool = False) -> Dict[str, numpy.ndarray]:
+    """
+    Read all arrays of an `.npz` file.
+
+    If `mmap` is set, arrays of an uncompressed file are memory mapped (read-only)
+    instead of being loaded into memory. This way, all processes which load the
+    same file share the same physical memory.
+    """
+    if not mmap:
+        with numpy.load(path, allow_pickle=False) as data:
+            return {key: data[key] for key in data.files}
+
+    arrays: Dict[str, numpy.ndarray] = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as file:
+        for info in archive.infolist():
+            array = None
+            if info.compress_type == zipfile.ZIP_STORED:
+                # the data follows the local file header, which has a fixed size
+                # of 30 bytes plus the variable length file name and extra field
+                file.seek(info.header_offset + 26)
+                name_length, extra_length = struct.unpack("<HH", file.read(4))
+                array = _memmap_npy(
+                    file, info.header_offset + 30 + name_length + extra_length
+                )
+            if array is None:
+                with archive.open(info) as member:
+                    array = numpy.lib.format.read_array(member, allow_pickle=False)
+            arrays[info.filename[: -len(".npy")]] = array
+    return arrays
+
+
+class RowSelection(Mapping[str, Column]):
+    """
+    Read-only view on selected rows of columns.
+
+    Rows are only selected when a column is accessed.
+    """
+
+    def __init__(self, columns: Mapping[str, Column], rows: numpy.ndarray) -> None:
+        self.columns = columns
+        self.rows = rows
+
+    def __getitem__(self, key: str) -> Column:
+        return self.columns[key][self.rows]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.columns)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+
+def _to_python(value: Any) -> Any:
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
+
+
+class CompiledGraph:
+    """
+    Directed graph stored as compressed sparse row (CSR) arrays.
+
+    Nodes are addressed by their position (index) within `node_ids`.
+    All outgoing edges of node `i` are stored at the positions
+    `offsets[i]:offsets[i + 1]` of `targets` and the edge columns.
+    """
+
+    node_ids: numpy.ndarray
+    offsets: numpy.ndarray
+    targets: numpy.ndarray
+    sources: numpy.ndarray
+    node_data: Dict[str, Column]
+    edge_data: Dict[str, Column]
+    graph_data: Dict[str, Any]
+
+    def __init__(
+        self,
+        node_ids: numpy.ndarray,
+        offsets: numpy.ndarray,
+        targets: numpy.ndarray,
+        node_data: Dict[str, Column],
+        edge_data: Dict[str, Column],
+        graph_data: Optional[Dict[str, Any]] = None,
+        sources: Optional[numpy.ndarray] = None,
+        sorter: Optional[numpy.ndarray] = None,
+    ) -> None:
+        self.node_ids = node_ids
+        self.offsets = offsets
+        self.targets = targets
+        self.node_data = node_data
+        self.edge_data = edge_data
+        self.graph_data = graph_data or {}
+
+        if sources is None:
+            sources = numpy.repeat(
+                numpy.arange(len(node_ids), dtype=numpy.int64), numpy.diff(offsets)
+            )
+        self.sources = sources
+        if sorter is None:
+            sorter = numpy.argsort(node_ids, kind="stable")
+        self._sorter = sorter
+        self._reverse: Optional[Tuple[numpy.ndarray, numpy.ndarray]] = None
+        self._ways: Optional[Tuple[numpy.ndarray, numpy.ndarray]] = None
+
+    @classmethod
+    def from_graph(cls, graph: networkx.DiGraph) -> "CompiledGraph":
+        """
+        Compile a (multi) directed graph.
+
+        For multigraphs, only the first edge between two nodes is used.
+        """
+        node_ids = numpy.fromiter(graph.nodes, dtype=numpy.int64, count=len(graph))
+        node_index = {node_id: index for index, node_id in enumerate(graph.nodes)}
+
+        offsets = numpy.zeros(len(node_ids) + 1, dtype=numpy.int64)
+        targets: List[int] = []
+        edges: List[Dict[str, Any]] = []
+        for index, node_id in enumerate(graph.nodes):
+            for neighbor, edge_data in graph.adj[node_id].items():
+                if graph.is_multigraph():
+                    edge_data = next(iter(edge_data.values()))
+                targets.append(node_index[neighbor])
+                edges.append(edge_data)
+            offsets[index + 1] = len(targets)
+
+        return cls(
+            node_ids=node_ids,
+            offsets=offsets,
+            targets=numpy.array(targets, dtype=numpy.int64),
+            node_data=cls._columns(data for _, data in graph.nodes(data=True)),
+            edge_data=cls._columns(edges),
+            graph_data=dict(graph.graph),
+        )
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = False) -> "CompiledGraph":
+        """
+        Load a compiled graph from a `.npz` file.
+
+        If `mmap` is set, all numeric arrays are memory mapped (read-only).
+        """
+        arrays = read_npz(path, mmap=mmap)
+
+        version = int(arrays.pop("format_version"))
+        if version != FORMAT_VERSION:
+            raise exceptions.GraphException(
+                f"Unsupported map format version {version} (expected {FORMAT_VERSION})."
+            )
+
+        columns: Dict[str, Dict[str, Column]] = {"node": {}, "edge": {}}
+        for key, array in arrays.items():
+            kind, _, name = key.partition("/")
+            if kind in columns:
+                columns[kind][name] = decode_column(
+                    array, arrays.get(f"{kind}-categories/{name}")
+                )
+
+        return cls(
+            node_ids=arrays["node_ids"],
+            offsets=arrays["offsets"],
+            targets=arrays["targets"],
+            node_data=columns["node"],
+            edge_data=columns["edge"],
+            graph_data=json.loads(str(arrays["graph_data"])),
+            sources=arrays.get("sources"),
+            sorter=arrays.get("sorter"),
+        )
+
+    def save(self, path: Path) -> None:
+        """
+        Save the compiled graph as uncompressed `.npz` file.
+        """
+        arrays = {
+            "format_version": numpy.array(FORMAT_VERSION),
+            "graph_data": numpy.array(json.dumps(self.graph_data, default=str)),
+            "node_ids": self.node_ids,
+            "offsets": self.offsets,
+            "targets": self.targets,
+            "sources": self.sources,
+            "sorter": self._sorter,
+        }
+        for kind, columns in (("node", self.node_data), ("edge", self.edge_data)):
+            for name, column in columns.items():
+                values, categories = encode_column(column)
+                arrays[f"{kind}/{name}"] = values
+                if categories is not None:
+                    arrays[f"{kind}-categories/{name}"] = categories
+
+        with open(path, "wb") as file:
+            numpy.savez(file, **arrays)
+
+    def to_graph(self) -> networkx.MultiDiGraph:
+        """
+        Convert the compiled graph back into a networkx graph.
+        """
+        graph = networkx.MultiDiGraph(**self.graph_data)
+        for index, node_id in enumerate(self.node_ids.tolist()):
+            graph.add_node(node_id, **self.node_attributes(index))
+        for edge, (start, end) in enumerate(
+            zip(self.sources.tolist(), self.targets.tolist())
+        ):
+            graph.add_edge(
+                self.node_ids.item(start),
+                self.node_ids.item(end),
+                key=0,
+                **self.edge_attributes(edge),
+            )
+        return graph
+
+    @staticmethod
+    def _columns(rows: Iterable[Dict[str, Any]]) -> Dict[str, Column]:
+        rows = list(rows)
+        keys: Dict[str, None] = {}
+        for row in rows:
+            keys.update(dict.fromkeys(row))
+        return {key: to_column([row.get(key) for row in rows]) for key in keys}
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def __contains__(self, node_id: Any) -> bool:
+        try:
+            self.index_of(node_id)
+        except exceptions.NodeDoesNotExist:
+            return False
+        return True
+
+    def index_of(self, node_id: int) -> int:
+        """
+        Return the index of a node id.
+        """
+        position = numpy.searchsorted(self.node_ids, node_id, sorter=self._sorter)
+        if position < len(self.node_ids):
+            index = int(self._sorter[position])
+            if self.node_ids[index] == node_id:
+                return index
+        raise exceptions.NodeDoesNotExist(f"Node {node_id} does not exist.")
+
+    def neighbors(self, index: int) -> range:
+        """
+        Return the edge indices of all outgoing edges of a node.
+        """
+        return range(self.offsets[index], self.offsets[index + 1])
+
+    def reverse_adjacency(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Return offsets and edge indices of the incoming edges of all nodes.
+
+        All incoming edges of node `i` are stored at the positions
+        `offsets[i]:offsets[i + 1]`. The arrays are built once on first use.
+        """
+        if self._reverse is None:
+            edges = numpy.argsort(self.targets, kind="stable")
+            offsets = numpy.zeros(self.node_count + 1, dtype=numpy.int64)
+            offsets[1:] = numpy.cumsum(
+                numpy.bincount(self.targets, minlength=self.node_count)
+            )
+            self._reverse = offsets, edges
+        return self._reverse
+
+    def edge_index(self, start: int, end: int) -> int:
+        """
+        Return the index of the edge between two node indices.
+        """
+        for edge in self.neighbors(start):
+            if self.targets[edge] == end:
+                return edge
+        raise exceptions.EdgeDoesNotExist(
+            f"Edge ({self.node_ids[start]}, {self.node_ids[end]}) does not exist."
+        )
+
+    def way_edges(self, osmid: int) -> numpy.ndarray:
+        """
+        Return the indices of all edges of an OSM way.
+
+        Edges are sorted by their way once on first use.
+        """
+        if self._ways is None:
+            osmids = numpy.asarray(self.edge_data["osmid"], dtype=numpy.int64)
+            order = numpy.argsort(osmids, kind="stable")
+            self._ways = osmids[order], order
+        osmids, order = self._ways
+        first, last = numpy.searchsorted(osmids, [osmid, osmid + 1])
+        return order[first:last]
+
+    def edge_indices(self, path: List[int]) -> List[int]:
+        """
+        Return the edge indices along a path of node indices.
+        """
+        return [self.edge_index(start, end) for start, end in zip(path, path[1:])]
+
+    def node_attributes(self, index: int) -> Dict[str, Any]:
+        """
+        Return all available attributes of a node.
+        """
+        return self._attributes(self.node_data, index)
+
+    def edge_attributes(self, edge: int) -> Dict[str, Any]:
+        """
+        Return all available attributes of an edge.
+        """
+        return self._attributes(self.edge_data, edge)
+
+    @staticmethod
+    def _attributes(columns: Dict[str, Column], index: int) -> Dict[str, Any]:
+        attributes = {}
+        for key, column in columns.items():
+            value = _to_python(column[index])
+            if not is_missing(value):
+                attributes[key] = value
+        return attributes
@@ -1,65 +1,684 @@
 import logging
+import threading
+import time
 from pathlib import Path
-from typing import Any, List, Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
-import networkx
-import osmnx
-from more_itertools import pairwise
-from networkx_astar_path import astar_path
+import numpy
+from shapely.geometry import MultiPoint, Polygon
+from shapely.geometry.base import BaseGeometry
 
 from . import exceptions, models, weights
+from .algorithms.alt import LANDMARK_COUNT, Landmarks, landmarks_path
+from .algorithms.astar import EdgeWeight, Heuristic, astar_search
+from .algorithms.bidirectional import bidirectional_dijkstra
+from .algorithms.ch import ContractionHierarchy, fingerprint, hierarchy_path
+from .algorithms.dijkstra import (
+    ShortestPathTree,
+    shortest_path_tree,
+    time_dependent_tree,
+)
+from .algorithms.statistics import SearchStatistics
+from .algorithms.time_dependent import TimeDependentWeight, time_dependent_search
+from .cache import RouteCache
+from .compiled import CompiledGraph, RowSelection
+from .expanded import EdgeExpandedGraph, turns
+from .spatial import NodeCoordinates, NodeIndex
+from .traffic import TrafficOverlay
+from .utils.batch import LocationPair, chunked
 from .utils.debug import timeit
-from .utils.graph import load_map
+from .utils.graph import load_compiled_map
 
 logger = logging.getLogger()
 
+# number of origin/destination pairs processed at once by `route_batch`
+BATCH_SIZE = 1000
+
+Preprocessed = TypeVar("Preprocessed", bound=Union[ContractionHierarchy, Landmarks])
+
+
+class ShortestPath(NamedTuple):
+    """
+    Shortest path found by a search.
+
+    `costs` are accumulated by the search, `nodes` and `edges` are indices of the
+    compiled graph. `edge_models` contains the edges already created for scalar
+    weight functions, so that they can be reused for further costs of the path.
+    `explored` is the number of nodes settled by the search.
+    """
+
+    costs: float
+    nodes: List[int]
+    edges: List[int]
+    edge_models: Dict[int, models.Edge]
+    explored: int
+
 
 class Engine:
-    graph: networkx.DiGraph
+    graph: CompiledGraph
+    node_index: NodeIndex
+    node_coordinates: NodeCoordinates
 
     @timeit
-    def __init__(self, map_path: Path) -> None:
+    def __init__(
+        self,
+        map_path: Path,
+        mmap: bool = False,
+        route_cache: Optional[RouteCache] = None,
+    ) -> None:
         logger.info("Initialise engine")
-        self.graph = load_map(map_path)
+        self.map_path = map_path
+        self.mmap = mmap
+        self.route_cache = route_cache
+        # increased whenever the map data changes, see `invalidate_caches`
+        self.map_version = 0
+        # guards changing the map data against caching data derived from it
+        self._cache_lock = threading.RLock()
+        # identifies the loaded map file, see `map_changed`
+        self._map_stat = self._stat_map()
+        self.graph = load_compiled_map(map_path, mmap=mmap)
+        # live travel times, see `apply_traffic`
+        self.traffic = TrafficOverlay(self.graph)
+        self.node_index = NodeIndex(
+            self.graph.node_data["y"], self.graph.node_data["x"]
+        )
+        self.node_coordinates = NodeCoordinates(
+            self.graph.node_data["y"], self.graph.node_data["x"]
+        )
+        self._reset_caches()
         logger.info(
-            f"Map loaded (edges: {len(self.graph.edges)}, nodes: {len(self.graph.nodes)})"
+            f"Map loaded (edges: {self.graph.edge_count}, nodes: {self.graph.node_count})"
+        )
+
+    def _reset_caches(self) -> None:
+        self._edge_costs: Dict[weights.VectorizedWeightFunction, numpy.ndarray] = {}
+        self._min_costs_per_meter: Dict[weights.WeightFunction, float] = {}
+        self._expanded_graphs: Dict[
+            weights.VectorizedTurnWeightFunction, EdgeExpandedGraph
+        ] = {}
+        self._hierarchies: Dict[
+            weights.WeightFunction, Optional[ContractionHierarchy]
+        ] = {}
+        self._landmarks: Dict[weights.WeightFunction, Optional[Landmarks]] = {}
+        self._time_dependent_costs: Dict[
+            weights.TimeDependentWeightFunction, TimeDependentWeight
+        ] = {}
+
+    def invalidate_caches(self) -> None:
+        """
+        Drop all data derived from the map, call it after modifying the map.
+
+        Preprocessed data on disk is checked against the modified map again.
+        """
+        with self._cache_lock:
+            self.map_version += 1
+            self._reset_caches()
+            if self.route_cache is not None:
+                self.route_cache.clear()
+
+    def _store(self, cache: Dict[Any, Any], key: Any, value: Any, version: int) -> None:
+        """
+        Cache data derived from the map, unless the map changed since `version`
+        while it was calculated.
+        """
+        with self._cache_lock:
+            if self.map_version == version:
+                cache[key] = value
+
+    def _invalidate_costs(self) -> None:
+        """
+        Drop the data derived from edge costs after changing edge attributes.
+
+        Costs, hierarchies and landmarks of vectorized weight functions, whose
+        costs did not change (eg. `length` for new travel times), are kept.
+        """
+        with self._cache_lock:
+            edge_costs = self._edge_costs
+            previous: List[Dict[Any, Any]] = [
+                self._min_costs_per_meter,
+                self._hierarchies,
+                self._landmarks,
+            ]
+            self.invalidate_caches()
+            current: List[Dict[Any, Any]] = [
+                self._min_costs_per_meter,
+                self._hierarchies,
+                self._landmarks,
+            ]
+            for weight, costs in edge_costs.items():
+                if not numpy.array_equal(
+                    weight.costs(self.graph.edge_data), costs, equal_nan=True
+                ):
+                    continue
+                self._edge_costs[weight] = costs
+                for cache, previous_cache in zip(current, previous):
+                    if weight in previous_cache:
+                        cache[weight] = previous_cache[weight]
+
+    def _stat_map(self) -> Tuple[int, int]:
+        stat = self.map_path.stat()
+        return stat.st_ino, stat.st_mtime_ns
+
+    def map_changed(self) -> bool:
+        """
+        Check whether the map file has been modified or replaced since it was loaded.
+        """
+        try:
+            return self._stat_map() != self._map_stat
+        except FileNotFoundError:
+            return False
+
+    def apply_traffic(self) -> None:
+        """
+        Use the live travel times of `traffic` as travel times of the map.
+
+        Edges without live data get the travel times of the map back, which are
+        kept as `free_flow_travel_time`. The map is not reloaded, only the data
+        derived from changed edge costs is dropped (see `_invalidate_costs`):
+        hierarchies and landmarks built for other travel times are ignored until
+        traffic clears. Running searches finish on the previous travel times.
+        """
+        edge_data = self.graph.edge_data
+        if "travel_time" not in edge_data:
+            raise exceptions.GraphException("The map does not contain travel times.")
+        with self._cache_lock:
+            free_flow = edge_data.setdefault(
+                weights.FREE_FLOW_TRAVEL_TIME, edge_data["travel_time"]
+            )
+            live = self.traffic.travel_times
+            # same precision as the travel times of the map
+            edge_data["travel_time"] = numpy.where(
+                numpy.isnan(live), free_flow, live.astype(numpy.float64).round(1)
+            )
+            self._invalidate_costs()
+
+    def update_traffic(
+        self, edges: numpy.ndarray, travel_times: numpy.ndarray, replace: bool = False
+    ) -> None:
+        """
+        Set live travel times (in seconds) of edges and apply them, see
+        `TrafficOverlay.update`.
+        """
+        self.traffic.update(edges, travel_times, replace)
+        self.apply_traffic()
+
+    def watch_traffic(self, path: Path) -> None:
+        """
+        Apply live travel times of a file, reloaded by `refresh_traffic`.
+        """
+        self.traffic.watch(path)
+        self.apply_traffic()
+
+    def refresh_traffic(self) -> bool:
+        """
+        Apply the watched traffic file again if it has been replaced.
+        """
+        if not self.traffic.refresh():
+            return False
+        self.apply_traffic()
+        return True
+
+    def _index_of(self, node: models.Node) -> int:
+        try:
+            return self.graph.index_of(node.node_id)
+        except exceptions.NodeDoesNotExist as error:
+            raise exceptions.NodeDoesNotExist(f"{node} does not exists.") from error
+
+    @timeit
+    def edge_costs(self, weight: weights.VectorizedWeightFunction) -> numpy.ndarray:
+        """
+        Return the costs of all edges for a vectorized weight function.
+
+        The costs are only calculated once per weight function.
+        """
+        version = self.map_version
+        try:
+            return self._edge_costs[weight]
+        except KeyError:
+            pass
+
+        costs = weight.costs(self.graph.edge_data)
+        if costs.shape != (self.graph.edge_count,):
+            raise ValueError(
+                f"{weight} returned {costs.shape} costs for {self.graph.edge_count} edges."
+            )
+        self._store(self._edge_costs, weight, costs, version)
+        return costs
+
+    @timeit
+    def expanded_graph(
+        self, weight: weights.VectorizedTurnWeightFunction
+    ) -> EdgeExpandedGraph:
+        """
+        Return the edge-based graph with the turn costs of a weight function.
+
+        The turn costs are only calculated once per weight function.
+        """
+        version = self.map_version
+        try:
+            return self._expanded_graphs[weight]
+        except KeyError:
+            pass
+
+        prev_edges, edges = turns(self.graph)
+        edge_data = self.graph.edge_data
+        start_costs = weight.costs(None, edge_data)
+        turn_costs = weight.costs(
+            RowSelection(edge_data, prev_edges), RowSelection(edge_data, edges)
+        )
+        for costs, expected in (
+            (start_costs, self.graph.edge_count),
+            (turn_costs, len(edges)),
+        ):
+            if costs.shape != (expected,):
+                raise ValueError(
+                    f"{weight} returned {costs.shape} costs for {expected} edges/turns."
+                )
+
+        expanded = EdgeExpandedGraph.build(
+            self.graph, prev_edges, edges, start_costs, turn_costs
+        )
+        self._store(self._expanded_graphs, weight, expanded, version)
+        return expanded
+
+    def time_dependent_costs(
+        self, weight: weights.TimeDependentWeightFunction
+    ) -> TimeDependentWeight:
+        """
+        Return the time-dependent costs of edges for a weight function.
+
+        The costs are only prepared once per weight function.
+        """
+        version = self.map_version
+        try:
+            return self._time_dependent_costs[weight]
+        except KeyError:
+            pass
+
+        costs = weight.costs(self.graph.edge_data)
+        self._store(self._time_dependent_costs, weight, costs, version)
+        return costs
+
+    def _search_space(
+        self, weight: weights.WeightFunction
+    ) -> Optional[Tuple[CompiledGraph, numpy.ndarray]]:
+        """
+        Return the graph and its precalculated edge costs to search on.
+
+        Only available for vectorized weight functions.
+        """
+        if isinstance(weight, weights.VectorizedTurnWeightFunction):
+            expanded = self.expanded_graph(weight)
+            return expanded.graph, expanded.costs
+        if isinstance(weight, weights.VectorizedWeightFunction):
+            return self.graph, self.edge_costs(weight)
+        return None
+
+    def _load_preprocessed(
+        self,
+        weight: weights.WeightFunction,
+        path_func: Callable[[Path, str], Path],
+        load: Callable[..., Preprocessed],
+    ) -> Optional[Preprocessed]:
+        """
+        Load the preprocessed data of a weight function from the directory of the map.
+
+        Data is ignored if it has been built for other edge costs.
+        """
+        name = weights.get_function_name(weight)
+        if not name or not weights.is_vectorized(weight):
+            return None
+        path = path_func(self.map_path, name)
+        if not path.exists():
+            return None
+
+        data = load(path, mmap=self.mmap)
+        if data.fingerprint != fingerprint(*self._search_space(weight)):  # type: ignore
+            logger.warning(f"{path} is outdated and will be ignored.")
+            return None
+        return data
+
+    def _named_search_space(
+        self, weight: weights.WeightFunction
+    ) -> Tuple[str, CompiledGraph, numpy.ndarray]:
+        """
+        Return the name and search space of a weight function to preprocess it.
+        """
+        name = weights.get_function_name(weight)
+        if not name:
+            raise ValueError(f"{weight} is not registered.")
+        search_space = self._search_space(weight)
+        if not search_space:
+            raise ValueError(f"{weight} is not vectorized.")
+        return (name, *search_space)
+
+    def hierarchy(
+        self, weight: weights.WeightFunction
+    ) -> Optional[ContractionHierarchy]:
+        """
+        Return the contraction hierarchy of a weight function if available.
+
+        Hierarchies are loaded from the directory of the map.
+        They are only available for registered vectorized weight functions.
+        """
+        version = self.map_version
+        try:
+            return self._hierarchies[weight]
+        except KeyError:
+            pass
+
+        hierarchy = self._load_preprocessed(
+            weight, hierarchy_path, ContractionHierarchy.load
+        )
+        self._store(self._hierarchies, weight, hierarchy, version)
+        return hierarchy
+
+    @timeit
+    def build_hierarchy(self, weight: weights.WeightFunction) -> ContractionHierarchy:
+        """
+        Build and save the contraction hierarchy of a registered weight function.
+        """
+        version = self.map_version
+        name, graph, costs = self._named_search_space(weight)
+        hierarchy = ContractionHierarchy.build(graph, costs)
+        hierarchy.save(hierarchy_path(self.map_path, name))
+        self._store(self._hierarchies, weight, hierarchy, version)
+        return hierarchy
+
+    def landmarks(self, weight: weights.WeightFunction) -> Optional[Landmarks]:
+        """
+        Return the landmarks of a weight function if available.
+
+        Landmarks are loaded from the directory of the map.
+        They are only available for registered vectorized weight functions.
+        """
+        version = self.map_version
+        try:
+            return self._landmarks[weight]
+        except KeyError:
+            pass
+
+        landmarks = self._load_preprocessed(weight, landmarks_path, Landmarks.load)
+        self._store(self._landmarks, weight, landmarks, version)
+        return landmarks
+
+    @timeit
+    def build_landmarks(
+        self, weight: weights.WeightFunction, count: int = LANDMARK_COUNT
+    ) -> Landmarks:
+        """
+        Select landmarks for a registered weight function and save their costs.
+        """
+        version = self.map_version
+        name, graph, costs = self._named_search_space(weight)
+        landmarks = Landmarks.build(graph, costs, count)
+        landmarks.save(landmarks_path(self.map_path, name))
+        self._store(self._landmarks, weight, landmarks, version)
+        return landmarks
+
+    @timeit
+    def update_preprocessed(self) -> List[Path]:
+        """
+        Rebuild outdated hierarchies and landmarks stored next to the map.
+
+        Call it after changing the map, preprocessed data still matching the
+        edge costs is kept. Return the paths of the rebuilt files.
+        """
+        updated = []
+        for name in weights.get_function_names():
+            weight = weights.get_function(name)
+            if not weights.is_vectorized(weight):
+                continue
+
+            path = hierarchy_path(self.map_path, name)
+            if path.exists() and self.hierarchy(weight) is None:
+                self.build_hierarchy(weight)
+                updated.append(path)
+
+            path = landmarks_path(self.map_path, name)
+            if path.exists() and self.landmarks(weight) is None:
+                self.build_landmarks(weight, len(Landmarks.load(path).landmarks))
+                updated.append(path)
+        return updated
+
+    def _edge_weight(
+        self,
+        weight: weights.WeightFunction,
+        edges: Optional[Dict[int, models.Edge]] = None,
+        statistics: Optional[SearchStatistics] = None,
+    ) -> EdgeWeight:
+        """
+        Return a weight function working on edge indices.
+
+        Created edges are stored in `edges`, calls of the weight function are
+        counted and timed in `statistics`.
+        """
+        if edges is None:
+            edges = {}
+
+        def _get_edge(edge_index: int) -> models.Edge:
+            try:
+                return edges[edge_index]
+            except KeyError:
+                edge = models.Edge.from_compiled(self.graph, edge_index)
+                edges[edge_index] = edge
+                return edge
+
+        def _weight_wrapper(prev_edge_index: Optional[int], edge_index: int) -> float:
+            prev_edge: Optional[models.Edge] = None
+            if prev_edge_index is not None:
+                prev_edge = _get_edge(prev_edge_index)
+            return weight(prev_edge, _get_edge(edge_index))
+
+        if statistics is None:
+            return _weight_wrapper
+
+        def _measured_weight_wrapper(
+            prev_edge_index: Optional[int], edge_index: int
+        ) -> float:
+            start = time.perf_counter()
+            result = _weight_wrapper(prev_edge_index, edge_index)
+            statistics.weight_time += time.perf_counter() - start  # type: ignore
+            statistics.weight_calls += 1  # type: ignore
+            return result
+
+        return _measured_weight_wrapper
+
+    def min_costs_per_meter(self, weight: weights.WeightFunction) -> float:
+        """
+        Return the lower bound of the costs per meter declared by a weight function.
+
+        Weight functions without a declared lower bound return 0.
+        """
+        version = self.map_version
+        try:
+            return self._min_costs_per_meter[weight]
+        except KeyError:
+            pass
+
+        func = getattr(weight, "min_costs_per_meter", None)
+        result = float(func(self.graph.edge_data)) if func else 0.0
+        self._store(self._min_costs_per_meter, weight, result, version)
+        return result
+
+    def _distance_heuristic(
+        self, weight: weights.WeightFunction
+    ) -> Optional[Heuristic]:
+        """
+        Return the great-circle distance to the target multiplied with the lower
+        bound of the costs per meter.
+        """
+        factor = self.min_costs_per_meter(weight)
+        if not factor:
+            return None
+
+        distance = self.node_coordinates.distance
+        if isinstance(weight, weights.VectorizedTurnWeightFunction):
+            base_nodes = self.expanded_graph(weight).base_node_list
+            return lambda node, target: factor * distance(
+                base_nodes[node], base_nodes[target]
+            )
+        return lambda node, target: factor * distance(node, target)
+
+    def heuristic(self, weight: weights.WeightFunction) -> Optional[Heuristic]:
+        """
+        Return an admissible A* heuristic for a weight function if available.
+
+        Landmarks and the lower bound of the costs per meter are used if available,
+        the larger estimation wins. For turn weight functions, the heuristic works
+        on the nodes of the edge-based graph.
+        """
+        landmarks = self.landmarks(weight)
+        heuristics = [
+            heuristic
+            for heuristic in (
+                landmarks.heuristic() if landmarks else None,
+                self._distance_heuristic(weight),
+            )
+            if heuristic
+        ]
+        if len(heuristics) < 2:
+            return heuristics[0] if heuristics else None
+        return lambda node, target: max(
+            heuristic(node, target) for heuristic in heuristics
+        )
+
+    def _shortest_path(
+        self,
+        weight: weights.WeightFunction,
+        source: int,
+        target: int,
+        edge_weight: EdgeWeight,
+        bidirectional: bool,
+        statistics: SearchStatistics,
+    ) -> Tuple[float, List[int]]:
+        """
+        Calculate costs and edge indices of the shortest path on the search space
+        of the weight function, `edge_weight` is used for scalar weight functions.
+        """
+        search_space = self._search_space(weight)
+        if search_space:
+            graph, edge_costs = search_space
+            hierarchy = self.hierarchy(weight)
+            if hierarchy:
+                costs, path = hierarchy.shortest_path(source, target, statistics)
+                return costs, graph.edge_indices(path)
+            if bidirectional:
+                return bidirectional_dijkstra(
+                    graph, source, target, edge_costs, statistics
+                )
+
+            return astar_search(
+                graph,
+                source,
+                target,
+                weight=lambda prev_edge_index, edge_index: edge_costs.item(edge_index),
+                heuristic=self.heuristic(weight),
+                statistics=statistics,
+            )
+
+        if isinstance(weight, weights.TimeDependentWeightFunction):
+            if bidirectional:
+                logger.info(f"{weight} is time-dependent, searching forward only")
+            return time_dependent_search(
+                self.graph,
+                source,
+                target,
+                self.time_dependent_costs(weight),
+                heuristic=self.heuristic(weight),
+                statistics=statistics,
+            )
+
+        if bidirectional:
+            logger.info(f"{weight} is not vectorized, searching forward only")
+        return astar_search(
+            self.graph,
+            source,
+            target,
+            weight=edge_weight,
+            heuristic=self.heuristic(weight),
+            statistics=statistics,
         )
 
+    def search_path(
+        self,
+        origin_index: int,
+        destination_index: int,
+        weight: weights.WeightFunction,
+        bidirectional: bool = False,
+        statistics: Optional[SearchStatistics] = None,
+    ) -> ShortestPath:
+        """
+        Calculate the shortest path between two node indices.
+
+        With `bidirectional`, vectorized weight functions are searched from both
+        ends at once (bidirectional Dijkstra) instead of using A*. Contraction
+        hierarchies are always searched bidirectionally.
+
+        Calls of scalar weight functions are only measured, if `statistics` are
+        passed.
+        """
+        edge_models: Dict[int, models.Edge] = {}
+        edge_weight = self._edge_weight(weight, edge_models, statistics)
+        if statistics is None:
+            statistics = SearchStatistics()
+        if isinstance(weight, weights.VectorizedTurnWeightFunction):
+            expanded = self.expanded_graph(weight)
+            costs, edges = self._shortest_path(
+                weight,
+                expanded.source(origin_index),
+                expanded.target(destination_index),
+                edge_weight,
+                bidirectional,
+                statistics,
+            )
+            edges = expanded.to_edge_path(edges)
+        else:
+            costs, edges = self._shortest_path(
+                weight,
+                origin_index,
+                destination_index,
+                edge_weight,
+                bidirectional,
+                statistics,
+            )
+        nodes = [origin_index, *self.graph.targets[edges].tolist()]
+        return ShortestPath(costs, nodes, edges, edge_models, statistics.explored)
+
     @timeit
     def find_path(
         self,
         origin: models.Node,
         destination: models.Node,
         weight: weights.WeightFunction,
+        bidirectional: bool = False,
     ) -> List[models.Node]:
         """
         Calculate a route using the given weight.
         """
-        if origin.node_id not in self.graph.nodes:
-            raise exceptions.NodeDoesNotExist(f"{origin} does not exists.")
-        if origin.node_id not in self.graph.nodes:
-            raise exceptions.NodeDoesNotExist(f"{origin} does not exists.")
-
-        def _weight_wrapper(
-            graph: networkx.DiGraph,
-            prev_edge_nodes: Optional[Tuple[Any, Any]],
-            edge_nodes: Tuple[Any, Any],
-        ) -> float:
-            prev_edge: Optional[models.Edge] = None
-            if prev_edge_nodes:
-                prev_edge = models.Edge.from_graph(self.graph, *prev_edge_nodes)
-            edge = models.Edge.from_graph(self.graph, *edge_nodes)
-
-            return weight(prev_edge, edge)
-
         logger.info(
             f"Calculating path from {origin.osm_id} to {destination.osm_id} with {weight}"
         )
-        path = astar_path(
-            self.graph, origin.node_id, destination.node_id, weight=_weight_wrapper
+        path = self.search_path(
+            self._index_of(origin), self._index_of(destination), weight, bidirectional
         )
-        logger.info(f"Found path with {len(path)} items.")
-        return [models.Node.from_graph(self.graph, node_id) for node_id in path]
+        logger.info(
+            f"Found path with {len(path.nodes)} items, explored {path.explored} nodes."
+        )
+        return [models.Node.from_compiled(self.graph, index) for index in path.nodes]
 
     @timeit
     def route(
@@ -68,25 +687,257 @@ class Engine:
         destination: models.Location,
         weight_func: weights.WeightFunction,
         travel_time_func: weights.WeightFunction,
+        edges: bool = False,
+        bidirectional: bool = False,
+        metrics: Optional[models.RouteMetrics] = None,
     ) -> models.Route:
         """
         Calculate a shortest path.
+
+        Details of each edge along the path are only added if `edges` is set,
+        see `search_path` for `bidirectional`. Measurements of the route are
+        collected in `metrics`, if passed.
         """
+        start = time.perf_counter()
         origin_node = self.get_closest_node(origin)
         destination_node = self.get_closest_node(destination)
+        if metrics is not None:
+            metrics.snapping_time = time.perf_counter() - start
+        return self._route(
+            origin_node,
+            destination_node,
+            weight_func,
+            travel_time_func,
+            edges,
+            bidirectional,
+            metrics,
+        )
 
-        path = self.find_path(origin_node, destination_node, weight_func)
-        costs = self.costs_for_path(path, weight_func)
-        length = self.length_of_path(path)
-        travel_time = self.travel_time_of_path(path, func=travel_time_func)
+    def _route(
+        self,
+        origin_node: models.Node,
+        destination_node: models.Node,
+        weight_func: weights.WeightFunction,
+        travel_time_func: weights.WeightFunction,
+        edges: bool = False,
+        bidirectional: bool = False,
+        metrics: Optional[models.RouteMetrics] = None,
+    ) -> models.Route:
+        key = (
+            origin_node.node_id,
+            destination_node.node_id,
+            weight_func,
+            travel_time_func,
+            edges,
+            bidirectional,
+        )
+        version = self.map_version
+        if self.route_cache is not None:
+            self.route_cache.validate((version, weights.registry_version()))
+            cached_route = self.route_cache.get(key)
+            if cached_route is not None:
+                if metrics is not None:
+                    metrics.cached = True
+                return cached_route
+
+        statistics = SearchStatistics() if metrics is not None else None
+        start = time.perf_counter()
+        path = self.search_path(
+            self._index_of(origin_node),
+            self._index_of(destination_node),
+            weight_func,
+            bidirectional,
+            statistics,
+        )
+        summary_start = time.perf_counter()
+        route = self._summarize(path, weight_func, travel_time_func, edges)
+        if metrics is not None and statistics is not None:
+            metrics.search_time = summary_start - start
+            metrics.summary_time = time.perf_counter() - summary_start
+            metrics.explored = statistics.explored
+            metrics.relaxed = statistics.relaxed
+            metrics.weight_calls = statistics.weight_calls
+            metrics.weight_time = statistics.weight_time
+
+        # routes found on a map, which changed meanwhile, are outdated
+        if self.route_cache is not None and self.map_version == version:
+            self.route_cache.put(key, route)
+        return route
+
+    def _summarize(
+        self,
+        path: ShortestPath,
+        weight_func: weights.WeightFunction,
+        travel_time_func: weights.WeightFunction,
+        edges: bool,
+    ) -> models.Route:
+        """
+        Create a route from the result of a search.
+        """
+        length = float(self.graph.edge_data["length"][path.edges].sum())
+        if travel_time_func is weight_func:
+            travel_time = path.costs
+        else:
+            travel_time = self._costs_of_edges(
+                path.edges, travel_time_func, path.edge_models
+            )
 
-        route = models.Route(
-            costs=round(costs, 2),
+        latitudes = self.graph.node_data["y"][path.nodes].tolist()
+        longitudes = self.graph.node_data["x"][path.nodes].tolist()
+        return models.Route(
+            costs=round(path.costs, 2),
             length=round(length, 2),
             travel_time=round(travel_time, 2),
-            path=[models.Location(**node.dict()) for node in path],
+            # coordinates of the map are valid, skip validating each of them
+            path=[
+                models.Location.construct(latitude=latitude, longitude=longitude)
+                for latitude, longitude in zip(latitudes, longitudes)
+            ],
+            edges=self._route_edges(path, travel_time_func) if edges else None,
         )
-        return route
+
+    def _route_edges(
+        self, path: ShortestPath, travel_time_func: weights.WeightFunction
+    ) -> List[models.RouteEdge]:
+        """
+        Return the details of each edge along a path.
+        """
+        osm_ids = self.graph.edge_data["osmid"][path.edges].tolist()
+        lengths = self.graph.edge_data["length"][path.edges].tolist()
+        travel_times = self._values_of_edges(
+            path.edges, travel_time_func, path.edge_models
+        )
+        return [
+            models.RouteEdge(
+                osm_id=osm_id,
+                length=round(length, 2),
+                travel_time=round(travel_time, 2),
+            )
+            for osm_id, length, travel_time in zip(osm_ids, lengths, travel_times)
+        ]
+
+    def route_batch(
+        self,
+        pairs: Iterable[LocationPair],
+        weight_func: weights.WeightFunction,
+        travel_time_func: weights.WeightFunction,
+        batch_size: int = BATCH_SIZE,
+    ) -> Iterator[models.RouteResult]:
+        """
+        Calculate shortest paths for many pairs of origins and destinations.
+
+        Pairs are consumed lazily in chunks of `batch_size`. All locations of a chunk
+        are snapped at once and identical pairs of nodes are only routed once.
+        Results are returned in order, a pair without a path results in an error
+        instead of aborting the batch.
+        """
+        for chunk in chunked(pairs, batch_size):
+            nodes = self.get_closest_nodes(
+                [location for pair in chunk for location in pair]
+            )
+            results: Dict[Tuple[int, int], models.RouteResult] = {}
+            for origin_node, destination_node in zip(nodes[::2], nodes[1::2]):
+                key = (origin_node.node_id, destination_node.node_id)
+                if key not in results:
+                    try:
+                        route = self._route(
+                            origin_node, destination_node, weight_func, travel_time_func
+                        )
+                        results[key] = models.RouteResult(route=route)
+                    except exceptions.RoutorException as error:
+                        results[key] = models.RouteResult(error=str(error))
+                yield results[key]
+
+    @timeit
+    def matrix(
+        self,
+        origins: Sequence[models.Location],
+        destinations: Sequence[models.Location],
+        weight_func: weights.WeightFunction,
+        travel_time_func: weights.WeightFunction,
+    ) -> models.Matrix:
+        """
+        Calculate the shortest paths from all origins to all destinations.
+
+        A single one-to-many search per distinct origin node settles all
+        destinations, lengths and travel times are summed up along the search tree.
+        """
+        origin_indices = [
+            self._index_of(node) for node in self.get_closest_nodes(origins)
+        ]
+        destination_indices = [
+            self._index_of(node) for node in self.get_closest_nodes(destinations)
+        ]
+        shape = (len(origin_indices), len(destination_indices))
+        costs, lengths, travel_times = (numpy.full(shape, numpy.nan) for _ in range(3))
+        if not destination_indices:
+            return models.Matrix(
+                costs=costs, lengths=lengths, travel_times=travel_times
+            )
+
+        search = _OneToManySearch(self, weight_func, travel_time_func)
+        rows: Dict[int, List[int]] = {}
+        for row, origin_index in enumerate(origin_indices):
+            rows.setdefault(origin_index, []).append(row)
+        for origin_index, origin_rows in rows.items():
+            (
+                costs[origin_rows],
+                lengths[origin_rows],
+                travel_times[origin_rows],
+            ) = search.one_to_many(origin_index, destination_indices)
+
+        return models.Matrix(costs=costs, lengths=lengths, travel_times=travel_times)
+
+    @timeit
+    def isochrone(
+        self,
+        origin: models.Location,
+        max_costs: float,
+        weight_func: weights.WeightFunction,
+        polygon: bool = False,
+    ) -> models.Isochrone:
+        """
+        Find all nodes reachable from a location within the given costs.
+
+        A single search from the closest node stops as soon as the costs are
+        exceeded. The polygon is the convex hull of the reached nodes.
+        """
+        origin_index = self._index_of(self.get_closest_node(origin))
+        search = _OneToManySearch(self, weight_func, weight_func)
+        costs = search.within(origin_index, max_costs)
+        logger.info(f"Reached {len(costs)} nodes within {max_costs}")
+
+        indices = list(costs)
+        latitudes = self.graph.node_data["y"][indices].tolist()
+        longitudes = self.graph.node_data["x"][indices].tolist()
+        osm_ids = self.graph.node_ids[indices].tolist()
+        nodes = [
+            models.ReachedNode.construct(
+                latitude=latitude,
+                longitude=longitude,
+                osm_id=osm_id,
+                costs=round(node_costs, 2),
+            )
+            for latitude, longitude, osm_id, node_costs in zip(
+                latitudes, longitudes, osm_ids, costs.values()
+            )
+        ]
+
+        hull = None
+        if polygon:
+            points = MultiPoint(list(zip(longitudes, latitudes)))
+            hull = [
+                models.Location.construct(latitude=latitude, longitude=longitude)
+                for longitude, latitude in _exterior(points.convex_hull)
+            ]
+        return models.Isochrone(nodes=nodes, polygon=hull)
+
+    def _edges_of_path(self, path: List[models.Node]) -> List[int]:
+        """
+        Return the edge indices along a path.
+        """
+        indices = [self.graph.index_of(node.node_id) for node in path]
+        return self.graph.edge_indices(indices)
 
     @timeit
     def costs_for_path(
@@ -95,31 +946,57 @@ class Engine:
         """
         Calculate the costs for a given path.
         """
-        edges = (
-            models.Edge.from_nodes(self.graph, start, end)
-            for start, end in pairwise(path)
-        )
+        return self._costs_of_edges(self._edges_of_path(path), func)
 
-        costs: float = 0
-        for index, (prev_edge, edge) in enumerate(pairwise(edges)):
-            if index == 0:
-                costs = func(None, prev_edge)
+    def _costs_of_edges(
+        self,
+        edge_indices: List[int],
+        func: weights.WeightFunction,
+        edge_models: Optional[Dict[int, models.Edge]] = None,
+    ) -> float:
+        """
+        Calculate the costs for a path given as edge indices.
+        """
+        return sum(self._values_of_edges(edge_indices, func, edge_models))
 
-            costs += func(prev_edge, edge)
+    def _values_of_edges(
+        self,
+        edge_indices: List[int],
+        func: weights.WeightFunction,
+        edge_models: Optional[Dict[int, models.Edge]] = None,
+    ) -> List[float]:
+        """
+        Calculate the costs of each edge of a path given as edge indices.
 
-        return costs
+        Edges in `edge_models` are reused instead of being created again.
+        """
+        if not edge_indices:
+            return []
+        if isinstance(func, weights.VectorizedTurnWeightFunction):
+            return self.expanded_graph(func).path_values(
+                int(self.graph.sources[edge_indices[0]]), edge_indices
+            )
+        if isinstance(func, weights.VectorizedWeightFunction):
+            return self.edge_costs(func)[edge_indices].tolist()
+
+        edge_models = edge_models or {}
+        edges = [
+            edge_models.get(edge_index)
+            or models.Edge.from_compiled(self.graph, edge_index)
+            for edge_index in edge_indices
+        ]
+        return [
+            func(prev_edge, edge)
+            for prev_edge, edge in zip([None, *edges], edges)  # type: ignore
+        ]
 
     @timeit
     def length_of_path(self, path: List[models.Node]) -> float:
         """
         Calculate the length of a given path.
         """
-        edges = (
-            models.Edge.from_nodes(self.graph, start, end)
-            for start, end in pairwise(path)
-        )
-
-        return sum(edge.length for edge in edges)
+        edges = self._edges_of_path(path)
+        return float(self.graph.edge_data["length"][edges].sum())
 
     @timeit
     def travel_time_of_path(
@@ -135,9 +1012,149 @@ class Engine:
         """
         Get the closest node to a GPS location.
         """
-        node_id = osmnx.get_nearest_node(
-            self.graph, (location.latitude, location.longitude)
-        )
-        node = models.Node.from_graph(self.graph, node_id)
+        node = self.get_closest_nodes([location])[0]
         logger.info(f"Found closest node for {location} is {node.osm_id}")
         return node
+
+    @timeit
+    def get_closest_nodes(
+        self, locations: Sequence[models.Location]
+    ) -> List[models.Node]:
+        """
+        Get the closest node for each GPS location.
+        """
+        if not locations:
+            return []
+
+        indices = self.node_index.query(
+            numpy.array([location.latitude for location in locations]),
+            numpy.array([location.longitude for location in locations]),
+        )
+        return [models.Node.from_compiled(self.graph, index) for index in indices]
+
+
+def _exterior(geometry: BaseGeometry) -> List[Tuple[float, float]]:
+    """
+    Return the closed outline of a convex hull, which degenerates for less than
+    three distinct points.
+    """
+    if isinstance(geometry, Polygon):
+        return list(geometry.exterior.coords)
+    return list(geometry.coords)
+
+
+class _OneToManySearch:
+    """
+    One-to-many searches on the search space of a weight function.
+
+    Time-dependent weight functions enter each edge at the costs of reaching it,
+    same as `Engine.route`.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        weight_func: weights.WeightFunction,
+        travel_time_func: weights.WeightFunction,
+    ) -> None:
+        self.engine = engine
+        self.travel_time_func = travel_time_func
+        self.expanded: Optional[EdgeExpandedGraph] = None
+        self.graph = engine.graph
+        self.edge_weight = engine._edge_weight(weight_func)
+        self.time_dependent: Optional[TimeDependentWeight] = None
+        # costs of the search are travel times already
+        self.costs_are_travel_times = travel_time_func is weight_func
+
+        if isinstance(weight_func, weights.TimeDependentWeightFunction):
+            self.time_dependent = engine.time_dependent_costs(weight_func)
+        if isinstance(weight_func, weights.VectorizedTurnWeightFunction):
+            self.expanded = engine.expanded_graph(weight_func)
+            self.graph = self.expanded.graph
+        search_space = engine._search_space(weight_func)
+        if search_space:
+            costs = search_space[1]
+            self.edge_weight = lambda prev_edge_index, edge_index: costs.item(
+                edge_index
+            )
+
+        self.lengths = self._edge_values(engine.graph.edge_data["length"])
+        self.travel_times: Optional[numpy.ndarray] = None
+        if travel_time_func is weight_func and search_space:
+            self.travel_times = search_space[1]
+        elif isinstance(travel_time_func, weights.VectorizedWeightFunction):
+            self.travel_times = self._edge_values(engine.edge_costs(travel_time_func))
+
+    def _edge_values(self, values: numpy.ndarray) -> numpy.ndarray:
+        return self.expanded.edge_values(values) if self.expanded else values
+
+    def _base_edges(self, edge_path: List[int]) -> List[int]:
+        if not self.expanded:
+            return edge_path
+        base_edges = self.expanded.base_edges
+        return [int(base_edges[edge]) for edge in edge_path if base_edges[edge] >= 0]
+
+    def _tree(
+        self,
+        source: int,
+        targets: Optional[List[int]] = None,
+        max_costs: Optional[float] = None,
+    ) -> ShortestPathTree:
+        if self.time_dependent:
+            return time_dependent_tree(
+                self.graph, source, self.time_dependent, targets, max_costs
+            )
+        return shortest_path_tree(
+            self.graph, source, self.edge_weight, targets, max_costs
+        )
+
+    def one_to_many(
+        self, origin: int, destinations: List[int]
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        Return costs, lengths and travel times from the origin to all destinations.
+        """
+        source, targets = origin, destinations
+        if self.expanded:
+            source = self.expanded.source(origin)
+            targets = [self.expanded.target(node) for node in destinations]
+        tree = self._tree(source, targets)
+
+        lengths = tree.sums(self.lengths)
+        travel_times: Dict[int, float] = {}
+        if self.travel_times is not None:
+            travel_times = tree.sums(self.travel_times)
+        elif self.costs_are_travel_times:
+            travel_times = tree.costs
+        result = numpy.full((3, len(targets)), numpy.nan)
+        for column, target in enumerate(targets):
+            if target not in tree.costs:
+                continue
+            if target not in travel_times:
+                travel_times[target] = self.engine._costs_of_edges(
+                    self._base_edges(tree.edge_path(target)), self.travel_time_func
+                )
+            result[:, column] = (
+                tree.costs[target],
+                lengths[target],
+                travel_times[target],
+            )
+        return result[0], result[1], result[2]
+
+    def within(self, origin: int, max_costs: float) -> Dict[int, float]:
+        """
+        Return the costs of all nodes reachable from the origin within `max_costs`.
+
+        Nodes are ordered by their costs.
+        """
+        source = self.expanded.source(origin) if self.expanded else origin
+        tree = self._tree(source, max_costs=max_costs)
+        if not self.expanded:
+            return tree.costs
+
+        # a node is reached by several expanded nodes (one per entering edge)
+        costs: Dict[int, float] = {}
+        base_nodes = self.expanded.base_nodes
+        for node in tree.order:
+            costs.setdefault(int(base_nodes[node]), tree.costs[node])
+        return costs
@@ -12,3 +12,7 @@ class NodeDoesNotExist(GraphException):
 
 class EdgeDoesNotExist(GraphException):
     pass
+
+
+class PathDoesNotExist(GraphException):
+    pass
@@ -0,0 +1,173 @@
+import logging
+from typing import List, Optional, Tuple
+
+import numpy
+
+from .compiled import CompiledGraph
+from .utils.debug import timeit
+
+logger = logging.getLogger()
+
+
+def turns(graph: CompiledGraph) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Return all turns of a graph as pairs of (previous edge, edge) indices.
+
+    Turns are ordered by the previous edge and u-turns are included.
+    """
+    counts = numpy.diff(graph.offsets)[graph.targets]
+    prev_edges = numpy.repeat(numpy.arange(graph.edge_count, dtype=numpy.int64), counts)
+    first_turns = numpy.cumsum(counts) - counts
+    edges = (
+        numpy.repeat(graph.offsets[graph.targets], counts)
+        + numpy.arange(len(prev_edges), dtype=numpy.int64)
+        - numpy.repeat(first_turns, counts)
+    )
+    return prev_edges, edges
+
+
+class EdgeExpandedGraph:
+    """
+    Edge-based representation of a graph to materialize turn costs.
+
+    Each edge of the original graph is a node of the expanded graph and each turn
+    (a pair of consecutive edges) is an edge, which has the costs of the second
+    edge when coming from the first one.
+    Additionally, every original node has a source and a target terminal. Sources
+    are connected to all outgoing edges (costs of starting with that edge) and all
+    incoming edges are connected to the target (no costs).
+
+    Expanded node indices:
+    * `0 <= index < E` original edges
+    * `E <= index < E + N` source terminals
+    * `E + N <= index < E + 2N` target terminals
+    """
+
+    def __init__(
+        self, base: CompiledGraph, graph: CompiledGraph, costs: numpy.ndarray
+    ) -> None:
+        self.base = base
+        self.graph = graph
+        self.costs = costs
+        # original node of each expanded node (the end of edges)
+        node_indices = numpy.arange(base.node_count, dtype=numpy.int64)
+        self.base_nodes = numpy.concatenate([base.targets, node_indices, node_indices])
+        # original edge entered by each expanded edge (-1 for the target terminals)
+        self.base_edges = numpy.where(
+            graph.targets < base.edge_count, graph.targets, -1
+        )
+        self._base_node_list: Optional[List[int]] = None
+
+    @classmethod
+    @timeit
+    def build(
+        cls,
+        base: CompiledGraph,
+        prev_edges: numpy.ndarray,
+        edges: numpy.ndarray,
+        start_costs: numpy.ndarray,
+        turn_costs: numpy.ndarray,
+    ) -> "EdgeExpandedGraph":
+        """
+        Build the expanded graph.
+
+        `prev_edges` and `edges` are all turns as returned by `turns` and
+        `turn_costs` their costs. `start_costs` are the costs per original edge
+        if a path starts with it.
+        """
+        edge_count, node_count = base.edge_count, base.node_count
+        logger.info(f"Expanding graph with {len(prev_edges)} turns")
+
+        edge_indices = numpy.arange(edge_count, dtype=numpy.int64)
+        node_indices = numpy.arange(node_count, dtype=numpy.int64)
+        sources = numpy.concatenate(
+            [
+                prev_edges,
+                edge_count + base.sources,
+                edge_indices,
+                edge_count + node_indices,
+            ]
+        )
+        targets = numpy.concatenate(
+            [
+                edges,
+                edge_indices,
+                edge_count + node_count + base.targets,
+                edge_count + node_count + node_indices,  # empty path
+            ]
+        )
+        costs = numpy.concatenate(
+            [turn_costs, start_costs, numpy.zeros(edge_count), numpy.zeros(node_count)]
+        )
+
+        size = edge_count + 2 * node_count
+        order = numpy.argsort(sources, kind="stable")
+        offsets = numpy.zeros(size + 1, dtype=numpy.int64)
+        offsets[1:] = numpy.cumsum(numpy.bincount(sources, minlength=size))
+        graph = CompiledGraph(
+            node_ids=numpy.arange(size, dtype=numpy.int64),
+            offsets=offsets,
+            targets=targets[order],
+            node_data={},
+            edge_data={},
+            sources=sources[order],
+        )
+        return cls(base, graph, costs[order])
+
+    @property
+    def base_node_list(self) -> List[int]:
+        """
+        Return `base_nodes` as list, which is faster to look up single nodes.
+
+        The list is only created once.
+        """
+        if self._base_node_list is None:
+            self._base_node_list = self.base_nodes.tolist()
+        return self._base_node_list
+
+    def source(self, node: int) -> int:
+        """
+        Return the source terminal of an original node.
+        """
+        return self.base.edge_count + node
+
+    def target(self, node: int) -> int:
+        """
+        Return the target terminal of an original node.
+        """
+        return self.base.edge_count + self.base.node_count + node
+
+    def to_node_path(self, path: List[int]) -> List[int]:
+        """
+        Convert a path between two terminals into original node indices.
+        """
+        start = path[0] - self.base.edge_count
+        return [start] + [int(self.base.targets[edge]) for edge in path[1:-1]]
+
+    def to_edge_path(self, edges: List[int]) -> List[int]:
+        """
+        Convert the expanded edges of a path into original edge indices.
+        """
+        return [edge for edge in self.base_edges[edges].tolist() if edge >= 0]
+
+    def edge_values(self, values: numpy.ndarray) -> numpy.ndarray:
+        """
+        Map values of the original edges to the expanded edges entering them.
+        """
+        return numpy.where(self.base_edges >= 0, values[self.base_edges], 0.0)
+
+    def path_costs(self, start: int, edges: List[int]) -> float:
+        """
+        Return the costs of a path along the original edges.
+        """
+        return sum(self.path_values(start, edges))
+
+    def path_values(self, start: int, edges: List[int]) -> List[float]:
+        """
+        Return the costs of each original edge of a path, including turn costs.
+        """
+        path = [self.source(start), *edges]
+        return [
+            self.costs.item(self.graph.edge_index(prev, edge))
+            for prev, edge in zip(path, path[1:])
+        ]
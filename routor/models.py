@@ -1,10 +1,14 @@
-from typing import Any, List, Optional
+from typing import TYPE_CHECKING, Any, List, Optional
 
 import networkx
+import numpy
 from pydantic import BaseModel, Extra, Field, validator
 
 from routor import exceptions
 
+if TYPE_CHECKING:
+    from routor.compiled import CompiledGraph
+
 
 class Location(BaseModel):
     latitude: float  # alias: y
@@ -48,6 +52,16 @@ class Node(Location):
             **node_data,
         )
 
+    @classmethod
+    def from_compiled(cls, graph: "CompiledGraph", index: int) -> "Node":
+        node_data = graph.node_attributes(index)
+        return cls(
+            node_id=int(graph.node_ids[index]),
+            latitude=node_data["y"],
+            longitude=node_data["x"],
+            **node_data,
+        )
+
 
 class Edge(BaseModel):
     start: Node
@@ -80,9 +94,82 @@ class Edge(BaseModel):
 
         return cls(start=start, end=end, **edge_data)
 
+    @classmethod
+    def from_compiled(cls, graph: "CompiledGraph", edge: int) -> "Edge":
+        start = Node.from_compiled(graph, int(graph.sources[edge]))
+        end = Node.from_compiled(graph, int(graph.targets[edge]))
+        return cls(start=start, end=end, **graph.edge_attributes(edge))
+
+
+class RouteEdge(BaseModel):
+    """
+    Details of an edge along a route.
+    """
+
+    osm_id: int
+    length: float
+    travel_time: float
+
 
 class Route(BaseModel):
     costs: float
     length: float
     travel_time: float
     path: List[Location]
+    edges: Optional[List[RouteEdge]] = None  # only if requested
+
+
+class ReachedNode(Location):
+    osm_id: int
+    costs: float
+
+
+class Isochrone(BaseModel):
+    """
+    Nodes reachable within given costs, ordered by their costs.
+    """
+
+    nodes: List[ReachedNode]
+    # closed outline of the convex hull of the nodes, only if requested
+    polygon: Optional[List[Location]] = None
+
+
+class RouteMetrics(BaseModel):
+    """
+    Measurements of a single route, times are in seconds.
+
+    Weight function calls are only counted for scalar weight functions.
+    """
+
+    cached: bool = False
+    explored: int = 0
+    relaxed: int = 0
+    weight_calls: int = 0
+    weight_time: float = 0
+    snapping_time: float = 0
+    search_time: float = 0
+    summary_time: float = 0
+    serialization_time: float = 0  # only measured by the API
+
+
+class Matrix(BaseModel):
+    """
+    Costs, lengths and travel times from each origin (rows) to each destination
+    (columns), NaN if there is no route.
+    """
+
+    costs: numpy.ndarray
+    lengths: numpy.ndarray
+    travel_times: numpy.ndarray
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class RouteResult(BaseModel):
+    """
+    Result of a single origin/destination pair of a batch.
+    """
+
+    route: Optional[Route] = None
+    error: Optional[str] = None
@@ -0,0 +1,200 @@
+import logging
+import multiprocessing
+import os
+from collections import deque
+from multiprocessing.pool import AsyncResult
+from pathlib import Path
+from types import TracebackType
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    Union,
+)
+
+import numpy
+
+from . import models, weights
+from .engine import BATCH_SIZE, Engine
+from .utils.batch import LocationPair, chunked
+
+logger = logging.getLogger()
+
+# engine of a worker process, inherited from the parent when forking
+_engine: Optional[Engine] = None
+
+# registered weight functions are sent by name, others are pickled
+WeightReference = Union[str, weights.WeightFunction]
+
+
+def _to_reference(func: weights.WeightFunction) -> WeightReference:
+    return weights.get_function_name(func) or func
+
+
+def _from_reference(reference: WeightReference) -> weights.WeightFunction:
+    if isinstance(reference, str):
+        return weights.get_function(reference)
+    return reference
+
+
+def _init_worker(map_path: Path, mmap: bool) -> None:
+    global _engine
+    if _engine is None:
+        logger.debug(f"Loading map in worker {os.getpid()}")
+        _engine = Engine(map_path, mmap=mmap)
+
+
+def _route_batch(
+    pairs: List[LocationPair],
+    weight_ref: WeightReference,
+    travel_time_ref: WeightReference,
+) -> List[models.RouteResult]:
+    assert _engine is not None
+    return list(
+        _engine.route_batch(
+            pairs,
+            _from_reference(weight_ref),
+            _from_reference(travel_time_ref),
+            batch_size=len(pairs),
+        )
+    )
+
+
+def _matrix(
+    origins: List[models.Location],
+    destinations: List[models.Location],
+    weight_ref: WeightReference,
+    travel_time_ref: WeightReference,
+) -> models.Matrix:
+    assert _engine is not None
+    return _engine.matrix(
+        origins,
+        destinations,
+        _from_reference(weight_ref),
+        _from_reference(travel_time_ref),
+    )
+
+
+class EnginePool:
+    """
+    Pool of worker processes, which route on the map of an engine.
+
+    Workers are forked where possible and share the already loaded map
+    (copy-on-write, or the page cache for memory mapped maps). Otherwise, each
+    worker loads the map itself, use a memory mapped compiled map in that case.
+
+    Registered weight functions are passed to the workers by name, other weight
+    functions have to be picklable.
+    """
+
+    def __init__(self, engine: Engine, processes: Optional[int] = None) -> None:
+        global _engine
+        self.engine = engine
+        self.processes = processes or os.cpu_count() or 1
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        logger.info(f"Starting {self.processes} workers ({context.get_start_method()})")
+        # forked workers inherit the engine instead of loading the map again
+        _engine = engine
+        try:
+            self.pool = context.Pool(
+                self.processes,
+                initializer=_init_worker,
+                initargs=(engine.map_path, engine.mmap),
+            )
+        finally:
+            _engine = None
+
+    def __enter__(self) -> "EnginePool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop all workers.
+        """
+        self.pool.terminate()
+        self.pool.join()
+
+    def _ordered(
+        self, func: Callable[..., Any], tasks: Iterable[tuple]
+    ) -> Iterator[Any]:
+        """
+        Run tasks in the workers and yield their results in order.
+
+        Tasks are consumed lazily, at most two tasks per worker are queued.
+        """
+        pending: Deque[AsyncResult] = deque()
+        for task in tasks:
+            pending.append(self.pool.apply_async(func, task))
+            if len(pending) >= 2 * self.processes:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def route_batch(
+        self,
+        pairs: Iterable[LocationPair],
+        weight_func: weights.WeightFunction,
+        travel_time_func: weights.WeightFunction,
+        batch_size: int = BATCH_SIZE,
+    ) -> Iterator[models.RouteResult]:
+        """
+        Calculate shortest paths for many pairs of origins and destinations.
+
+        Chunks of `batch_size` pairs are distributed across the workers, the results
+        are streamed back in the order of the pairs.
+        """
+        weight_ref = _to_reference(weight_func)
+        travel_time_ref = _to_reference(travel_time_func)
+        tasks = (
+            (chunk, weight_ref, travel_time_ref) for chunk in chunked(pairs, batch_size)
+        )
+        for results in self._ordered(_route_batch, tasks):
+            yield from results
+
+    def matrix(
+        self,
+        origins: Sequence[models.Location],
+        destinations: Sequence[models.Location],
+        weight_func: weights.WeightFunction,
+        travel_time_func: weights.WeightFunction,
+    ) -> models.Matrix:
+        """
+        Calculate the shortest paths from all origins to all destinations.
+
+        The origins are split evenly across the workers.
+        """
+        weight_ref = _to_reference(weight_func)
+        travel_time_ref = _to_reference(travel_time_func)
+        chunk_size = max(1, -(-len(origins) // self.processes))
+        tasks = (
+            (chunk, list(destinations), weight_ref, travel_time_ref)
+            for chunk in chunked(origins, chunk_size)
+        )
+        matrices = list(self._ordered(_matrix, tasks))
+        if not matrices:
+            return self.engine.matrix(
+                origins, destinations, weight_func, travel_time_func
+            )
+        return models.Matrix(
+            costs=numpy.concatenate([matrix.costs for matrix in matrices]),
+            lengths=numpy.concatenate([matrix.lengths for matrix in matrices]),
+            travel_times=numpy.concatenate(
+                [matrix.travel_times for matrix in matrices]
+            ),
+        )
@@ -0,0 +1,109 @@
+from math import asin, cos, radians, sin, sqrt
+from typing import Optional
+
+import numpy
+from sklearn.neighbors import BallTree
+
+# same radius as used by osmnx to calculate edge lengths
+EARTH_RADIUS = 6_371_009
+
+
+class NodeIndex:
+    """
+    Spatial index to look up the closest nodes to GPS locations.
+
+    Distances are great-circle distances. The index is built on the first query,
+    so that creating engines stays cheap.
+    """
+
+    def __init__(self, latitudes: numpy.ndarray, longitudes: numpy.ndarray) -> None:
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self._tree: Optional[BallTree] = None
+
+    @property
+    def tree(self) -> BallTree:
+        """
+        Return the ball tree of all nodes, building it if necessary.
+        """
+        if self._tree is None:
+            self._tree = BallTree(
+                self._to_radians(self.latitudes, self.longitudes), metric="haversine"
+            )
+        return self._tree
+
+    @staticmethod
+    def _to_radians(
+        latitudes: numpy.ndarray, longitudes: numpy.ndarray
+    ) -> numpy.ndarray:
+        return numpy.deg2rad(
+            numpy.column_stack(
+                [numpy.atleast_1d(latitudes), numpy.atleast_1d(longitudes)]
+            )
+        )
+
+    def query(
+        self, latitudes: numpy.ndarray, longitudes: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+        Return the indices of the closest nodes.
+        """
+        indices = self.tree.query(
+            self._to_radians(latitudes, longitudes), k=1, return_distance=False
+        )
+        return indices[:, 0]
+
+
+class NodeCoordinates:
+    """
+    Node coordinates to calculate great-circle distances between single nodes.
+
+    The coordinate arrays (in degrees) are used as they are, so memory mapped
+    maps stay shared between processes.
+    """
+
+    def __init__(self, latitudes: numpy.ndarray, longitudes: numpy.ndarray) -> None:
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+
+    def distance(self, node: int, other: int) -> float:
+        """
+        Return the great-circle distance between two nodes in meters.
+        """
+        lat1 = radians(self.latitudes.item(node))
+        lat2 = radians(self.latitudes.item(other))
+        lon_sin = sin(
+            radians(self.longitudes.item(other) - self.longitudes.item(node)) / 2
+        )
+        lat_sin = sin((lat2 - lat1) / 2)
+        a = lat_sin * lat_sin + cos(lat1) * cos(lat2) * lon_sin * lon_sin
+        return 2 * EARTH_RADIUS * asin(sqrt(min(a, 1.0)))
+
+
+def distances(
+    lat1: numpy.ndarray, lon1: numpy.ndarray, lat2: numpy.ndarray, lon2: numpy.ndarray
+) -> numpy.ndarray:
+    """
+    Return the great-circle distances between many pairs of coordinates in meters.
+    """
+    lat1, lon1, lat2, lon2 = map(numpy.deg2rad, (lat1, lon1, lat2, lon2))
+    a = (
+        numpy.sin((lat2 - lat1) / 2) ** 2
+        + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+def bearings(
+    lat1: numpy.ndarray, lon1: numpy.ndarray, lat2: numpy.ndarray, lon2: numpy.ndarray
+) -> numpy.ndarray:
+    """
+    Return the compass bearings (0-360 degrees) between many pairs of coordinates.
+    """
+    lat1, lat2 = numpy.deg2rad(lat1), numpy.deg2rad(lat2)
+    d_lon = numpy.deg2rad(lon2 - lon1)
+    y = numpy.sin(d_lon) * numpy.cos(lat2)
+    x = numpy.cos(lat1) * numpy.sin(lat2) - numpy.sin(lat1) * numpy.cos(
+        lat2
+    ) * numpy.cos(d_lon)
+    return numpy.degrees(numpy.arctan2(y, x)) % 360
@@ -0,0 +1,194 @@
+"""
+Live traffic: travel times of edges changing at runtime, without reloading the map.
+"""
+
+import csv
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Iterable, List, Mapping, Optional, Tuple
+
+import numpy
+
+from . import exceptions
+from .compiled import CompiledGraph
+from .utils import graph as graph_utils
+
+logger = logging.getLogger()
+
+# columns selecting edges, either by the OSM ids of their nodes or by the id of
+# their way
+EDGE_COLUMNS = ("start", "end")
+WAY_COLUMN = "osmid"
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or value == ""
+
+
+def find_edges(graph: CompiledGraph, row: Mapping[str, Any]) -> numpy.ndarray:
+    """
+    Return the indices of the edges selected by a row, either by the OSM ids of
+    their nodes (start, end) or by the id of their way (osmid).
+    """
+    if not any(_is_missing(row.get(column)) for column in EDGE_COLUMNS):
+        start, end = (graph.index_of(int(row[column])) for column in EDGE_COLUMNS)
+        edge = graph.edge_index(start, end)
+        return numpy.array([edge], dtype=numpy.int64)
+
+    if _is_missing(row.get(WAY_COLUMN)):
+        raise ValueError(f"{row} selects no edges, either start and end or osmid")
+    edges = graph.way_edges(int(row[WAY_COLUMN]))
+    if not len(edges):
+        raise exceptions.EdgeDoesNotExist(f"Way {row[WAY_COLUMN]} does not exist.")
+    return edges
+
+
+def _file_stat(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class TrafficOverlay:
+    """
+    Live travel times (in seconds) of all edges of a map.
+
+    Travel times are stored in a compact float32 array, `nan` for edges without
+    live data. Updates replace the whole array at once, so readers always see a
+    consistent state without locking. Optionally, travel times are read from a
+    file, which is reloaded once it has been replaced (see `refresh`).
+    """
+
+    def __init__(self, graph: CompiledGraph) -> None:
+        self.graph = graph
+        self.travel_times = numpy.full(graph.edge_count, numpy.nan, dtype=numpy.float32)
+        # increased with every update
+        self.version = 0
+        self.path: Optional[Path] = None
+        self._stat: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def edge_count(self) -> int:
+        """
+        Return the number of edges with live travel times.
+        """
+        return int(numpy.count_nonzero(~numpy.isnan(self.travel_times)))
+
+    def update(
+        self, edges: numpy.ndarray, travel_times: numpy.ndarray, replace: bool = False
+    ) -> None:
+        """
+        Set the live travel times of edges, `nan` removes them.
+
+        With `replace`, the live travel times of all other edges are removed.
+        """
+        travel_times = numpy.asarray(travel_times, dtype=numpy.float64)
+        invalid = (travel_times < 0) | numpy.isinf(travel_times)
+        if invalid.any():
+            raise ValueError(
+                f"Invalid travel times {travel_times[invalid][:5].tolist()}, "
+                "they have to be finite and not negative."
+            )
+        with self._lock:
+            if replace:
+                updated = numpy.full_like(self.travel_times, numpy.nan)
+            else:
+                updated = self.travel_times.copy()
+            updated[edges] = travel_times
+            self.travel_times = updated
+            self.version += 1
+
+    def clear(self) -> None:
+        """
+        Remove all live travel times.
+        """
+        self.update(numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0), replace=True)
+
+    def parse_rows(
+        self, rows: Iterable[Mapping[str, Any]]
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Return the edges and live travel times of rows.
+
+        Edges are selected as in `find_edges`, travel times are given in seconds
+        (travel_time) or calculated from a speed (speed_kph). Rows without either
+        remove live travel times, rows selecting unknown edges are skipped.
+        """
+        lengths = numpy.asarray(self.graph.edge_data["length"], dtype=numpy.float64)
+        all_edges: List[numpy.ndarray] = [numpy.zeros(0, dtype=numpy.int64)]
+        all_travel_times: List[numpy.ndarray] = [numpy.zeros(0)]
+        for row in rows:
+            try:
+                edges = find_edges(self.graph, row)
+            except exceptions.GraphException as error:
+                logger.warning(f"Skipping traffic {row}: {error}")
+                continue
+
+            if not _is_missing(row.get("travel_time")):
+                travel_times = numpy.full(len(edges), float(row["travel_time"]))
+            elif not _is_missing(row.get("speed_kph")):
+                speeds = numpy.full(len(edges), float(row["speed_kph"]))
+                with numpy.errstate(divide="ignore"):
+                    travel_times = graph_utils.travel_times(lengths[edges], speeds)
+            else:
+                travel_times = numpy.full(len(edges), numpy.nan)
+            all_edges.append(edges)
+            all_travel_times.append(travel_times)
+        return numpy.concatenate(all_edges), numpy.concatenate(all_travel_times)
+
+    def load(self, path: Path) -> None:
+        """
+        Replace all live travel times with those of a file.
+
+        `.npy` files contain the travel times of all edges (`nan` for edges
+        without live data), other files are CSV files with a header, see
+        `parse_rows` for their columns.
+        """
+        if path.suffix == ".npy":
+            travel_times = numpy.load(path)
+            if travel_times.shape != (self.graph.edge_count,):
+                raise ValueError(
+                    f"{path} contains {travel_times.shape} travel times "
+                    f"for {self.graph.edge_count} edges."
+                )
+            edges = numpy.arange(self.graph.edge_count)
+        else:
+            with open(path, newline="") as file:
+                edges, travel_times = self.parse_rows(csv.DictReader(file))
+        self.update(edges, travel_times, replace=True)
+        logger.info(f"Loaded live travel times of {self.edge_count} edges from {path}")
+
+    def watch(self, path: Path) -> None:
+        """
+        Load live travel times from a file, which is reloaded by `refresh`.
+
+        Replace the file atomically (eg. write a temporary file and rename it),
+        so that it is never read while being written.
+        """
+        self.path = path
+        self._stat = _file_stat(path)
+        self.load(path)
+
+    def refresh(self) -> bool:
+        """
+        Reload the watched file if it has been modified or replaced since it was
+        loaded. Return whether it has been reloaded.
+
+        Invalid files are logged and skipped, the current travel times are kept.
+        """
+        if self.path is None:
+            return False
+        try:
+            stat = _file_stat(self.path)
+        except FileNotFoundError:
+            return False
+        if stat == self._stat:
+            return False
+        self._stat = stat
+        try:
+            self.load(self.path)
+        except (OSError, ValueError) as error:
+            logger.error(f"Skipping traffic of {self.path}: {error}")
+            return False
+        return True
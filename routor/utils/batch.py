@@ -0,0 +1,76 @@
+import csv
+import json
+from itertools import islice
+from typing import Iterable, Iterator, List, TextIO, Tuple, TypeVar
+
+from .. import models
+
+T = TypeVar("T")
+
+LocationPair = Tuple[models.Location, models.Location]
+
+CSV_COLUMNS = (
+    "origin_latitude",
+    "origin_longitude",
+    "destination_latitude",
+    "destination_longitude",
+)
+FORMATS = ("csv", "jsonl")
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split items into lists of the given size, the last one might be shorter.
+    """
+    iterator = iter(items)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def read_csv_pairs(file: TextIO) -> Iterator[LocationPair]:
+    """
+    Read origins and destinations from a CSV file with a header.
+
+    Required columns: origin_latitude, origin_longitude, destination_latitude,
+    destination_longitude
+    """
+    reader = csv.DictReader(file)
+    missing = set(CSV_COLUMNS) - set(reader.fieldnames or [])
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    for row in reader:
+        values = [float(row[column]) for column in CSV_COLUMNS]
+        yield (
+            models.Location(latitude=values[0], longitude=values[1]),
+            models.Location(latitude=values[2], longitude=values[3]),
+        )
+
+
+def read_jsonl_pairs(file: TextIO) -> Iterator[LocationPair]:
+    """
+    Read origins and destinations from a file with one JSON object per line.
+
+    Format: {"origin": {"latitude": ..., "longitude": ...}, "destination": {...}}
+    """
+    for line in file:
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        yield (
+            models.Location(**data["origin"]),
+            models.Location(**data["destination"]),
+        )
+
+
+def read_pairs(file: TextIO, format: str) -> Iterator[LocationPair]:
+    """
+    Read origins and destinations lazily from a CSV or JSONL file.
+    """
+    if format == "csv":
+        return read_csv_pairs(file)
+    if format == "jsonl":
+        return read_jsonl_pairs(file)
+    raise ValueError(f"Unsupported format {format}, expected one of {FORMATS}")
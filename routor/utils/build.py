@@ -0,0 +1,339 @@
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy
+import osmnx
+
+from .. import exceptions
+from ..compiled import Column, CompiledGraph, to_column
+from . import graph as graph_utils
+from . import osm
+from .debug import timeit
+
+logger = logging.getLogger()
+
+# same filter as used by osmnx to download the "drive" network
+DRIVE_FILTER = {
+    "area": re.compile("yes"),
+    "access": re.compile("private"),
+    "highway": re.compile(
+        "abandoned|bridleway|bus_guideway|construction|corridor|cycleway|elevator|"
+        "escalator|footway|path|pedestrian|planned|platform|proposed|raceway|"
+        "service|steps|track"
+    ),
+    "motor_vehicle": re.compile("no"),
+    "motorcar": re.compile("no"),
+    "service": re.compile(
+        "alley|driveway|emergency_access|parking|parking_aisle|private"
+    ),
+}
+
+# values of the oneway tag, same as used by osmnx
+ONEWAY_VALUES = {"yes", "true", "1", "-1", "reverse", "T", "F"}
+REVERSED_VALUES = {"-1", "reverse", "T"}
+
+
+def is_drivable(tags: osm.Tags) -> bool:
+    """
+    Check whether a way is part of the network for cars.
+    """
+    if "highway" not in tags:
+        return False
+    return not any(
+        key in tags and pattern.search(tags[key])
+        for key, pattern in DRIVE_FILTER.items()
+    )
+
+
+class Ways(NamedTuple):
+    """
+    Drivable ways of an OSM file.
+    """
+
+    way_ids: numpy.ndarray
+    # nodes of all ways, those of way `i` are at `offsets[i]:offsets[i + 1]`
+    refs: numpy.ndarray
+    offsets: numpy.ndarray
+    tags: List[osm.Tags]
+
+
+def drivable_ways(ways: Iterable[osm.Way], way_tags: List[str]) -> Ways:
+    """
+    Collect all drivable ways, only the given tags are kept.
+    """
+    way_ids: List[int] = []
+    refs: List[numpy.ndarray] = []
+    tags: List[osm.Tags] = []
+    for way in ways:
+        if len(way.refs) < 2 or not is_drivable(way.tags):
+            continue
+        way_ids.append(way.way_id)
+        refs.append(way.refs)
+        tags.append({key: way.tags[key] for key in way_tags if key in way.tags})
+
+    offsets = numpy.zeros(len(refs) + 1, dtype=numpy.int64)
+    offsets[1:] = numpy.cumsum([len(way_refs) for way_refs in refs])
+    return Ways(
+        numpy.array(way_ids, dtype=numpy.int64),
+        numpy.concatenate(refs) if refs else numpy.zeros(0, dtype=numpy.int64),
+        offsets,
+        tags,
+    )
+
+
+@timeit
+def read_drivable_ways(path: Path, way_tags: List[str]) -> Ways:
+    """
+    Read all drivable ways of an OSM file, only the given tags are kept.
+    """
+    return drivable_ways(osm.read_ways(path), way_tags)
+
+
+class Nodes(NamedTuple):
+    node_ids: numpy.ndarray
+    latitudes: numpy.ndarray
+    longitudes: numpy.ndarray
+    tags: Dict[int, osm.Tags]
+
+
+def lookup(sorted_ids: numpy.ndarray, ids: numpy.ndarray) -> numpy.ndarray:
+    """
+    Return the positions of ids within sorted ids, -1 for missing ids.
+    """
+    positions = numpy.searchsorted(sorted_ids, ids)
+    found = positions < len(sorted_ids)
+    found[found] = sorted_ids[positions[found]] == ids[found]
+    return numpy.where(found, positions, -1)
+
+
+@timeit
+def read_nodes(path: Path, node_ids: numpy.ndarray, node_tags: List[str]) -> Nodes:
+    """
+    Read coordinates and the given tags of the nodes with the given (sorted) ids.
+
+    Nodes missing in the file are not returned.
+    """
+    latitudes = numpy.full(len(node_ids), numpy.nan)
+    longitudes = numpy.full(len(node_ids), numpy.nan)
+    tags: Dict[int, osm.Tags] = {}
+    for block in osm.read_nodes(path):
+        positions = lookup(node_ids, block.node_ids)
+        found = positions >= 0
+        latitudes[positions[found]] = block.latitudes[found]
+        longitudes[positions[found]] = block.longitudes[found]
+
+        tagged = numpy.fromiter(block.tags, dtype=numpy.int64, count=len(block.tags))
+        for node_id in tagged[lookup(node_ids, tagged) >= 0].tolist():
+            useful = {
+                key: block.tags[node_id][key]
+                for key in node_tags
+                if key in block.tags[node_id]
+            }
+            if useful:
+                tags[node_id] = useful
+
+    found = ~numpy.isnan(latitudes)
+    return Nodes(node_ids[found], latitudes[found], longitudes[found], tags)
+
+
+def way_edges(ways: Ways) -> Dict[str, numpy.ndarray]:
+    """
+    Split ways into edges between consecutive nodes, one for each direction.
+    """
+    lengths = numpy.diff(ways.offsets)
+    is_last = numpy.zeros(len(ways.refs), dtype=bool)
+    is_last[ways.offsets[1:] - 1] = True
+    starts = numpy.flatnonzero(~is_last)
+    way = numpy.repeat(numpy.arange(len(ways.way_ids)), lengths - 1)
+
+    oneway = numpy.array(
+        [
+            tags.get("oneway") in ONEWAY_VALUES or tags.get("junction") == "roundabout"
+            for tags in ways.tags
+        ],
+        dtype=bool,
+    )
+    reverse = numpy.array(
+        [tags.get("oneway") in REVERSED_VALUES for tags in ways.tags], dtype=bool
+    )
+    sources, targets = ways.refs[starts], ways.refs[starts + 1]
+    # reversed one-way streets are only passable against the order of their nodes
+    sources, targets = (
+        numpy.where(reverse[way], targets, sources),
+        numpy.where(reverse[way], sources, targets),
+    )
+
+    backward = ~oneway[way]
+    way = numpy.concatenate([way, way[backward]])
+    return {
+        "sources": numpy.concatenate([sources, targets[backward]]),
+        "targets": numpy.concatenate([targets, sources[backward]]),
+        "way": way,
+        "oneway": oneway[way],
+    }
+
+
+def _largest_component(
+    sources: numpy.ndarray, targets: numpy.ndarray, node_count: int
+) -> numpy.ndarray:
+    """
+    Return a mask of all nodes of the biggest weakly connected network.
+
+    Each node points to the smallest node of its network found so far, those
+    are linked along edges between different networks until all are merged.
+    """
+    labels = numpy.arange(node_count)
+    while True:
+        start, end = labels[sources], labels[targets]
+        different = start != end
+        if not different.any():
+            break
+        smaller = numpy.minimum(start[different], end[different])
+        numpy.minimum.at(labels, start[different], smaller)
+        numpy.minimum.at(labels, end[different], smaller)
+        # let all nodes point to the smallest node of their network
+        while True:
+            jumped = labels[labels]
+            if numpy.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels == numpy.argmax(numpy.bincount(labels))
+
+
+def select_edges(
+    edges: Dict[str, numpy.ndarray], nodes: Nodes
+) -> Dict[str, numpy.ndarray]:
+    """
+    Return the edges between nodes of the biggest connected network, sorted by
+    their source.
+
+    Edges to nodes outside of the extract and parallel edges are skipped.
+    """
+    sources = lookup(nodes.node_ids, edges["sources"])
+    targets = lookup(nodes.node_ids, edges["targets"])
+    valid = numpy.flatnonzero((sources >= 0) & (targets >= 0))
+    _, first = numpy.unique(
+        numpy.column_stack([sources[valid], targets[valid]]), axis=0, return_index=True
+    )
+    keep = valid[numpy.sort(first)]
+    if not len(keep):
+        raise exceptions.GraphException("The map does not contain any streets.")
+
+    component = _largest_component(sources[keep], targets[keep], len(nodes.node_ids))
+    keep = keep[component[sources[keep]]]
+    # store the outgoing edges of each node consecutively
+    keep = keep[numpy.argsort(sources[keep], kind="stable")]
+    new_index = numpy.cumsum(component) - 1
+    return {
+        "component": component,
+        "sources": new_index[sources[keep]],
+        "targets": new_index[targets[keep]],
+        "way": edges["way"][keep],
+        "oneway": edges["oneway"][keep],
+    }
+
+
+def way_edge_data(
+    ways: Ways, way_tags: List[str], edges: Dict[str, numpy.ndarray]
+) -> Dict[str, Column]:
+    """
+    Return the tags of the ways of all edges.
+    """
+    way = edges["way"]
+    edge_data: Dict[str, Column] = {"osmid": ways.way_ids[way]}
+    for key in way_tags:
+        column = to_column([tags.get(key) for tags in ways.tags])
+        if not all(value is None for value in column):
+            edge_data[key] = column[way]
+    edge_data["oneway"] = edges["oneway"]
+    return edge_data
+
+
+def _node_data(
+    nodes: Nodes, node_tags: List[str], edges: Dict[str, numpy.ndarray]
+) -> Dict[str, Column]:
+    """
+    Return coordinates and tags of all nodes.
+    """
+    component = edges["component"]
+    node_ids = nodes.node_ids[component]
+    node_data: Dict[str, Column] = {
+        "y": nodes.latitudes[component],
+        "x": nodes.longitudes[component],
+        "osmid": node_ids,
+    }
+    for key in node_tags:
+        column = to_column(
+            [nodes.tags.get(node_id, {}).get(key) for node_id in node_ids.tolist()]
+        )
+        if not all(value is None for value in column):
+            node_data[key] = column
+    return node_data
+
+
+@timeit
+def build_map(
+    path: Path,
+    node_tags: Optional[List[str]] = None,
+    edge_tags: Optional[List[str]] = None,
+) -> CompiledGraph:
+    """
+    Build a compiled map from a local OSM XML or PBF file.
+
+    The file is streamed twice: first, all drivable ways are read, afterwards
+    the coordinates of their nodes. Neither the whole file nor a networkx graph
+    is held in memory. The map is enhanced with the same attributes as
+    downloaded maps (except elevation), calculated for all edges at once.
+    """
+    way_tags = sorted(
+        set(osmnx.settings.useful_tags_way + ["junction"] + (edge_tags or []))
+    )
+    useful_node_tags = sorted(
+        set(osmnx.settings.useful_tags_node + ["junction"] + (node_tags or []))
+    )
+
+    logger.info(f"Reading ways of {path}")
+    ways = read_drivable_ways(path, way_tags)
+    edges = way_edges(ways)
+    logger.info(f"Reading nodes of {len(ways.way_ids)} ways")
+    nodes = read_nodes(
+        path,
+        numpy.unique(numpy.concatenate([edges["sources"], edges["targets"]])),
+        useful_node_tags,
+    )
+
+    logger.info("Keeping the biggest connected network")
+    edges = select_edges(edges, nodes)
+    component = edges["component"]
+
+    logger.info("Enhance map with additional attributes")
+    edge_data = way_edge_data(ways, way_tags, edges)
+    node_data = _node_data(nodes, useful_node_tags, edges)
+    graph_utils.enhance_columns(
+        node_data,
+        edge_data,
+        edges["sources"],
+        edges["targets"],
+        node_ids=node_data["osmid"],
+    )
+
+    node_count = int(component.sum())
+    offsets = numpy.zeros(node_count + 1, dtype=numpy.int64)
+    offsets[1:] = numpy.cumsum(numpy.bincount(edges["sources"], minlength=node_count))
+    return CompiledGraph(
+        node_ids=node_data["osmid"],
+        offsets=offsets,
+        targets=edges["targets"],
+        node_data=node_data,
+        edge_data=edge_data,
+        graph_data={
+            "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "created_with": "routor",
+            "crs": "epsg:4326",
+            "simplified": False,
+        },
+        sources=edges["sources"],
+    )
@@ -1,3 +1,4 @@
+import functools
 import logging
 import time
 from typing import Any, Callable, TypeVar, cast
@@ -10,12 +11,18 @@ Func = TypeVar('Func', bound=Callable[..., Any])
 def timeit(func: Func) -> Func:
     """
     Measure and log execution time of the decorated function.
+
+    Nothing is measured unless debug logging is enabled.
     """
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start = time.time()
+        if not logger.isEnabledFor(logging.DEBUG):
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
         result = func(*args, **kwargs)
-        end = time.time()
+        end = time.perf_counter()
         logger.debug(f"{func.__qualname__}: {end - start} s")
         return result
 
@@ -1,31 +1,86 @@
 import contextlib
+import json
 import logging
+import math
+import re
 from pathlib import Path
-from typing import Any, Callable, Generator, List, Optional
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import networkx
+import numpy
 import osmnx
 
+from .. import spatial
+from ..compiled import Column, CompiledGraph
 from .debug import timeit
 
 logger = logging.getLogger()
 
+COMPILED_MAP_SUFFIX = ".npz"
+
+# speed of highway types without any maxspeed in kph
+FALLBACK_SPEED = 30.0
+MPH_TO_KPH = 1.60934
+
+
+def is_compiled_map(map_path: Path) -> bool:
+    """
+    Check whether the path points to a compiled map.
+    """
+    return map_path.suffix == COMPILED_MAP_SUFFIX
+
 
 @timeit
 def load_map(map_path: Path) -> networkx.DiGraph:
     """
-    Load graph from a .graphml file.
+    Load graph from a .graphml or a compiled .npz file.
     """
+    if is_compiled_map(map_path):
+        return CompiledGraph.load(map_path).to_graph()
+
     graph = osmnx.io.load_graphml(map_path)
     return graph
 
 
+@timeit
+def load_compiled_map(map_path: Path, mmap: bool = False) -> CompiledGraph:
+    """
+    Load a compiled graph from a .graphml or a compiled .npz file.
+
+    Compiled maps are loaded without creating a networkx graph.
+    If `mmap` is set, the arrays of compiled maps are memory mapped (read-only),
+    so that all processes loading the same map share its memory.
+    """
+    if is_compiled_map(map_path):
+        return CompiledGraph.load(map_path, mmap=mmap)
+
+    if mmap:
+        logger.warning(
+            f"{map_path} is not a compiled map and can not be memory mapped."
+        )
+    return CompiledGraph.from_graph(load_map(map_path))
+
+
 @contextlib.contextmanager
 def osmnx_config(
-    node_tags: List[str], edge_tags: List[str]
+    node_tags: List[str],
+    edge_tags: List[str],
+    overpass_endpoint: Optional[str] = None,
 ) -> Generator[None, None, None]:
     """
-    Prepare osmnx config for downloading data.
+    Prepare osmnx config for downloading data, optionally from another Overpass
+    API endpoint.
     """
     # aggregate default tags
     useful_node_tags = set(
@@ -48,13 +103,16 @@ def osmnx_config(
     original_settings = {
         "all_oneway": osmnx.settings.all_oneway,
         "useful_tags_node": osmnx.settings.useful_tags_node,
-        "useful_tags_way": osmnx.settings.useful_tags_node,
+        "useful_tags_way": osmnx.settings.useful_tags_way,
     }
     new_settings = {
         "all_oneway": False,  # we need digraph, an edge for each direction
         "useful_tags_node": useful_node_tags,
         "useful_tags_way": useful_edge_tags,
     }
+    if overpass_endpoint:
+        original_settings["overpass_endpoint"] = osmnx.settings.overpass_endpoint
+        new_settings["overpass_endpoint"] = overpass_endpoint
     try:
         logger.debug("Update osmnx configuration", extra=new_settings)
         osmnx.config(**new_settings)
@@ -64,34 +122,252 @@ def osmnx_config(
         osmnx.config(**original_settings)
 
 
-@timeit
-def tag_roundabout_nodes(graph: networkx.DiGraph) -> None:
+def _objects(values: Union[Sequence[Any], Column]) -> Column:
+    """
+    Return values as object column, lists are kept as single values.
+    """
+    return numpy.fromiter(values, dtype=object, count=len(values))
+
+
+def roundabout_junctions(
+    sources: numpy.ndarray,
+    targets: numpy.ndarray,
+    edge_junctions: Column,
+    node_junctions: Column,
+    node_ids: Optional[Union[Sequence[Any], Column]] = None,
+) -> Column:
     """
-    Tag nodes within a roundabout as junction=roundabout.
+    Return the junction tags of all nodes, nodes within a roundabout are tagged
+    as junction=roundabout.
 
     Not every node within a roundabout is always tagged accordingly. Let's fix that.
     More information:
     * https://wiki.openstreetmap.org/wiki/Key:junction
     * https://wiki.openstreetmap.org/wiki/Tag:junction%3Droundabout
     """
-    for u, v, edge_data in graph.edges(data=True):
-        if edge_data.get("junction", None) != "roundabout":
-            continue
+    roundabout = _objects(edge_junctions) == "roundabout"
+    nodes = numpy.unique(numpy.concatenate([sources[roundabout], targets[roundabout]]))
+    junctions = _objects(node_junctions)
+    # no need to do anything for "circular" as this is a "roundabout"
+    # https://wiki.openstreetmap.org/wiki/Tag:junction%3Dcircular?
+    nodes = nodes[junctions[nodes] != "circular"]
+    for index in nodes.tolist():
+        if junctions[index] not in (None, "roundabout"):
+            logger.warning(
+                "Node %s was already tagged with `junction='%s'`.",
+                index if node_ids is None else node_ids[index],
+                junctions[index],
+            )
+    junctions[nodes] = "roundabout"
+    return junctions
+
 
-        for node_id in (u, v):
-            node_data = graph.nodes[node_id]
-            if node_data.get("junction", None) == "circular":
-                # no need to do anything as this is a "roundabout"
-                # https://wiki.openstreetmap.org/wiki/Tag:junction%3Dcircular?
-                continue
+def street_counts(
+    sources: numpy.ndarray,
+    targets: numpy.ndarray,
+    node_count: int,
+    keys: Optional[numpy.ndarray] = None,
+) -> numpy.ndarray:
+    """
+    Return the number of physical streets connected to each node.
 
-            if "junction" in node_data and node_data["junction"] != "roundabout":
-                logger.warning(
-                    "Node %s was already tagged with `junction='%s'`.",
-                    node_id,
-                    node_data["junction"],
-                )
-            node_data["junction"] = "roundabout"
+    Both directions of a street are counted once, self-loops are counted twice
+    (same as `osmnx.utils_graph.count_streets_per_node`).
+    """
+    if keys is None:
+        keys = numpy.zeros(len(sources), dtype=numpy.int64)
+    streets = numpy.unique(
+        numpy.column_stack(
+            [numpy.minimum(sources, targets), numpy.maximum(sources, targets), keys]
+        ),
+        axis=0,
+    )
+    return numpy.bincount(streets[:, :2].ravel(), minlength=node_count)
+
+
+def edge_lengths(
+    latitudes: numpy.ndarray,
+    longitudes: numpy.ndarray,
+    sources: numpy.ndarray,
+    targets: numpy.ndarray,
+) -> numpy.ndarray:
+    """
+    Return the great-circle length of all edges in meters.
+    """
+    return spatial.distances(
+        latitudes[sources], longitudes[sources], latitudes[targets], longitudes[targets]
+    ).round(3)
+
+
+def edge_bearings(
+    latitudes: numpy.ndarray,
+    longitudes: numpy.ndarray,
+    sources: numpy.ndarray,
+    targets: numpy.ndarray,
+) -> numpy.ndarray:
+    """
+    Return the bearing of all edges, which is undefined (`nan`) for self-loops.
+    """
+    bearings = spatial.bearings(
+        latitudes[sources], longitudes[sources], latitudes[targets], longitudes[targets]
+    ).round(1)
+    bearings[sources == targets] = numpy.nan
+    return bearings
+
+
+def parse_maxspeed(value: Any) -> float:
+    """
+    Parse a maxspeed tag (or a list of them) in kph, same as osmnx.
+    """
+    if isinstance(value, list):
+        speeds = [parse_maxspeed(item) for item in value]
+        speeds = [speed for speed in speeds if not numpy.isnan(speed)]
+        return float(int(numpy.mean(speeds))) if speeds else numpy.nan
+    try:
+        speed = float(re.sub(r"[^\d\.,;]", "", str(value)).replace(",", "."))
+    except ValueError:
+        return numpy.nan
+    if "mph" in str(value).lower():
+        speed *= MPH_TO_KPH
+    return speed
+
+
+def edge_speeds(highways: Column, maxspeeds: Optional[Column] = None) -> numpy.ndarray:
+    """
+    Return the speed of all edges in kph based on their maxspeed.
+
+    Missing speeds are the mean speed of all edges of the same highway type
+    (or `FALLBACK_SPEED`), same as `osmnx.speed.add_edge_speeds`.
+    """
+    types = [
+        str(highway[0] if isinstance(highway, list) else highway)
+        for highway in highways
+    ]
+    type_names, type_codes = numpy.unique(types, return_inverse=True)
+    if maxspeeds is None:
+        speeds = numpy.full(len(types), numpy.nan)
+    else:
+        values = [json.dumps(value, default=str) for value in maxspeeds]
+        unique_values, codes = numpy.unique(values, return_inverse=True)
+        speeds = numpy.array(
+            [parse_maxspeed(json.loads(value)) for value in unique_values]
+        )[codes]
+
+    known = ~numpy.isnan(speeds)
+    totals = numpy.bincount(type_codes[known], speeds[known], len(type_names))
+    counts = numpy.bincount(type_codes[known], minlength=len(type_names))
+    means = numpy.full(len(type_names), FALLBACK_SPEED)
+    means[counts > 0] = totals[counts > 0] / counts[counts > 0]
+    return numpy.where(known, speeds, means[type_codes]).round(1)
+
+
+def travel_times(lengths: numpy.ndarray, speeds: numpy.ndarray) -> numpy.ndarray:
+    """
+    Return the travel time of all edges in seconds.
+    """
+    return (lengths / (speeds / 3.6)).round(1)
+
+
+def enhance_columns(
+    node_data: Dict[str, Column],
+    edge_data: Dict[str, Column],
+    sources: numpy.ndarray,
+    targets: numpy.ndarray,
+    keys: Optional[numpy.ndarray] = None,
+    node_ids: Optional[Union[Sequence[Any], Column]] = None,
+) -> None:
+    """
+    Add the attributes used for routing to the columns of a map.
+
+    Nodes need coordinates (`x`, `y`), edges their `highway` type. Roundabout
+    junctions, street counts, bearings, speeds and travel times are calculated
+    for all nodes and edges at once. Lengths are only calculated if missing.
+    """
+    latitudes = numpy.asarray(node_data["y"], dtype=numpy.float64)
+    longitudes = numpy.asarray(node_data["x"], dtype=numpy.float64)
+    node_count = len(latitudes)
+
+    if "junction" in edge_data:
+        junctions = roundabout_junctions(
+            sources,
+            targets,
+            edge_data["junction"],
+            node_data.get("junction", numpy.full(node_count, None)),
+            node_ids,
+        )
+        if any(junction is not None for junction in junctions):
+            node_data["junction"] = junctions
+    node_data["street_count"] = street_counts(sources, targets, node_count, keys)
+
+    if "length" not in edge_data:
+        edge_data["length"] = edge_lengths(latitudes, longitudes, sources, targets)
+    edge_data["bearing"] = edge_bearings(latitudes, longitudes, sources, targets)
+    edge_data["speed_kph"] = edge_speeds(
+        edge_data["highway"], edge_data.get("maxspeed")
+    )
+    edge_data["travel_time"] = travel_times(
+        numpy.asarray(edge_data["length"], dtype=numpy.float64), edge_data["speed_kph"]
+    )
+
+
+def enhance_compiled_map(graph: CompiledGraph) -> None:
+    """
+    Add the attributes used for routing to a compiled map.
+    """
+    enhance_columns(
+        graph.node_data,
+        graph.edge_data,
+        graph.sources,
+        graph.targets,
+        node_ids=graph.node_ids,
+    )
+
+
+class _GraphColumns(NamedTuple):
+    nodes: List[Any]
+    edges: List[Tuple[Any, Any, Any, Dict[str, Any]]]
+    sources: numpy.ndarray
+    targets: numpy.ndarray
+    keys: numpy.ndarray
+
+
+def _graph_columns(graph: networkx.DiGraph) -> _GraphColumns:
+    """
+    Return the nodes and edges of a networkx graph and the node indices of all
+    edges.
+    """
+    nodes = list(graph.nodes)
+    index = {node_id: position for position, node_id in enumerate(nodes)}
+    if graph.is_multigraph():
+        edges = list(graph.edges(keys=True, data=True))
+    else:
+        edges = [(start, end, 0, data) for start, end, data in graph.edges(data=True)]
+    return _GraphColumns(
+        nodes,
+        edges,
+        numpy.array([index[start] for start, _, _, _ in edges], dtype=numpy.int64),
+        numpy.array([index[end] for _, end, _, _ in edges], dtype=numpy.int64),
+        numpy.array([key for _, _, key, _ in edges], dtype=numpy.int64),
+    )
+
+
+@timeit
+def tag_roundabout_nodes(graph: networkx.DiGraph) -> None:
+    """
+    Tag nodes within a roundabout as junction=roundabout (see
+    `roundabout_junctions`).
+    """
+    columns = _graph_columns(graph)
+    junctions = roundabout_junctions(
+        columns.sources,
+        columns.targets,
+        _objects([data.get("junction") for _, _, _, data in columns.edges]),
+        _objects([graph.nodes[node_id].get("junction") for node_id in columns.nodes]),
+        columns.nodes,
+    )
+    for node_id, junction in zip(columns.nodes, junctions.tolist()):
+        if junction is not None:
+            graph.nodes[node_id]["junction"] = junction
 
 
 @timeit
@@ -129,39 +405,98 @@ def custom_graph_from_x(
             simplify=False,  # Do not correct and simplify street network topology
         )
 
-    # add additional attributes
-    logger.info("Enhance map with additional attributes")
-    logger.info("> Tag node as roundabout")
-    tag_roundabout_nodes(graph)
+    enhance_map(graph, api_key=api_key)
+    return graph
 
-    logger.info("> Adding street count to nodes")
-    street_count_data = osmnx.utils_graph.count_streets_per_node(graph)
-    for node_id, street_count in street_count_data.items():
-        graph.nodes[node_id]["street_count"] = street_count
 
-    if api_key:
-        logger.info("> Adding elevation")
-        osmnx.add_node_elevations(graph, api_key, precision=5)
+def add_elevation(graph: networkx.DiGraph, api_key: str) -> None:
+    """
+    Add the elevation of nodes and the grade of edges using the Google Maps API.
+    """
+    logger.info("> Adding elevation")
+    osmnx.add_node_elevations(graph, api_key, precision=5)
 
-        logger.info("> Add edge grades")
-        osmnx.elevation.add_edge_grades(graph)
+    logger.info("> Add edge grades")
+    osmnx.elevation.add_edge_grades(graph)
+
+
+def enhance_map(graph: networkx.DiGraph, api_key: Optional[str] = None) -> None:
+    """
+    Add the attributes used for routing to a downloaded map.
 
-    logger.info("> Adding bearing")
-    osmnx.bearing.add_edge_bearings(graph)
+    All attributes, except elevation, are calculated on columns of all nodes and
+    edges at once (see `enhance_columns`).
+    """
+    logger.info("Enhance map with additional attributes")
+    if api_key:
+        add_elevation(graph, api_key)
 
-    logger.info("> Adding edge speeds")
-    osmnx.speed.add_edge_speeds(graph, hwy_speeds=None, fallback=30)
+    columns = _graph_columns(graph)
+    node_data = {
+        "x": numpy.array([graph.nodes[node_id]["x"] for node_id in columns.nodes]),
+        "y": numpy.array([graph.nodes[node_id]["y"] for node_id in columns.nodes]),
+        "junction": _objects(
+            [graph.nodes[node_id].get("junction") for node_id in columns.nodes]
+        ),
+    }
+    edge_data = {
+        key: _objects([data.get(key) for _, _, _, data in columns.edges])
+        for key in ("highway", "maxspeed", "junction", "length")
+    }
+    if any(length is None for length in edge_data["length"]):
+        del edge_data["length"]
+    logger.info(
+        "> Adding roundabouts, street counts, bearings, speeds and travel times"
+    )
+    enhance_columns(
+        node_data,
+        edge_data,
+        columns.sources,
+        columns.targets,
+        columns.keys,
+        columns.nodes,
+    )
 
-    logger.info("> Adding travel time")
-    osmnx.speed.add_edge_travel_times(graph)
+    for position, node_id in enumerate(columns.nodes):
+        attributes = graph.nodes[node_id]
+        # osmnx>=1.0 only keeps the id as node key
+        attributes.setdefault("osmid", node_id)
+        attributes["street_count"] = int(node_data["street_count"][position])
+        if node_data["junction"][position] is not None:
+            attributes["junction"] = node_data["junction"][position]
 
-    return graph
+    for (_, _, _, attributes), length, bearing, speed, travel_time in zip(
+        columns.edges,
+        edge_data["length"].tolist(),
+        edge_data["bearing"].tolist(),
+        edge_data["speed_kph"].tolist(),
+        edge_data["travel_time"].tolist(),
+    ):
+        attributes["length"] = length
+        if not math.isnan(bearing):
+            attributes["bearing"] = bearing
+        attributes["speed_kph"] = speed
+        attributes["travel_time"] = travel_time
 
 
 @timeit
 def save_map(graph: networkx.DiGraph, target: Path) -> None:
     """
-    Save graph as .graphml file.
+    Save graph as .graphml file or as compiled .npz file.
     """
     logger.info(f"Saving graph as {target.absolute()}.")
+    if is_compiled_map(target):
+        CompiledGraph.from_graph(graph).save(target)
+        return
     osmnx.save_graphml(graph, filepath=str(target))
+
+
+def save_compiled_map(graph: CompiledGraph, target: Path) -> None:
+    """
+    Save compiled graph as compiled .npz file or as .graphml file.
+    """
+    if is_compiled_map(target):
+        logger.info(f"Saving graph as {target.absolute()}.")
+        graph.save(target)
+        return
+    save_map(graph.to_graph(), target)
@@ -0,0 +1,439 @@
+"""
+Streaming readers for OSM XML (`.osm`, `.osm.bz2`) and PBF (`.osm.pbf`) files
+and osmChange files (`.osc`, `.osc.gz`).
+
+Both formats are read element by element (XML) or block by block (PBF), so that
+only the current part of the file is kept in memory.
+
+See https://wiki.openstreetmap.org/wiki/PBF_Format
+"""
+
+import bz2
+import gzip
+import struct
+import zlib
+from pathlib import Path
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+from xml.etree import ElementTree  # nosec
+
+import numpy
+
+from .. import exceptions
+
+Tags = Dict[str, str]
+
+# number of nodes of XML files yielded at once
+NODE_BLOCK_SIZE = 100_000
+
+# protobuf wire types
+VARINT = 0
+LENGTH_DELIMITED = 2
+# size of fixed64 and fixed32 values
+FIXED_SIZES = {1: 8, 5: 4}
+# shorter packed fields (e.g. tags and nodes of ways) are decoded without numpy
+PACKED_NUMPY_SIZE = 256
+
+
+# actions of osmChange files
+CHANGE_ACTIONS = ("create", "modify", "delete")
+
+
+class Node(NamedTuple):
+    node_id: int
+    latitude: float
+    longitude: float
+    tags: Tags
+
+
+class Way(NamedTuple):
+    way_id: int
+    refs: numpy.ndarray
+    tags: Tags
+
+
+class NodeBlock(NamedTuple):
+    """
+    Coordinates of many nodes, tags are only given for tagged nodes.
+    """
+
+    node_ids: numpy.ndarray
+    latitudes: numpy.ndarray
+    longitudes: numpy.ndarray
+    tags: Dict[int, Tags]
+
+
+def is_pbf(path: Path) -> bool:
+    return path.suffix == ".pbf"
+
+
+def read_ways(path: Path) -> Iterator[Way]:
+    """
+    Yield all ways of an OSM file.
+    """
+    if is_pbf(path):
+        return _read_pbf_ways(path)
+    return _read_xml_ways(path)
+
+
+def read_nodes(path: Path) -> Iterator[NodeBlock]:
+    """
+    Yield all nodes of an OSM file in blocks.
+    """
+    if is_pbf(path):
+        return _read_pbf_nodes(path)
+    return _read_xml_nodes(path)
+
+
+# OSM XML
+
+
+def _open_xml(path: Path) -> IO[bytes]:
+    if path.suffix == ".bz2":
+        return bz2.open(path)
+    if path.suffix == ".gz":
+        return gzip.open(path)  # type: ignore
+    return open(path, "rb")
+
+
+def _iter_xml(path: Path, tag: str) -> Iterator[ElementTree.Element]:
+    """
+    Yield all completely parsed elements with the given tag.
+
+    Parsed elements are removed from the tree, once they have been processed.
+    """
+    with _open_xml(path) as file:
+        events = ElementTree.iterparse(file, events=("start", "end"))  # nosec
+        _, root = next(events)
+        for event, element in events:
+            if event != "end" or element.tag not in ("node", "way", "relation"):
+                continue
+            if element.tag == tag:
+                yield element
+            root.clear()
+
+
+def _xml_tags(element: ElementTree.Element) -> Tags:
+    return {tag.attrib["k"]: tag.attrib["v"] for tag in element.iter("tag")}
+
+
+def _xml_way(element: ElementTree.Element) -> Way:
+    refs = [int(nd.attrib["ref"]) for nd in element.iter("nd")]
+    return Way(
+        int(element.attrib["id"]),
+        numpy.array(refs, dtype=numpy.int64),
+        _xml_tags(element),
+    )
+
+
+def _read_xml_ways(path: Path) -> Iterator[Way]:
+    for element in _iter_xml(path, "way"):
+        yield _xml_way(element)
+
+
+def _read_xml_nodes(path: Path) -> Iterator[NodeBlock]:
+    node_ids: List[int] = []
+    latitudes: List[float] = []
+    longitudes: List[float] = []
+    tags: Dict[int, Tags] = {}
+
+    def _block() -> NodeBlock:
+        return NodeBlock(
+            numpy.array(node_ids, dtype=numpy.int64),
+            numpy.array(latitudes, dtype=numpy.float64),
+            numpy.array(longitudes, dtype=numpy.float64),
+            dict(tags),
+        )
+
+    for element in _iter_xml(path, "node"):
+        node_id = int(element.attrib["id"])
+        node_ids.append(node_id)
+        latitudes.append(float(element.attrib["lat"]))
+        longitudes.append(float(element.attrib["lon"]))
+        node_tags = _xml_tags(element)
+        if node_tags:
+            tags[node_id] = node_tags
+
+        if len(node_ids) == NODE_BLOCK_SIZE:
+            yield _block()
+            node_ids, latitudes, longitudes = [], [], []
+            tags.clear()
+
+    if node_ids:
+        yield _block()
+
+
+def read_change(path: Path) -> Iterator[Tuple[str, Union[Node, Way]]]:
+    """
+    Yield the action (create, modify or delete) and the changed nodes and ways
+    of an osmChange file.
+
+    Deleted nodes might not have coordinates, they are `nan` then.
+    """
+    with _open_xml(path) as file:
+        events = ElementTree.iterparse(file, events=("start", "end"))  # nosec
+        _, root = next(events)
+        # create, modify or delete element containing the current elements
+        action: Optional[ElementTree.Element] = None
+        for event, element in events:
+            if element.tag in CHANGE_ACTIONS:
+                action = element if event == "start" else None
+                root.clear()
+                continue
+            if event != "end" or element.tag not in ("node", "way", "relation"):
+                continue
+            if action is None:
+                raise exceptions.RoutorException(
+                    f"{path} contains {element.tag}s outside of create, modify or delete."
+                )
+            if element.tag == "node":
+                yield action.tag, Node(
+                    int(element.attrib["id"]),
+                    float(element.attrib.get("lat", "nan")),
+                    float(element.attrib.get("lon", "nan")),
+                    _xml_tags(element),
+                )
+            elif element.tag == "way":
+                yield action.tag, _xml_way(element)
+            action.clear()
+
+
+# protobuf
+
+
+def _varint(buffer: bytes, position: int) -> Tuple[int, int]:
+    """
+    Decode a single varint, return its value and the position after it.
+    """
+    result = shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def _fields(buffer: bytes) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield field number and value of all fields of a message.
+
+    Values are integers for varints and byte strings for everything else.
+    """
+    position, end = 0, len(buffer)
+    while position < end:
+        key, position = _varint(buffer, position)
+        field, wire_type = key >> 3, key & 0x07
+        if wire_type == VARINT:
+            value, position = _varint(buffer, position)
+            yield field, value
+            continue
+
+        if wire_type == LENGTH_DELIMITED:
+            size, position = _varint(buffer, position)
+        elif wire_type in FIXED_SIZES:
+            size = FIXED_SIZES[wire_type]
+        else:
+            raise exceptions.RoutorException(f"Unsupported wire type {wire_type}.")
+        yield field, buffer[position : position + size]
+        position += size
+
+
+def _signed(value: int) -> int:
+    """
+    Decode a (two's complement) int64 varint.
+    """
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _packed(buffer: bytes) -> numpy.ndarray:
+    """
+    Decode packed varints at once.
+    """
+    if len(buffer) < PACKED_NUMPY_SIZE:
+        values, position = [], 0
+        while position < len(buffer):
+            value, position = _varint(buffer, position)
+            values.append(value)
+        return numpy.array(values, dtype=numpy.uint64)
+
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    ends = numpy.flatnonzero(data < 0x80)
+    starts = numpy.concatenate([[0], ends[:-1] + 1])
+    # position of each byte within its varint
+    positions = numpy.arange(len(data)) - numpy.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7F).astype(numpy.uint64) << (7 * positions.astype(numpy.uint64))
+    return numpy.bitwise_or.reduceat(parts, starts)
+
+
+def _zigzag(values: numpy.ndarray) -> numpy.ndarray:
+    """
+    Decode zigzag encoded signed integers.
+    """
+    return (values >> numpy.uint64(1)).astype(numpy.int64) ^ -(
+        values & numpy.uint64(1)
+    ).astype(numpy.int64)
+
+
+def _packed_sint(buffer: bytes, delta: bool = False) -> numpy.ndarray:
+    values = _zigzag(_packed(buffer))
+    return numpy.cumsum(values) if delta else values
+
+
+# OSM PBF
+
+
+def _read_blobs(path: Path) -> Iterator[bytes]:
+    """
+    Yield the uncompressed data of all `OSMData` blobs.
+    """
+    with open(path, "rb") as file:
+        while True:
+            size = file.read(4)
+            if not size:
+                return
+            header = dict(_fields(file.read(struct.unpack(">I", size)[0])))
+            blob = dict(_fields(file.read(header[3])))
+            if header[1] != b"OSMData":
+                continue
+
+            if 1 in blob:
+                yield blob[1]
+            elif 3 in blob:
+                yield zlib.decompress(blob[3])
+            else:
+                raise exceptions.RoutorException(
+                    f"{path} uses an unsupported compression."
+                )
+
+
+class _Block(NamedTuple):
+    strings: List[str]
+    groups: List[bytes]
+    granularity: int
+    lat_offset: int
+    lon_offset: int
+
+
+def _read_blocks(path: Path) -> Iterator[_Block]:
+    for data in _read_blobs(path):
+        strings: List[str] = []
+        groups: List[bytes] = []
+        settings = {17: 100, 19: 0, 20: 0}
+        for field, value in _fields(data):
+            if field == 1:
+                strings = [string.decode() for _, string in _fields(value)]
+            elif field == 2:
+                groups.append(value)
+            elif field in settings:
+                settings[field] = value
+        yield _Block(
+            strings,
+            groups,
+            settings[17],
+            _signed(settings[19]),
+            _signed(settings[20]),
+        )
+
+
+def _pbf_tags(keys: numpy.ndarray, values: numpy.ndarray, strings: List[str]) -> Tags:
+    return {strings[key]: strings[value] for key, value in zip(keys, values)}
+
+
+def _read_pbf_ways(path: Path) -> Iterator[Way]:
+    for block in _read_blocks(path):
+        for group in block.groups:
+            for field, message in _fields(group):
+                if field != 3:
+                    continue
+                way = dict(_fields(message))
+                yield Way(
+                    way[1],
+                    _packed_sint(way.get(8, b""), delta=True),
+                    _pbf_tags(
+                        _packed(way.get(2, b"")).tolist(),
+                        _packed(way.get(3, b"")).tolist(),
+                        block.strings,
+                    ),
+                )
+
+
+def _dense_nodes(message: bytes, block: _Block) -> NodeBlock:
+    dense = dict(_fields(message))
+    node_ids = _packed_sint(dense.get(1, b""), delta=True)
+    latitudes = _packed_sint(dense.get(8, b""), delta=True)
+    longitudes = _packed_sint(dense.get(9, b""), delta=True)
+
+    tags: Dict[int, Tags] = {}
+    keys_values = _packed(dense.get(10, b"")).tolist()
+    # keys and values of all nodes, each node is terminated by 0
+    node, position = 0, 0
+    while position < len(keys_values):
+        node_tags: Tags = {}
+        while keys_values[position] != 0:
+            key, value = keys_values[position], keys_values[position + 1]
+            node_tags[block.strings[key]] = block.strings[value]
+            position += 2
+        if node_tags:
+            tags[int(node_ids[node])] = node_tags
+        node, position = node + 1, position + 1
+
+    # dividing the exact integers results in the closest float to the coordinate
+    return NodeBlock(
+        node_ids,
+        (block.lat_offset + block.granularity * latitudes) / 1e9,
+        (block.lon_offset + block.granularity * longitudes) / 1e9,
+        tags,
+    )
+
+
+def _simple_nodes(messages: List[bytes], block: _Block) -> NodeBlock:
+    node_ids, latitudes, longitudes = [], [], []
+    tags: Dict[int, Tags] = {}
+    for message in messages:
+        node = dict(_fields(message))
+        node_id, latitude, longitude = _zigzag(
+            numpy.array([node[1], node[8], node[9]], dtype=numpy.uint64)
+        ).tolist()
+        node_ids.append(node_id)
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+        node_tags = _pbf_tags(
+            _packed(node.get(2, b"")).tolist(),
+            _packed(node.get(3, b"")).tolist(),
+            block.strings,
+        )
+        if node_tags:
+            tags[node_id] = node_tags
+    return NodeBlock(
+        numpy.array(node_ids, dtype=numpy.int64),
+        (block.lat_offset + block.granularity * numpy.array(latitudes)) / 1e9,
+        (block.lon_offset + block.granularity * numpy.array(longitudes)) / 1e9,
+        tags,
+    )
+
+
+def _read_pbf_nodes(path: Path) -> Iterator[NodeBlock]:
+    for block in _read_blocks(path):
+        for group in block.groups:
+            simple_nodes: List[bytes] = []
+            dense: Optional[bytes] = None
+            for field, message in _fields(group):
+                if field == 1:
+                    simple_nodes.append(message)
+                elif field == 2:
+                    dense = message
+            if dense is not None:
+                yield _dense_nodes(dense, block)
+            if simple_nodes:
+                yield _simple_nodes(simple_nodes, block)
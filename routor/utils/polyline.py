@@ -0,0 +1,51 @@
+from typing import List, Sequence, Tuple
+
+import numpy
+
+# number of decimal places kept by the encoding (5 as used by Google and OSRM)
+PRECISION = 5
+
+
+def encode(
+    latitudes: Sequence[float], longitudes: Sequence[float], precision: int = PRECISION
+) -> str:
+    """
+    Encode coordinates using the encoded polyline algorithm format.
+
+    See https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+    """
+    values = numpy.round(
+        numpy.column_stack([latitudes, longitudes]) * 10**precision
+    ).astype(numpy.int64)
+    deltas = numpy.diff(values, axis=0, prepend=numpy.zeros((1, 2), numpy.int64))
+    # shift left and invert negative values
+    deltas = (deltas << 1) ^ (deltas >> 63)
+
+    chars: List[str] = []
+    for value in deltas.ravel().tolist():
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+def decode(polyline: str, precision: int = PRECISION) -> List[Tuple[float, float]]:
+    """
+    Decode an encoded polyline into (latitude, longitude) pairs.
+    """
+    values: List[int] = []
+    value = shift = 0
+    for char in polyline:
+        byte = ord(char) - 63
+        value |= (byte & 0x1F) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+
+    coordinates = numpy.cumsum(numpy.array(values, numpy.int64).reshape(-1, 2), axis=0)
+    return [
+        (latitude, longitude)
+        for latitude, longitude in (coordinates / 10**precision).tolist()
+    ]
@@ -0,0 +1,306 @@
+import bz2
+import functools
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+from pathlib import Path
+from typing import IO, Iterator, List, NamedTuple, Optional, Tuple
+from xml.etree import ElementTree  # nosec
+
+import networkx
+import osmnx
+from osmnx._errors import EmptyOverpassResponse
+from shapely.geometry import Polygon, box
+from shapely.geometry.base import BaseGeometry
+
+from . import build
+from . import graph as graph_utils
+from .debug import timeit
+
+logger = logging.getLogger()
+
+# edge length of tiles in degrees
+TILE_SIZE = 0.1
+
+# raised by osmnx when truncating a graph without streets within a tile
+NO_NODES_ERROR = "Found no graph nodes within the requested polygon"
+
+
+class TileTask(NamedTuple):
+    """
+    Everything a worker needs to download and enhance a single tile.
+    """
+
+    polygon: BaseGeometry
+    path: Path
+    node_tags: List[str]
+    edge_tags: List[str]
+    api_key: Optional[str] = None
+    osm_file: Optional[Path] = None
+    overpass_endpoint: Optional[str] = None
+
+
+def split_into_tiles(area: BaseGeometry, tile_size: float = TILE_SIZE) -> List[Polygon]:
+    """
+    Split an area into the parts covered by a grid of square tiles.
+
+    The grid is aligned to multiples of `tile_size`, so overlapping areas share
+    their tiles.
+    """
+    west, south, east, north = area.bounds
+    tiles = []
+    for row in range(math.floor(south / tile_size), math.ceil(north / tile_size)):
+        for column in range(math.floor(west / tile_size), math.ceil(east / tile_size)):
+            cell = box(
+                column * tile_size,
+                row * tile_size,
+                (column + 1) * tile_size,
+                (row + 1) * tile_size,
+            )
+            tile = area.intersection(cell)
+            if not tile.is_empty and tile.area > 0:
+                tiles.append(tile)
+    return tiles
+
+
+def tile_key(
+    polygon: BaseGeometry,
+    node_tags: List[str],
+    edge_tags: List[str],
+    elevation: bool,
+    source: str,
+) -> str:
+    """
+    Return a key identifying the content of a tile in the tile cache.
+    """
+    content = {
+        "polygon": polygon.wkt,
+        "node_tags": sorted(node_tags),
+        "edge_tags": sorted(edge_tags),
+        "elevation": elevation,
+        "source": source,
+    }
+    return hashlib.sha1(json.dumps(content).encode()).hexdigest()  # nosec
+
+
+def _open_osm_file(osm_file: Path) -> IO[bytes]:
+    if osm_file.suffix == ".bz2":
+        return bz2.open(osm_file)
+    return open(osm_file, "rb")
+
+
+def osm_file_bounds(osm_file: Path) -> Polygon:
+    """
+    Return the bounding box of all nodes of an OSM XML file.
+    """
+    latitudes, longitudes = [], []
+    with _open_osm_file(osm_file) as file:
+        for _, element in ElementTree.iterparse(file):  # nosec
+            if element.tag == "node":
+                latitudes.append(float(element.attrib["lat"]))
+                longitudes.append(float(element.attrib["lon"]))
+            element.clear()
+    if not latitudes:
+        raise ValueError(f"{osm_file} does not contain any nodes.")
+    # nodes on the border have to be inside
+    return box(min(longitudes), min(latitudes), max(longitudes), max(latitudes)).buffer(
+        1e-7, join_style=2
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _load_osm_file(
+    osm_file: Path, node_tags: Tuple[str, ...], edge_tags: Tuple[str, ...]
+) -> networkx.MultiDiGraph:
+    """
+    Load the drivable streets of a local OSM file, the same network as
+    downloaded from the Overpass API.
+
+    The graph is cached per process, load it before forking workers so that the
+    file is parsed only once.
+    """
+    logger.info(f"Loading {osm_file}")
+    with graph_utils.osmnx_config(list(node_tags), [*edge_tags, *build.DRIVE_FILTER]):
+        graph = osmnx.graph_from_xml(str(osm_file), simplify=False, retain_all=True)
+    with graph_utils.osmnx_config(list(node_tags), list(edge_tags)):
+        useful_tags = set(osmnx.settings.useful_tags_way)
+
+    graph.remove_edges_from(
+        [
+            (u, v, key)
+            for u, v, key, data in graph.edges(keys=True, data=True)
+            if not build.is_drivable(data)
+        ]
+    )
+    graph.remove_nodes_from(list(networkx.isolates(graph)))
+    # tags only needed for filtering are not part of downloaded maps
+    filter_tags = build.DRIVE_FILTER.keys() - useful_tags
+    for _, _, data in graph.edges(data=True):
+        for tag in filter_tags:
+            data.pop(tag, None)
+    return graph
+
+
+def _fetch_tile(task: TileTask) -> networkx.MultiDiGraph:
+    """
+    Download the streets within a tile, or cut them from a local OSM file.
+
+    All streets are kept, the tile may not be connected on its own.
+    """
+    if task.osm_file is not None:
+        graph = _load_osm_file(
+            task.osm_file, tuple(task.node_tags), tuple(task.edge_tags)
+        )
+        return osmnx.truncate.truncate_graph_polygon(
+            graph, task.polygon, retain_all=True, truncate_by_edge=True
+        )
+    return osmnx.graph_from_polygon(
+        task.polygon,
+        network_type="drive",
+        retain_all=True,
+        truncate_by_edge=True,
+        simplify=False,
+    )
+
+
+def _no_streets(error: ValueError) -> bool:
+    """
+    Check whether osmnx failed, because there are no streets within a tile.
+    """
+    return isinstance(error, EmptyOverpassResponse) or str(error) == NO_NODES_ERROR
+
+
+def download_tile(task: TileTask) -> Path:
+    """
+    Download a tile, optionally with elevation, and save it in the tile cache.
+
+    Other attributes are added once all tiles are stitched together.
+
+    The tile is written atomically, so interrupted or failed downloads never
+    leave incomplete tiles behind.
+    """
+    with graph_utils.osmnx_config(
+        task.node_tags, task.edge_tags, task.overpass_endpoint
+    ):
+        try:
+            graph = _fetch_tile(task)
+        except ValueError as error:
+            if not _no_streets(error):
+                raise
+            # no streets within the tile, cache it anyway
+            logger.debug(f"No streets found within {task.polygon.bounds}")
+            graph = networkx.MultiDiGraph(crs=osmnx.settings.default_crs)
+
+    if graph.number_of_edges() and task.api_key:
+        graph_utils.add_elevation(graph, task.api_key)
+
+    temporary_path = task.path.with_suffix(".tmp")
+    osmnx.save_graphml(graph, filepath=str(temporary_path))
+    os.replace(temporary_path, task.path)
+    return task.path
+
+
+def _download_tiles(tasks: List[TileTask], processes: int) -> Iterator[Path]:
+    if processes == 1:
+        yield from map(download_tile, tasks)
+        return
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with context.Pool(processes) as pool:
+        yield from pool.imap_unordered(download_tile, tasks)
+
+
+def stitch_tiles(paths: List[Path]) -> networkx.MultiDiGraph:
+    """
+    Merge tiles into a single map.
+
+    Streets crossing the border of tiles are part of both tiles, they are
+    merged into one.
+    """
+    graph = networkx.MultiDiGraph()
+    for path in paths:
+        tile = osmnx.load_graphml(path)
+        graph.graph.update(tile.graph)
+        graph.add_nodes_from(tile.nodes(data=True))
+        graph.add_edges_from(tile.edges(keys=True, data=True))
+    return graph
+
+
+@timeit
+def download_tiled_map(
+    location: List[str],
+    tile_size: float = TILE_SIZE,
+    cache_dir: Optional[Path] = None,
+    processes: Optional[int] = None,
+    node_tags: Optional[List[str]] = None,
+    edge_tags: Optional[List[str]] = None,
+    api_key: Optional[str] = None,
+    osm_file: Optional[Path] = None,
+    overpass_endpoint: Optional[str] = None,
+) -> networkx.MultiDiGraph:
+    """
+    Download map from OSM for specific locations tile by tile.
+
+    Tiles are downloaded in parallel (with elevation) and cached in `cache_dir`,
+    so an interrupted download resumes with the missing tiles. Afterwards, the
+    tiles are stitched together, only the biggest connected network is kept and
+    enhanced as a whole.
+
+    Instead of the Overpass API, streets can be read from a local OSM XML file.
+    Its whole area is used if no locations are given.
+    """
+    if location:
+        logger.info(f"Download map for {location}")
+        area = osmnx.geocode_to_gdf(location)["geometry"].unary_union
+    elif osm_file is not None:
+        area = osm_file_bounds(osm_file)
+    else:
+        raise ValueError("Either locations or an OSM file are required.")
+
+    node_tags, edge_tags = node_tags or [], edge_tags or []
+    source = str(osm_file.resolve()) if osm_file else overpass_endpoint or ""
+    cache_dir = cache_dir or Path(osmnx.settings.cache_folder) / "tiles"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    paths, tasks = [], []
+    for polygon in split_into_tiles(area, tile_size):
+        key = tile_key(polygon, node_tags, edge_tags, bool(api_key), source)
+        path = cache_dir / f"{key}.graphml"
+        paths.append(path)
+        if not path.exists():
+            tasks.append(
+                TileTask(
+                    polygon,
+                    path,
+                    node_tags,
+                    edge_tags,
+                    api_key=api_key,
+                    osm_file=osm_file,
+                    overpass_endpoint=overpass_endpoint,
+                )
+            )
+
+    logger.info(
+        f"Downloading {len(tasks)} of {len(paths)} tiles ({len(paths) - len(tasks)} cached)"
+    )
+    processes = min(processes or os.cpu_count() or 1, max(len(tasks), 1))
+    if osm_file is not None and tasks:
+        # parse the file once, forked workers share the cached graph
+        _load_osm_file(osm_file, tuple(node_tags), tuple(edge_tags))
+    for done, path in enumerate(_download_tiles(tasks, processes), start=1):
+        logger.info(f"Downloaded tile {done}/{len(tasks)}: {path.name}")
+
+    logger.info(f"Stitching {len(paths)} tiles")
+    graph = stitch_tiles(paths)
+    if not graph.number_of_nodes():
+        raise ValueError("No streets found within the requested area.")
+    graph = osmnx.utils_graph.get_largest_component(graph)
+
+    # attributes depend on streets of neighbouring tiles, missing speeds on all
+    # edges of the same highway type
+    graph_utils.enhance_map(graph)
+    return graph
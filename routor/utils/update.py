@@ -0,0 +1,412 @@
+"""
+Incremental map updates: changed edge attributes (CSV) or changed nodes and
+ways (osmChange) are applied to an existing map without rebuilding it.
+"""
+
+import csv
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy
+import osmnx
+
+from .. import exceptions, weights
+from ..algorithms.alt import landmarks_path
+from ..algorithms.ch import hierarchy_path
+from ..compiled import Column, CompiledGraph, to_column
+from ..engine import Engine
+from ..traffic import EDGE_COLUMNS, WAY_COLUMN, find_edges
+from . import build
+from . import graph as graph_utils
+from . import osm
+from .debug import timeit
+
+logger = logging.getLogger()
+
+TRUE_VALUES = {"true", "yes", "1"}
+# columns used for edge costs, empty values keep them unchanged
+COST_COLUMNS = {"length", "speed_kph", "travel_time"}
+
+# attributes calculated by routor and osmnx, all other columns are OSM tags
+NODE_ATTRIBUTES = {"x", "y", "osmid", "street_count", "elevation"}
+EDGE_ATTRIBUTES = {
+    "osmid",
+    "oneway",
+    "length",
+    "bearing",
+    "speed_kph",
+    "travel_time",
+    "grade",
+    "grade_abs",
+}
+
+
+def read_edge_changes(file: TextIO) -> Iterator[Dict[str, str]]:
+    """
+    Read changed edge attributes from a CSV file with a header.
+
+    Edges are selected by the OSM ids of their nodes (start, end) or by the id
+    of their way (osmid), all other columns are attributes to set.
+    """
+    reader = csv.DictReader(file)
+    columns = set(reader.fieldnames or [])
+    if not set(EDGE_COLUMNS) <= columns and WAY_COLUMN not in columns:
+        raise ValueError("Missing columns: either start and end or osmid")
+    for row in reader:
+        yield {key: value for key, value in row.items() if key is not None}
+
+
+def _parse_value(value: str, column: Optional[Column]) -> Any:
+    """
+    Convert a CSV value into the type of an edge column, empty values are missing.
+    """
+    if value == "":
+        return None
+    if column is None or column.dtype == object:
+        return value
+    if column.dtype.kind == "b":
+        return value.lower() in TRUE_VALUES
+    return float(value)
+
+
+def _writable_column(column: Optional[Column], size: int, values: List[Any]) -> Column:
+    """
+    Return a copy of a column, which can hold the given values.
+    """
+    if column is None:
+        return numpy.full(size, None, dtype=object)
+    if column.dtype.kind in "iu":
+        return column.astype(numpy.float64)
+    if column.dtype.kind == "b" and any(value is None for value in values):
+        return column.astype(object)
+    return column.copy()
+
+
+@timeit
+def apply_edge_changes(
+    graph: CompiledGraph, rows: Iterable[Dict[str, str]]
+) -> numpy.ndarray:
+    """
+    Set attributes of edges and return the indices of all changed edges.
+
+    Speeds of edges with a changed `highway` or `maxspeed` and travel times are
+    recalculated, unless they are given for the same edge. Empty values remove
+    attributes, except for lengths, speeds and travel times, which are kept.
+    """
+    changes: Dict[str, List[Tuple[numpy.ndarray, str]]] = {}
+    changed: List[numpy.ndarray] = []
+    for row in rows:
+        try:
+            edges = find_edges(graph, row)
+        except exceptions.GraphException as error:
+            logger.warning(f"Skipping change {row}: {error}")
+            continue
+
+        changed.append(edges)
+        for key, value in row.items():
+            if key in (*EDGE_COLUMNS, WAY_COLUMN):
+                continue
+            if key in COST_COLUMNS and value == "":
+                continue
+            changes.setdefault(key, []).append((edges, value))
+
+    edge_data = graph.edge_data
+    for key, assignments in changes.items():
+        values = [_parse_value(value, edge_data.get(key)) for _, value in assignments]
+        column = _writable_column(edge_data.get(key), graph.edge_count, values)
+        for (edges, _), value in zip(assignments, values):
+            column[edges] = (
+                numpy.nan if value is None and column.dtype != object else value
+            )
+        edge_data[key] = column
+
+    edges = (
+        numpy.unique(numpy.concatenate(changed))
+        if changed
+        else numpy.zeros(0, dtype=numpy.int64)
+    )
+    changed_edges = {
+        key: numpy.concatenate([edges for edges, _ in assignments])
+        for key, assignments in changes.items()
+    }
+    _update_travel_times(edge_data, changed_edges)
+    logger.info(f"Changed {len(edges)} edges")
+    return edges
+
+
+def _changed(changed_edges: Dict[str, numpy.ndarray], *keys: str) -> numpy.ndarray:
+    """
+    Return the edges, for which any of the given attributes has been set.
+    """
+    edges = [changed_edges[key] for key in keys if key in changed_edges]
+    if not edges:
+        return numpy.zeros(0, dtype=numpy.int64)
+    return numpy.unique(numpy.concatenate(edges))
+
+
+def _update_travel_times(
+    edge_data: Dict[str, Column], changed_edges: Dict[str, numpy.ndarray]
+) -> None:
+    """
+    Recalculate speeds and travel times of changed edges, unless they are given
+    for the same edge. `changed_edges` maps attributes to the edges setting them.
+    """
+    if "speed_kph" not in edge_data:
+        return
+
+    speeds = numpy.asarray(edge_data["speed_kph"], dtype=numpy.float64)
+    edges = numpy.setdiff1d(
+        _changed(changed_edges, "highway", "maxspeed"),
+        _changed(changed_edges, "speed_kph"),
+    )
+    if len(edges):
+        speeds = speeds.copy()
+        speeds[edges] = graph_utils.edge_speeds(
+            edge_data["highway"], edge_data.get("maxspeed")
+        )[edges]
+        edge_data["speed_kph"] = speeds
+
+    edges = numpy.setdiff1d(
+        _changed(changed_edges, "highway", "maxspeed", "speed_kph", "length"),
+        _changed(changed_edges, "travel_time"),
+    )
+    if len(edges):
+        travel_times = numpy.asarray(
+            edge_data["travel_time"], dtype=numpy.float64
+        ).copy()
+        travel_times[edges] = graph_utils.travel_times(
+            numpy.asarray(edge_data["length"], dtype=numpy.float64)[edges],
+            speeds[edges],
+        )
+        edge_data["travel_time"] = travel_times
+
+
+def _missing_values(column: Column, size: int) -> Column:
+    if column.dtype.kind in "iuf":
+        return numpy.full(size, numpy.nan)
+    return numpy.full(size, None, dtype=object)
+
+
+def _concat_columns(
+    first: Dict[str, Column], second: Dict[str, Column], sizes: Tuple[int, int]
+) -> Dict[str, Column]:
+    """
+    Concatenate the rows of two sets of columns.
+
+    Columns missing in one of them are filled with `None` (or `nan`).
+    """
+    columns: Dict[str, Column] = {}
+    for key in {**first, **second}:
+        head = first[key] if key in first else _missing_values(second[key], sizes[0])
+        tail = second[key] if key in second else _missing_values(head, sizes[1])
+        if head.dtype == tail.dtype or (
+            head.dtype.kind in "iuf" and tail.dtype.kind in "iuf"
+        ):
+            columns[key] = numpy.concatenate([head, tail])
+        else:
+            columns[key] = numpy.concatenate([head.astype(object), tail.astype(object)])
+    return columns
+
+
+def _tag_keys(
+    columns: Dict[str, Column], useful_tags: List[str], attributes: set
+) -> List[str]:
+    return sorted(set(useful_tags + ["junction"]) | (set(columns) - attributes))
+
+
+def _read_change(
+    path: Path,
+) -> Tuple[Dict[int, Optional[osm.Node]], Dict[int, Optional[osm.Way]]]:
+    """
+    Return the changed nodes and ways of an osmChange file, `None` if deleted.
+    """
+    nodes: Dict[int, Optional[osm.Node]] = {}
+    ways: Dict[int, Optional[osm.Way]] = {}
+    for action, element in osm.read_change(path):
+        if isinstance(element, osm.Node):
+            nodes[element.node_id] = None if action == "delete" else element
+        else:
+            ways[element.way_id] = None if action == "delete" else element
+    return nodes, ways
+
+
+def _changed_nodes(
+    graph: CompiledGraph, nodes: Dict[int, Optional[osm.Node]]
+) -> Tuple[numpy.ndarray, Dict[str, Column]]:
+    """
+    Return ids and columns of the nodes of the map, changed nodes are replaced.
+    """
+    changed = [node for node in nodes.values() if node is not None]
+    node_tags = _tag_keys(
+        graph.node_data, osmnx.settings.useful_tags_node, NODE_ATTRIBUTES
+    )
+    changed_data: Dict[str, Column] = {
+        "y": numpy.array([node.latitude for node in changed], dtype=numpy.float64),
+        "x": numpy.array([node.longitude for node in changed], dtype=numpy.float64),
+    }
+    for key in node_tags:
+        column = to_column([node.tags.get(key) for node in changed])
+        if not all(value is None for value in column):
+            changed_data[key] = column
+
+    keep = ~numpy.isin(graph.node_ids, numpy.fromiter(nodes, dtype=numpy.int64))
+    node_ids = numpy.concatenate(
+        [
+            graph.node_ids[keep],
+            numpy.array([node.node_id for node in changed], dtype=numpy.int64),
+        ]
+    )
+    node_data = _concat_columns(
+        {key: column[keep] for key, column in graph.node_data.items()},
+        changed_data,
+        (int(keep.sum()), len(changed)),
+    )
+    node_data["osmid"] = node_ids
+    order = numpy.argsort(node_ids, kind="stable")
+    return node_ids[order], {key: column[order] for key, column in node_data.items()}
+
+
+def _changed_edges(
+    graph: CompiledGraph, ways: Dict[int, Optional[osm.Way]]
+) -> Tuple[Dict[str, numpy.ndarray], Dict[str, Column]]:
+    """
+    Return the edges (between OSM node ids) and columns of all edges of the map,
+    edges of changed ways are replaced.
+    """
+    way_tags = _tag_keys(
+        graph.edge_data, osmnx.settings.useful_tags_way, EDGE_ATTRIBUTES
+    )
+    changed = build.drivable_ways(
+        (way for way in ways.values() if way is not None), way_tags
+    )
+    changed_edges = build.way_edges(changed)
+    changed_data = build.way_edge_data(changed, way_tags, changed_edges)
+
+    osmids = numpy.asarray(graph.edge_data[WAY_COLUMN], dtype=numpy.int64)
+    keep = ~numpy.isin(osmids, numpy.fromiter(ways, dtype=numpy.int64))
+    edge_data = _concat_columns(
+        {key: column[keep] for key, column in graph.edge_data.items()},
+        changed_data,
+        (int(keep.sum()), len(changed_edges["way"])),
+    )
+    edges = {
+        "sources": numpy.concatenate(
+            [graph.node_ids[graph.sources[keep]], changed_edges["sources"]]
+        ),
+        "targets": numpy.concatenate(
+            [graph.node_ids[graph.targets[keep]], changed_edges["targets"]]
+        ),
+        # position within the edge columns
+        "way": numpy.arange(len(edge_data[WAY_COLUMN])),
+        "oneway": edge_data["oneway"],
+    }
+    return edges, edge_data
+
+
+@timeit
+def apply_osm_change(graph: CompiledGraph, path: Path) -> CompiledGraph:
+    """
+    Apply the changed nodes and ways of an osmChange file to an unsimplified map.
+
+    Edges of changed ways are replaced. Nodes of new ways have to be part of the
+    map or of the change, otherwise the edges are skipped. Same as building a
+    map, only the biggest connected network is kept and all attributes (except
+    elevation) are recalculated.
+    """
+    if graph.graph_data.get("simplified"):
+        raise exceptions.GraphException(
+            "osmChange files can only be applied to unsimplified maps."
+        )
+
+    nodes, ways = _read_change(path)
+    logger.info(f"Applying {len(nodes)} changed nodes and {len(ways)} changed ways")
+    node_ids, node_data = _changed_nodes(graph, nodes)
+    edges, edge_data = _changed_edges(graph, ways)
+
+    missing = (build.lookup(node_ids, edges["sources"]) < 0) | (
+        build.lookup(node_ids, edges["targets"]) < 0
+    )
+    if missing.any():
+        logger.warning(
+            f"Skipping {int(missing.sum())} edges, their nodes are neither part of "
+            "the map nor of the change."
+        )
+
+    edges = build.select_edges(
+        edges,
+        build.Nodes(node_ids, node_data["y"], node_data["x"], {}),
+    )
+    component = edges["component"]
+    node_data = {key: column[component] for key, column in node_data.items()}
+    edge_data = {key: column[edges["way"]] for key, column in edge_data.items()}
+    # recalculate the lengths of edges between moved nodes as well
+    del edge_data["length"]
+    graph_utils.enhance_columns(
+        node_data,
+        edge_data,
+        edges["sources"],
+        edges["targets"],
+        node_ids=node_data["osmid"],
+    )
+
+    node_count = int(component.sum())
+    offsets = numpy.zeros(node_count + 1, dtype=numpy.int64)
+    offsets[1:] = numpy.cumsum(numpy.bincount(edges["sources"], minlength=node_count))
+    return CompiledGraph(
+        node_ids=node_ids[component],
+        offsets=offsets,
+        targets=edges["targets"],
+        node_data=node_data,
+        edge_data=edge_data,
+        graph_data=dict(graph.graph_data),
+        sources=edges["sources"],
+    )
+
+
+def save_updated_map(graph: CompiledGraph, map_path: Path, target: Path) -> List[Path]:
+    """
+    Save an updated map and rebuild its outdated hierarchies and landmarks.
+
+    Everything is prepared in a temporary directory and moved into place
+    afterwards, the map last. Engines watching the map (see `Engine.map_changed`)
+    always find preprocessed data matching the map. Return the paths of the
+    rebuilt files.
+    """
+    with tempfile.TemporaryDirectory(dir=target.parent) as directory:
+        staged = Path(directory) / target.name
+        graph_utils.save_compiled_map(graph, staged)
+        for name in weights.get_function_names():
+            for path_func in (hierarchy_path, landmarks_path):
+                if path_func(map_path, name).exists():
+                    shutil.copyfile(path_func(map_path, name), path_func(staged, name))
+
+        updated = Engine(staged).update_preprocessed()
+        for path in sorted(Path(directory).iterdir(), key=lambda path: path == staged):
+            os.replace(path, target.parent / path.name)
+    return [target.parent / path.name for path in updated]
+
+
+@timeit
+def update_map(map_path: Path, changes: Path, target: Optional[Path] = None) -> None:
+    """
+    Apply changed edge attributes (.csv) or an osmChange file (.osc, .osc.gz) to a
+    map and update its preprocessed data.
+
+    The map is replaced, unless a different target is given.
+    """
+    graph = graph_utils.load_compiled_map(map_path)
+    if changes.suffix == ".csv":
+        with open(changes, newline="") as file:
+            apply_edge_changes(graph, read_edge_changes(file))
+    else:
+        graph = apply_osm_change(graph, changes)
+    graph.graph_data["updated_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    updated = save_updated_map(graph, map_path, target or map_path)
+    for path in updated:
+        logger.info(f"Rebuilt {path}")
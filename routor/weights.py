@@ -1,30 +1,228 @@
-from functools import partial
-from typing import Callable, Dict, List, Optional
+from functools import partial, update_wrapper
+from typing import Callable, Dict, List, Mapping, Optional
+
+import numpy
 
 from . import models
 
 WeightFunction = Callable[[Optional[models.Edge], models.Edge], float]
+EdgeCostsFunction = Callable[[Mapping[str, numpy.ndarray]], numpy.ndarray]
+TurnCostsFunction = Callable[
+    [Optional[Mapping[str, numpy.ndarray]], Mapping[str, numpy.ndarray]],
+    numpy.ndarray,
+]
+# lower bound of the costs per meter of great-circle distance
+CostsPerMeterFunction = Callable[[Mapping[str, numpy.ndarray]], float]
+# edge index, seconds since departure when entering the edge -> costs
+TimeDependentCosts = Callable[[int, float], float]
+TimeDependentCostsFunction = Callable[[Mapping[str, numpy.ndarray]], TimeDependentCosts]
 
 WEIGHT_FUNCTIONS: Dict[str, WeightFunction] = {}
+# increased whenever weight functions are registered or unregistered
+_registry_version = 0
+
+# maximum rounding error of edge lengths, osmnx rounds them to millimeters
+LENGTH_TOLERANCE = 0.0005
+
+# travel times of the map, while live travel times are applied (see `Engine.traffic`)
+FREE_FLOW_TRAVEL_TIME = "free_flow_travel_time"
+# seconds after departure, when live travel times have faded into free flow
+TRAFFIC_HORIZON = 1800.0
+
+
+class VectorizedWeightFunction:
+    """
+    Weight function, which calculates the costs of all edges at once.
+
+    The wrapped function receives the edge attributes as columns (one array per
+    attribute) and returns an array with the costs of each edge.
+    The costs can not depend on the previous edge.
+
+    Optionally, `min_costs_per_meter` returns a lower bound of the costs per
+    meter of great-circle distance for the given edge attributes, which is used
+    as A* heuristic.
+
+    Instances can still be used as a regular `WeightFunction`.
+    """
+
+    def __init__(
+        self,
+        func: EdgeCostsFunction,
+        min_costs_per_meter: Optional[CostsPerMeterFunction] = None,
+    ) -> None:
+        self.func = func
+        update_wrapper(self, func)
+        self.min_costs_per_meter = min_costs_per_meter
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.func!r}>"
+
+    def __call__(self, prev_edge: Optional[models.Edge], edge: models.Edge) -> float:
+        return float(self.costs(_to_columns(edge))[0])
+
+    def costs(self, edge_data: Mapping[str, numpy.ndarray]) -> numpy.ndarray:
+        """
+        Return the costs for all edges.
+        """
+        return numpy.asarray(self.func(edge_data), dtype=numpy.float64)
+
+
+class VectorizedTurnWeightFunction:
+    """
+    Weight function, which calculates the costs of all turns at once.
+
+    The wrapped function receives the attributes of the previous edges and of the
+    edges (both as columns, aligned by turn) and returns an array with the costs
+    of each edge when coming from the previous edge.
+    It is called once with `None` as previous edges for the costs of starting
+    with an edge.
+
+    Optionally, `min_costs_per_meter` returns a lower bound of the costs per
+    meter of great-circle distance, including turn costs, which is used as A*
+    heuristic.
+
+    Instances can still be used as a regular `WeightFunction`.
+    """
+
+    def __init__(
+        self,
+        func: TurnCostsFunction,
+        min_costs_per_meter: Optional[CostsPerMeterFunction] = None,
+    ) -> None:
+        self.func = func
+        update_wrapper(self, func)
+        self.min_costs_per_meter = min_costs_per_meter
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.func!r}>"
+
+    def __call__(self, prev_edge: Optional[models.Edge], edge: models.Edge) -> float:
+        prev_columns = _to_columns(prev_edge) if prev_edge else None
+        return float(self.costs(prev_columns, _to_columns(edge))[0])
+
+    def costs(
+        self,
+        prev_edge_data: Optional[Mapping[str, numpy.ndarray]],
+        edge_data: Mapping[str, numpy.ndarray],
+    ) -> numpy.ndarray:
+        """
+        Return the costs for all turns.
+        """
+        return numpy.asarray(self.func(prev_edge_data, edge_data), dtype=numpy.float64)
+
+
+class TimeDependentWeightFunction:
+    """
+    Weight function, whose costs depend on the time an edge is entered.
+
+    The wrapped function receives the edge attributes as columns and returns a
+    function of an edge index and the seconds since departure, when the edge is
+    entered. Costs are travel times: each edge is entered at the sum of the
+    costs of the previous edges. They have to be FIFO, entering an edge later
+    never leaves it earlier.
+
+    Optionally, `min_costs_per_meter` returns a lower bound of the costs per
+    meter of great-circle distance at any time, which is used as A* heuristic.
+
+    Instances can still be used as a regular `WeightFunction`, returning the
+    costs at departure.
+    """
+
+    def __init__(
+        self,
+        func: TimeDependentCostsFunction,
+        min_costs_per_meter: Optional[CostsPerMeterFunction] = None,
+    ) -> None:
+        self.func = func
+        update_wrapper(self, func)
+        self.min_costs_per_meter = min_costs_per_meter
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.func!r}>"
+
+    def __call__(self, prev_edge: Optional[models.Edge], edge: models.Edge) -> float:
+        return float(self.costs(_to_columns(edge))(0, 0.0))
+
+    def costs(self, edge_data: Mapping[str, numpy.ndarray]) -> TimeDependentCosts:
+        """
+        Return the costs of an edge depending on the time it is entered.
+        """
+        return self.func(edge_data)
+
+
+def _to_columns(edge: models.Edge) -> Dict[str, numpy.ndarray]:
+    return {
+        key: numpy.array([value]) for key, value in edge.dict(by_alias=True).items()
+    }
+
+
+def vectorized(
+    func: EdgeCostsFunction,
+    min_costs_per_meter: Optional[CostsPerMeterFunction] = None,
+) -> VectorizedWeightFunction:
+    """
+    Turn a function, which calculates the costs of all edges, into a weight function.
+    """
+    return VectorizedWeightFunction(func, min_costs_per_meter)
+
+
+def vectorized_turns(
+    func: TurnCostsFunction,
+    min_costs_per_meter: Optional[CostsPerMeterFunction] = None,
+) -> VectorizedTurnWeightFunction:
+    """
+    Turn a function, which calculates the costs of all turns, into a weight function.
+    """
+    return VectorizedTurnWeightFunction(func, min_costs_per_meter)
+
+
+def time_dependent(
+    func: TimeDependentCostsFunction,
+    min_costs_per_meter: Optional[CostsPerMeterFunction] = None,
+) -> TimeDependentWeightFunction:
+    """
+    Turn a function, which returns the costs of edges depending on the time
+    they are entered, into a weight function.
+    """
+    return TimeDependentWeightFunction(func, min_costs_per_meter)
+
+
+def is_vectorized(func: WeightFunction) -> bool:
+    """
+    Check whether the costs of a weight function can be calculated upfront.
+    """
+    return isinstance(func, (VectorizedWeightFunction, VectorizedTurnWeightFunction))
 
 
 def register(func: WeightFunction, function_name: str) -> None:
     """
     Register a custom weight function.
     """
+    global _registry_version
     if function_name in WEIGHT_FUNCTIONS:
         raise ValueError("Function with the same name is already registered.")
     WEIGHT_FUNCTIONS[function_name] = func
+    _registry_version += 1
 
 
 def unregister(function_name: str) -> None:
     """
     Unregister a custom weight function.
     """
+    global _registry_version
     try:
         del WEIGHT_FUNCTIONS[function_name]
     except KeyError:
         pass
+    else:
+        _registry_version += 1
+
+
+def registry_version() -> int:
+    """
+    Return a number, which changes whenever weight functions are (un)registered.
+    """
+    return _registry_version
 
 
 def get_function(name: str) -> WeightFunction:
@@ -37,6 +235,16 @@ def get_function(name: str) -> WeightFunction:
         raise ValueError("Weight function does not exist.") from error
 
 
+def get_function_name(func: WeightFunction) -> Optional[str]:
+    """
+    Return the name of a registered weight function.
+    """
+    for name, registered_func in WEIGHT_FUNCTIONS.items():
+        if registered_func is func:
+            return name
+    return None
+
+
 def get_function_names() -> List[str]:
     """
     Return list of possible weight functions.
@@ -53,8 +261,84 @@ def weight_by_attr(
     return getattr(edge, attr)
 
 
-travel_time = partial(weight_by_attr, "travel_time")
+def costs_by_attr(attr: str, edge_data: Mapping[str, numpy.ndarray]) -> numpy.ndarray:
+    """
+    Generic vectorized weight function to retrieve a value from all edges.
+    """
+    return edge_data[attr]
+
+
+def min_costs_per_meter_by_attr(
+    attr: str, edge_data: Mapping[str, numpy.ndarray]
+) -> float:
+    """
+    Generic lower bound of the costs per meter for costs retrieved from an attribute.
+
+    Edge lengths are never shorter than the great-circle distance between their
+    nodes, so the smallest ratio of costs and length of all edges is a lower
+    bound (eg. the inverse of the maximum speed for travel times).
+    """
+    ratios = edge_data[attr] / (edge_data["length"] + LENGTH_TOLERANCE)
+    ratios = ratios[~numpy.isnan(ratios)]
+    if not len(ratios):
+        return 0.0
+    return max(float(ratios.min()), 0.0)
+
+
+travel_time = vectorized(
+    partial(costs_by_attr, "travel_time"),
+    partial(min_costs_per_meter_by_attr, "travel_time"),
+)
 register(travel_time, "travel_time")
 
-length = partial(weight_by_attr, "length")
+length = vectorized(
+    partial(costs_by_attr, "length"), partial(min_costs_per_meter_by_attr, "length")
+)
 register(length, "length")
+
+
+def live_travel_time_costs(
+    edge_data: Mapping[str, numpy.ndarray],
+) -> TimeDependentCosts:
+    """
+    Live travel times, fading linearly into the travel times of the map within
+    `TRAFFIC_HORIZON` seconds after departure.
+
+    Traffic reported now hardly tells how busy edges reached much later will be.
+    Delays longer than the horizon fade as long as the delay itself, so that
+    waiting for the traffic to clear never pays off (FIFO).
+    """
+    live = numpy.asarray(edge_data["travel_time"], dtype=numpy.float64)
+    free_flow = numpy.asarray(
+        edge_data.get(FREE_FLOW_TRAVEL_TIME, live), dtype=numpy.float64
+    )
+    live_list, free_flow_list = live.tolist(), free_flow.tolist()
+
+    def costs(edge: int, elapsed: float) -> float:
+        free_flow_time = free_flow_list[edge]
+        delay = live_list[edge] - free_flow_time
+        if not delay:
+            return free_flow_time
+        fading = max(TRAFFIC_HORIZON, abs(delay))
+        return free_flow_time + delay * max(0.0, 1.0 - elapsed / fading)
+
+    return costs
+
+
+def min_live_travel_time_per_meter(edge_data: Mapping[str, numpy.ndarray]) -> float:
+    """
+    Lower bound of the costs per meter of live travel times at any time.
+
+    The costs are always between the live and the free flow travel times.
+    """
+    return min(
+        min_costs_per_meter_by_attr(attr, edge_data)
+        for attr in ("travel_time", FREE_FLOW_TRAVEL_TIME)
+        if attr in edge_data
+    )
+
+
+live_travel_time = time_dependent(
+    live_travel_time_costs, min_live_travel_time_per_meter
+)
+register(live_travel_time, "live_travel_time")
@@ -0,0 +1,21 @@
+import networkx
+import numpy
+import pytest
+
+from routor.compiled import CompiledGraph
+
+
+@pytest.fixture
+def grid() -> CompiledGraph:
+    """
+    Return a directed grid with random edge lengths and some one-way streets.
+    """
+    rng = numpy.random.default_rng(42)
+    graph = networkx.DiGraph()
+    for start, end in networkx.grid_2d_graph(8, 8).edges():
+        graph.add_edge(start, end, length=float(rng.integers(1, 10)))
+        if rng.random() > 0.2:
+            graph.add_edge(end, start, length=float(rng.integers(1, 10)))
+    graph = networkx.convert_node_labels_to_integers(graph)
+    graph.add_node(len(graph))  # unreachable
+    return CompiledGraph.from_graph(graph)
@@ -0,0 +1,107 @@
+from pathlib import Path
+from typing import Optional
+
+import networkx
+import numpy
+import pytest
+
+from routor import exceptions
+from routor.algorithms.alt import Landmarks, landmarks_path
+from routor.algorithms.astar import astar_path
+from routor.compiled import CompiledGraph
+
+
+def test_build(grid: CompiledGraph) -> None:
+    """
+    Make sure distinct landmarks are selected and their costs are correct.
+    """
+    costs = grid.edge_data["length"]
+    landmarks = Landmarks.build(grid, costs, count=4)
+
+    assert len(set(landmarks.landmarks.tolist())) == 4
+    assert landmarks.from_landmarks.shape == (grid.node_count, 4)
+    assert landmarks.to_landmarks.shape == (grid.node_count, 4)
+
+    expected = networkx.single_source_dijkstra_path_length(
+        grid.to_graph(), int(grid.node_ids[landmarks.landmarks[0]]), weight="length"
+    )
+    for node in range(grid.node_count):
+        assert landmarks.from_landmarks[node, 0] == expected.get(
+            int(grid.node_ids[node]), numpy.inf
+        )
+
+
+def test_build__more_landmarks_than_nodes(grid: CompiledGraph) -> None:
+    """
+    Make sure each node is selected once at most.
+    """
+    landmarks = Landmarks.build(grid, grid.edge_data["length"], count=1000)
+    assert sorted(landmarks.landmarks.tolist()) == list(range(grid.node_count))
+
+
+def test_heuristic(grid: CompiledGraph) -> None:
+    """
+    Make sure the heuristic never overestimates the costs.
+    """
+    costs = grid.edge_data["length"]
+    heuristic = Landmarks.build(grid, costs, count=4).heuristic()
+
+    def weight(prev_edge: Optional[int], edge: int) -> float:
+        return costs[edge]
+
+    estimations = 0.0
+    for source in range(0, 64, 3):
+        for target in range(0, 64, 5):
+            assert heuristic(target, target) == 0
+            try:
+                path = astar_path(grid, source, target, weight)
+            except exceptions.PathDoesNotExist:
+                continue
+            result = float(costs[grid.edge_indices(path)].sum())
+            assert heuristic(source, target) <= result
+            estimations += heuristic(source, target)
+    assert estimations > 0
+
+
+def test_heuristic__unreachable(grid: CompiledGraph) -> None:
+    """
+    Make sure nodes unknown to all landmarks do not break the heuristic.
+    """
+    heuristic = Landmarks.build(grid, grid.edge_data["length"], count=4).heuristic()
+    unreachable = grid.node_count - 1
+    assert heuristic(unreachable, 0) >= 0
+    assert heuristic(0, unreachable) >= 0
+
+
+def test_save_load(tmp_path: Path, grid: CompiledGraph) -> None:
+    """
+    Make sure landmarks are saved and loaded unchanged.
+    """
+    landmarks = Landmarks.build(grid, grid.edge_data["length"], count=4)
+    path = tmp_path / "grid.alt.length.npz"
+    landmarks.save(path)
+
+    loaded = Landmarks.load(path, mmap=True)
+    assert loaded.fingerprint == landmarks.fingerprint
+    assert loaded.landmarks.tolist() == landmarks.landmarks.tolist()
+    assert loaded.from_landmarks.tolist() == landmarks.from_landmarks.tolist()
+    assert loaded.to_landmarks.tolist() == landmarks.to_landmarks.tolist()
+
+
+def test_load__unsupported_version(tmp_path: Path) -> None:
+    """
+    Raise proper exception for landmarks in an incompatible format.
+    """
+    path = tmp_path / "grid.alt.length.npz"
+    numpy.savez(path, format_version=numpy.array(0))
+
+    with pytest.raises(exceptions.GraphException):
+        Landmarks.load(path)
+
+
+def test_landmarks_path() -> None:
+    """
+    Make sure landmarks are stored next to the map.
+    """
+    result = landmarks_path(Path("maps/bristol.npz"), "length")
+    assert result == Path("maps/bristol.alt.length.npz")
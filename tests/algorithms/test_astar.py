@@ -0,0 +1,86 @@
+from typing import Optional
+
+import networkx
+import pytest
+
+from routor import exceptions
+from routor.algorithms.astar import astar_path, astar_search
+from routor.compiled import CompiledGraph
+
+
+@pytest.fixture
+def square() -> CompiledGraph:
+    """
+    Return a square with a short and a long side.
+
+    0 -> 1 -> 3 is shorter than 0 -> 2 -> 3.
+    """
+    graph = networkx.DiGraph()
+    graph.add_node(0)
+    graph.add_edge(0, 2, length=2.0)
+    graph.add_edge(0, 1, length=1.0)
+    graph.add_edge(1, 3, length=1.0)
+    graph.add_edge(2, 3, length=2.0)
+    graph.add_node(4)  # unreachable
+    return CompiledGraph.from_graph(graph)
+
+
+def test_astar_path(square: CompiledGraph) -> None:
+    """
+    Make sure the cheapest path is found.
+    """
+    length = square.edge_data["length"]
+
+    def weight(prev_edge: Optional[int], edge: int) -> float:
+        return length[edge]
+
+    path = astar_path(square, square.index_of(0), square.index_of(3), weight)
+    assert [square.node_ids[index] for index in path] == [0, 1, 3]
+
+
+def test_astar_search(square: CompiledGraph) -> None:
+    """
+    Make sure the costs and edges of the cheapest path are returned.
+    """
+    length = square.edge_data["length"]
+
+    def weight(prev_edge: Optional[int], edge: int) -> float:
+        return length[edge]
+
+    source, target = square.index_of(0), square.index_of(3)
+    costs, edges = astar_search(square, source, target, weight)
+    assert costs == 2.0
+    assert edges == square.edge_indices([source, square.index_of(1), target])
+    assert astar_search(square, source, source, weight) == (0, [])
+
+
+def test_astar_path__prev_edge(square: CompiledGraph) -> None:
+    """
+    Make sure the previous edge is passed to the weight function.
+    """
+    length = square.edge_data["length"]
+    turn_penalty_edge = square.edge_index(square.index_of(1), square.index_of(3))
+
+    def weight(prev_edge: Optional[int], edge: int) -> float:
+        if prev_edge is not None and edge == turn_penalty_edge:
+            return 10
+        return length[edge]
+
+    path = astar_path(square, square.index_of(0), square.index_of(3), weight)
+    assert [square.node_ids[index] for index in path] == [0, 2, 3]
+
+
+def test_astar_path__same_node(square: CompiledGraph) -> None:
+    """
+    The path from a node to itself only consists of the node.
+    """
+    path = astar_path(square, 0, 0, lambda prev_edge, edge: 1)
+    assert path == [0]
+
+
+def test_astar_path__unreachable(square: CompiledGraph) -> None:
+    """
+    Raise proper exception if there is no path.
+    """
+    with pytest.raises(exceptions.PathDoesNotExist):
+        astar_path(square, square.index_of(0), square.index_of(4), lambda *args: 1)
@@ -0,0 +1,52 @@
+import pytest
+
+from routor import exceptions
+from routor.algorithms.astar import astar_search
+from routor.algorithms.bidirectional import bidirectional_dijkstra
+from routor.algorithms.statistics import SearchStatistics
+from routor.compiled import CompiledGraph
+
+
+def test_bidirectional_dijkstra(grid: CompiledGraph) -> None:
+    """
+    Make sure the shortest paths between all pairs of nodes are found.
+    """
+    costs = grid.edge_data["length"]
+    for source in range(grid.node_count - 1):
+        for target in range(grid.node_count - 1):
+            try:
+                expected, _ = astar_search(
+                    grid, source, target, lambda prev_edge, edge: costs[edge]
+                )
+            except exceptions.PathDoesNotExist:
+                with pytest.raises(exceptions.PathDoesNotExist):
+                    bidirectional_dijkstra(grid, source, target, costs)
+                continue
+
+            result, edges = bidirectional_dijkstra(grid, source, target, costs)
+            assert result == pytest.approx(expected)
+            assert float(costs[edges].sum()) == pytest.approx(expected)
+            nodes = [source, *grid.targets[edges].tolist()]
+            assert grid.edge_indices(nodes) == edges
+            assert nodes[-1] == target
+
+
+def test_bidirectional_dijkstra__unreachable(grid: CompiledGraph) -> None:
+    """
+    Raise proper exception if there is no path.
+    """
+    costs = grid.edge_data["length"]
+    with pytest.raises(exceptions.PathDoesNotExist):
+        bidirectional_dijkstra(grid, 0, grid.node_count - 1, costs)
+    assert bidirectional_dijkstra(grid, 5, 5, costs) == (0, [])
+
+
+def test_bidirectional_dijkstra__explored(grid: CompiledGraph) -> None:
+    """
+    Make sure fewer nodes are explored than by a unidirectional search.
+    """
+    costs = grid.edge_data["length"]
+    forward, bidirectional = SearchStatistics(), SearchStatistics()
+    astar_search(grid, 0, 63, lambda prev_edge, edge: costs[edge], statistics=forward)
+    bidirectional_dijkstra(grid, 0, 63, costs, statistics=bidirectional)
+    assert 0 < bidirectional.explored < forward.explored
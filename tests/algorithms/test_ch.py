@@ -0,0 +1,80 @@
+from pathlib import Path
+from typing import Optional
+
+import numpy
+import pytest
+
+from routor import exceptions
+from routor.algorithms.astar import astar_path
+from routor.algorithms.ch import ContractionHierarchy, fingerprint, hierarchy_path
+from routor.compiled import CompiledGraph
+
+
+def path_costs(graph: CompiledGraph, path, costs: numpy.ndarray) -> float:
+    return float(costs[graph.edge_indices(path)].sum())
+
+
+def test_shortest_path(grid: CompiledGraph) -> None:
+    """
+    Make sure the hierarchy finds paths as short as A*.
+    """
+    costs = grid.edge_data["length"]
+    hierarchy = ContractionHierarchy.build(grid, costs)
+
+    def weight(prev_edge: Optional[int], edge: int) -> float:
+        return costs[edge]
+
+    for source in range(0, 64, 3):
+        for target in range(0, 64, 5):
+            try:
+                expected = astar_path(grid, source, target, weight)
+            except exceptions.PathDoesNotExist:
+                with pytest.raises(exceptions.PathDoesNotExist):
+                    hierarchy.shortest_path(source, target)
+                continue
+
+            result, path = hierarchy.shortest_path(source, target)
+            assert path[0] == source
+            assert path[-1] == target
+            assert result == pytest.approx(path_costs(grid, expected, costs))
+            assert path_costs(grid, path, costs) == pytest.approx(result)
+
+
+def test_shortest_path__unreachable(grid: CompiledGraph) -> None:
+    """
+    Raise proper exception if there is no path.
+    """
+    hierarchy = ContractionHierarchy.build(grid, grid.edge_data["length"])
+    with pytest.raises(exceptions.PathDoesNotExist):
+        hierarchy.shortest_path(0, grid.node_count - 1)
+
+
+def test_save_load(tmp_path: Path, grid: CompiledGraph) -> None:
+    """
+    Make sure a hierarchy is saved and loaded unchanged.
+    """
+    hierarchy = ContractionHierarchy.build(grid, grid.edge_data["length"])
+    path = tmp_path / "grid.ch.length.npz"
+    hierarchy.save(path)
+
+    loaded = ContractionHierarchy.load(path, mmap=True)
+    assert loaded.fingerprint == hierarchy.fingerprint
+    assert loaded.rank.tolist() == hierarchy.rank.tolist()
+    assert loaded.shortest_path(0, 63) == hierarchy.shortest_path(0, 63)
+
+
+def test_fingerprint(grid: CompiledGraph) -> None:
+    """
+    Make sure the fingerprint changes with the costs.
+    """
+    costs = grid.edge_data["length"]
+    assert fingerprint(grid, costs) == fingerprint(grid, costs.copy())
+    assert fingerprint(grid, costs) != fingerprint(grid, costs * 2)
+
+
+def test_hierarchy_path() -> None:
+    """
+    Hierarchies are stored next to the map.
+    """
+    path = hierarchy_path(Path("/maps/bristol.npz"), "length")
+    assert path == Path("/maps/bristol.ch.length.npz")
@@ -0,0 +1,94 @@
+from typing import Optional
+
+import numpy
+import pytest
+
+from routor import exceptions
+from routor.algorithms.astar import astar_path
+from routor.algorithms.dijkstra import shortest_path_tree, time_dependent_tree
+from routor.compiled import CompiledGraph
+
+
+def test_shortest_path_tree(grid: CompiledGraph) -> None:
+    """
+    Make sure all reachable nodes are settled with the costs of their shortest path.
+    """
+    costs = grid.edge_data["length"]
+
+    def weight(prev_edge: Optional[int], edge: int) -> float:
+        return costs[edge]
+
+    tree = shortest_path_tree(grid, 0, weight)
+    assert tree.order[0] == 0
+    assert grid.node_count - 1 not in tree.costs  # unreachable
+
+    sums = tree.sums(costs)
+    for target in range(grid.node_count - 1):
+        try:
+            path = astar_path(grid, 0, target, weight)
+        except exceptions.PathDoesNotExist:
+            assert target not in tree.costs
+            continue
+
+        expected = float(costs[grid.edge_indices(path)].sum())
+        assert tree.costs[target] == pytest.approx(expected)
+        assert sums[target] == pytest.approx(expected)
+        edge_path = tree.edge_path(target)
+        assert float(costs[edge_path].sum()) == pytest.approx(expected)
+
+
+def test_shortest_path_tree__targets(grid: CompiledGraph) -> None:
+    """
+    Make sure the search stops once all targets are settled.
+    """
+    costs = grid.edge_data["length"]
+    tree = shortest_path_tree(grid, 0, lambda prev_edge, edge: costs[edge], [1, 8])
+
+    assert {1, 8} <= set(tree.costs)
+    assert tree.order[-1] in (1, 8)
+    assert len(tree.order) < grid.node_count - 1
+
+
+def test_shortest_path_tree__max_costs(grid: CompiledGraph) -> None:
+    """
+    Make sure only nodes within the costs are settled.
+    """
+    costs = grid.edge_data["length"]
+
+    def weight(prev_edge: Optional[int], edge: int) -> float:
+        return costs[edge]
+
+    max_costs = float(
+        numpy.median(list(shortest_path_tree(grid, 0, weight).costs.values()))
+    )
+    tree = shortest_path_tree(grid, 0, weight, max_costs=max_costs)
+    full_tree = shortest_path_tree(grid, 0, weight)
+    assert tree.costs == {
+        node: node_costs
+        for node, node_costs in full_tree.costs.items()
+        if node_costs <= max_costs
+    }
+
+
+def test_time_dependent_tree(grid: CompiledGraph) -> None:
+    """
+    Make sure edges are entered at the costs of reaching their source.
+    """
+    costs = grid.edge_data["length"]
+    tree = shortest_path_tree(grid, 0, lambda prev_edge, edge: costs[edge])
+
+    # costs double for edges entered later than the median
+    median = float(numpy.median(list(tree.costs.values())))
+
+    def weight(edge: int, elapsed: float) -> float:
+        return costs[edge] * (2 if elapsed > median else 1)
+
+    time_dependent = time_dependent_tree(grid, 0, weight)
+    assert set(time_dependent.costs) == set(tree.costs)
+    for node, node_costs in tree.costs.items():
+        if node_costs <= median:
+            assert time_dependent.costs[node] == pytest.approx(node_costs)
+        edge = time_dependent.edges[node]
+        if edge is not None:
+            arrival = time_dependent.costs[int(grid.sources[edge])]
+            assert time_dependent.costs[node] == arrival + weight(edge, arrival)
@@ -0,0 +1,59 @@
+import networkx
+import pytest
+
+from routor import exceptions
+from routor.algorithms.astar import astar_search
+from routor.algorithms.time_dependent import time_dependent_search
+from routor.compiled import CompiledGraph
+
+
+@pytest.fixture
+def square() -> CompiledGraph:
+    """
+    Return a square with a short and a long side.
+
+    0 -> 1 -> 3 is shorter than 0 -> 2 -> 3.
+    """
+    graph = networkx.DiGraph()
+    graph.add_edge(0, 2, length=2.0)
+    graph.add_edge(0, 1, length=1.0)
+    graph.add_edge(1, 3, length=1.0)
+    graph.add_edge(2, 3, length=2.0)
+    graph.add_node(4)  # unreachable
+    return CompiledGraph.from_graph(graph)
+
+
+def test_time_dependent_search(square: CompiledGraph) -> None:
+    """
+    Make sure edges are weighted at the time they are entered.
+    """
+    length = square.edge_data["length"]
+    jammed = square.edge_index(square.index_of(1), square.index_of(3))
+
+    def weight(edge: int, elapsed: float) -> float:
+        # the short side is jammed until 2
+        if edge == jammed and elapsed < 2:
+            return 10 - elapsed
+        return length[edge]
+
+    source, target = square.index_of(0), square.index_of(3)
+    arrival, edges = time_dependent_search(square, source, target, weight)
+    assert arrival == 4.0
+    assert edges == square.edge_indices([source, square.index_of(2), target])
+    assert time_dependent_search(square, source, source, weight) == (0, [])
+
+    with pytest.raises(exceptions.PathDoesNotExist):
+        time_dependent_search(square, source, square.index_of(4), weight)
+
+
+def test_time_dependent_search__static(grid: CompiledGraph) -> None:
+    """
+    Make sure the same costs as A* are found for weights not depending on time.
+    """
+    length = grid.edge_data["length"]
+    for target in range(1, grid.node_count - 1, 7):
+        arrival, _ = time_dependent_search(
+            grid, 0, target, lambda edge, elapsed: length[edge]
+        )
+        costs, _ = astar_search(grid, 0, target, lambda prev_edge, edge: length[edge])
+        assert arrival == costs
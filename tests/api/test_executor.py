@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from routor.api.executor import BoundedExecutor, ExecutorSaturated
+
+
+def test_run() -> None:
+    """
+    Make sure results are returned and workers released.
+    """
+    executor = BoundedExecutor(workers=1, queue_size=0)
+    assert asyncio.run(executor.run(sum, [1, 2])) == 3
+    assert executor.pending == 0
+
+
+def test_run__saturated() -> None:
+    """
+    Make sure searches are rejected if all workers are busy and the queue is full.
+    """
+    executor = BoundedExecutor(workers=1, queue_size=1)
+    event = threading.Event()
+
+    async def _main() -> None:
+        tasks = [asyncio.ensure_future(executor.run(event.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(event.wait)
+        event.set()
+        assert await asyncio.gather(*tasks) == [True, True]
+
+    asyncio.run(_main())
+    assert executor.pending == 0
+
+
+def test_run__timeout() -> None:
+    """
+    Make sure running searches keep their worker busy after a timeout.
+    """
+    executor = BoundedExecutor(workers=1, queue_size=0, timeout=0.01)
+    event = threading.Event()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(executor.run(event.wait))
+    assert executor.pending == 1
+
+    event.set()
+    executor.shutdown()
+    for _ in range(100):
+        if not executor.pending:
+            break
+        time.sleep(0.01)
+    assert executor.pending == 0
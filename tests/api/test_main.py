@@ -1,7 +1,13 @@
+import asyncio
+
+import numpy
 import pytest
 from fastapi.testclient import TestClient
 
 from routor import engine, models, weights
+from routor.api import config
+from routor.api.executor import BoundedExecutor, ExecutorSaturated
+from routor.api.main import get_settings
 
 
 def test_read_weights(mocker, client: TestClient) -> None:
@@ -50,5 +56,308 @@ def test_read_route(
         },
     )
     assert response.status_code == 200, response.content
-    engine.Engine.route.assert_called_with(origin, destination, weight_func, weights.travel_time)  # type: ignore
+    engine.Engine.route.assert_called_with(origin, destination, weight_func, weights.travel_time, False, False, None)  # type: ignore
     assert response.json() == expected_data
+
+
+@pytest.mark.parametrize(
+    ("geometry", "expected_geometry"),
+    (
+        ("polyline", {"polyline": "_sdpH~reK_pR~oR"}),
+        ("coordinates", {"coordinates": [[50, -2], [50.1, -2.1]]}),
+    ),
+)
+def test_read_route__slim(
+    mocker, client: TestClient, geometry: str, expected_geometry: dict
+) -> None:
+    """
+    Make sure the path can be returned as polyline or coordinates, with edges.
+    """
+    location = {"latitude": 50, "longitude": -2}
+    route = models.Route(
+        costs=10,
+        length=30,
+        travel_time=20,
+        path=[location, {"latitude": 50.1, "longitude": -2.1}],
+        edges=[{"osm_id": 1, "length": 30, "travel_time": 20}],
+    )
+    mocker.patch.object(engine.Engine, "route", return_value=route)
+
+    response = client.get(
+        "/route",
+        json={
+            "origin": location,
+            "destination": location,
+            "weight": "length",
+            "geometry": geometry,
+            "edges": True,
+        },
+    )
+    assert response.status_code == 200, response.content
+    assert engine.Engine.route.call_args.args[-3:] == (True, False, None)  # type: ignore
+    assert response.json() == {
+        "costs": 10,
+        "length": 30,
+        "travel_time": 20,
+        "edges": [{"osm_id": 1, "length": 30, "travel_time": 20}],
+        **expected_geometry,
+    }
+
+
+@pytest.mark.parametrize("method", ("get", "post"))
+def test_read_route_batch(mocker, client: TestClient, method: str) -> None:
+    """
+    Test if routes for all pairs are returned in order.
+    """
+    origin = models.Location(latitude=51.454514, longitude=-2.587910)
+    destination = models.Location(latitude=52.520008, longitude=13.404954)
+    route = models.Route(costs=10, length=30, travel_time=20, path=[origin])
+    mocker.patch.object(
+        engine.Engine,
+        "route_batch",
+        return_value=iter(
+            [models.RouteResult(route=route), models.RouteResult(error="no path")]
+        ),
+    )
+
+    response = getattr(client, method)(
+        "/route/batch",
+        json={
+            "pairs": [
+                {"origin": origin.dict(), "destination": destination.dict()},
+                {"origin": destination.dict(), "destination": origin.dict()},
+            ],
+            "weight": "length",
+        },
+    )
+    assert response.status_code == 200, response.content
+    pairs, weight_func, travel_time_func = engine.Engine.route_batch.call_args.args  # type: ignore
+    assert list(pairs) == [(origin, destination), (destination, origin)]
+    assert (weight_func, travel_time_func) == (weights.length, weights.travel_time)
+    assert response.json() == [
+        {"route": route.dict(), "error": None},
+        {"route": None, "error": "no path"},
+    ]
+
+
+def test_read_matrix(mocker, client: TestClient) -> None:
+    """
+    Test if the matrix is returned with missing routes as null.
+    """
+    origin = models.Location(latitude=51.454514, longitude=-2.587910)
+    destination = models.Location(latitude=52.520008, longitude=13.404954)
+    mocker.patch.object(
+        engine.Engine,
+        "matrix",
+        return_value=models.Matrix(
+            costs=numpy.array([[1.234, numpy.nan]]),
+            lengths=numpy.array([[2.0, numpy.nan]]),
+            travel_times=numpy.array([[3.0, numpy.nan]]),
+        ),
+    )
+
+    response = client.post(
+        "/matrix",
+        json={
+            "origins": [origin.dict()],
+            "destinations": [origin.dict(), destination.dict()],
+            "weight": "length",
+        },
+    )
+    assert response.status_code == 200, response.content
+    engine.Engine.matrix.assert_called_with([origin], [origin, destination], weights.length, weights.travel_time)  # type: ignore
+    assert response.json() == {
+        "costs": [[1.23, None]],
+        "lengths": [[2.0, None]],
+        "travel_times": [[3.0, None]],
+    }
+
+
+@pytest.mark.parametrize(
+    ("error", "status_code"),
+    ((ExecutorSaturated(), 429), (asyncio.TimeoutError(), 504)),
+)
+def test_read_route__executor_limits(
+    mocker, client: TestClient, error: Exception, status_code: int
+) -> None:
+    """
+    Test if saturated workers and timeouts are reported properly.
+    """
+    mocker.patch.object(BoundedExecutor, "run", side_effect=error)
+    location = models.Location(latitude=51.454514, longitude=-2.587910)
+
+    response = client.get(
+        "/route",
+        json={
+            "origin": location.dict(),
+            "destination": location.dict(),
+            "weight": "length",
+        },
+    )
+    assert response.status_code == status_code, response.content
+
+
+def test_read_weights__saturated(mocker, client: TestClient) -> None:
+    """
+    Make sure other endpoints stay available while all workers are busy.
+    """
+    mocker.patch.object(BoundedExecutor, "run", side_effect=ExecutorSaturated())
+
+    response = client.get("/weights")
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("method", ("get", "post"))
+def test_read_isochrone(mocker, client: TestClient, method: str) -> None:
+    """
+    Test if the reached nodes are returned.
+    """
+    origin = models.Location(latitude=51.454514, longitude=-2.587910)
+    isochrone = models.Isochrone(
+        nodes=[models.ReachedNode(osm_id=1, costs=0, **origin.dict())],
+        polygon=[origin],
+    )
+    mocker.patch.object(engine.Engine, "isochrone", return_value=isochrone)
+
+    response = getattr(client, method)(
+        "/isochrone",
+        json={
+            "origin": origin.dict(),
+            "max_costs": 900,
+            "weight": "travel_time",
+            "polygon": True,
+        },
+    )
+    assert response.status_code == 200, response.content
+    engine.Engine.isochrone.assert_called_with(origin, 900, weights.travel_time, True)  # type: ignore
+    assert response.json() == isochrone.dict()
+
+    response = getattr(client, method)(
+        "/isochrone",
+        json={"origin": origin.dict(), "max_costs": 0, "weight": "travel_time"},
+    )
+    assert response.status_code == 422
+
+
+def test_read_route__metrics(client: TestClient) -> None:
+    """
+    Make sure measurements of the route are returned if requested.
+    """
+    origin = {"latitude": 51.4996599, "longitude": -2.6823824}
+    destination = {"latitude": 51.4936, "longitude": -2.6653}
+    request = {"origin": origin, "destination": destination, "weight": "length"}
+
+    response = client.get("/route", json=request)
+    assert response.status_code == 200, response.content
+    assert "metrics" not in response.json()
+
+    for geometry in ("locations", "polyline"):
+        response = client.get(
+            "/route", json={**request, "metrics": True, "geometry": geometry}
+        )
+        assert response.status_code == 200, response.content
+        metrics = response.json()["metrics"]
+        assert metrics["explored"] > 0
+        assert metrics["relaxed"] >= metrics["explored"] - 1
+        assert metrics["search_time"] > 0
+        assert metrics["serialization_time"] > 0
+
+
+def test_read_metrics(client: TestClient, graph_path) -> None:
+    """
+    Make sure route metrics are exported as Prometheus histograms if enabled.
+    """
+    assert client.get("/metrics").status_code == 404
+
+    client.app.dependency_overrides[get_settings] = lambda: config.Settings(
+        map_path=graph_path, metrics=True
+    )
+    try:
+        location = {"latitude": 51.4996599, "longitude": -2.6823824}
+        response = client.get(
+            "/route",
+            json={"origin": location, "destination": location, "weight": "length"},
+        )
+        assert response.status_code == 200, response.content
+        assert "metrics" not in response.json()
+
+        response = client.get("/metrics")
+        assert response.status_code == 200, response.content
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'routor_route_search_seconds_bucket{le="+Inf"}' in response.text
+        assert "routor_route_cache" not in response.text
+    finally:
+        client.app.dependency_overrides.clear()
+
+
+def test_get_engine__map_reload(monkeypatch, tmp_path, compiled_graph_path) -> None:
+    """
+    Make sure the engine is reloaded once the map has been replaced.
+    """
+    from routor.api import main
+
+    monkeypatch.setattr(main.get_engine, "__cache", None, raising=False)
+    settings = config.Settings(map_path=compiled_graph_path, map_reload=True)
+    routing_engine = main.get_engine(settings)
+    assert main.get_engine(settings) is routing_engine
+
+    replacement = tmp_path / "replacement.npz"
+    replacement.write_bytes(compiled_graph_path.read_bytes())
+    replacement.replace(compiled_graph_path)
+    assert routing_engine.map_changed()
+    assert main.get_engine(settings) is not routing_engine
+
+
+def test_update_traffic(monkeypatch, client: TestClient, graph_path) -> None:
+    """
+    Make sure live travel times are used for routing until they are removed.
+    """
+    from routor.api import main
+
+    monkeypatch.setattr(main.get_engine, "__cache", None, raising=False)
+    request = {
+        "origin": {"latitude": 51.4996612, "longitude": -2.6823825},
+        "destination": {"latitude": 51.4973375, "longitude": -2.682841},
+        "weight": "travel_time",
+    }
+    route = client.get("/route", json=request).json()
+    osmids = set(engine.Engine(graph_path).graph.edge_data["osmid"].tolist())
+
+    response = client.put(
+        "/traffic",
+        json={"edges": [{"osmid": osmid, "travel_time": 1} for osmid in osmids]},
+    )
+    assert response.status_code == 200, response.content
+    assert response.json()["version"] == 1
+    live_route = client.get("/route", json=request).json()
+    assert live_route["travel_time"] == len(live_route["path"]) - 1
+
+    response = client.put("/traffic", json={"edges": [{"start": 1}]})
+    assert response.status_code == 422
+
+    response = client.delete("/traffic")
+    assert response.status_code == 200, response.content
+    assert response.json() == {"edges": 0, "version": 2}
+    assert client.get("/route", json=request).json() == route
+
+
+def test_get_engine__traffic_file(monkeypatch, tmp_path, graph_path) -> None:
+    """
+    Make sure the traffic file is applied again once it has been replaced.
+    """
+    from routor.api import main
+
+    monkeypatch.setattr(main.get_engine, "__cache", None, raising=False)
+    traffic = tmp_path / "traffic.csv"
+    traffic.write_text("osmid,speed_kph\n")
+    settings = config.Settings(map_path=graph_path, traffic_file=traffic)
+    routing_engine = main.get_engine(settings)
+    assert routing_engine.traffic.version == 1
+
+    osmid = routing_engine.graph.edge_data["osmid"][0]
+    replacement = tmp_path / "replacement.csv"
+    replacement.write_text(f"osmid,speed_kph\n{osmid},5\n")
+    replacement.replace(traffic)
+    assert main.get_engine(settings) is routing_engine
+    assert routing_engine.traffic.version == 2
+    assert routing_engine.traffic.edge_count > 0
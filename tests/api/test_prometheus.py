@@ -0,0 +1,45 @@
+from routor import models
+from routor.api import prometheus
+
+
+def test_histogram() -> None:
+    """
+    Make sure buckets are rendered cumulatively.
+    """
+    histogram = prometheus.Histogram("my_seconds", "My help.", (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.render() == [
+        "# HELP my_seconds My help.",
+        "# TYPE my_seconds histogram",
+        'my_seconds_bucket{le="0.1"} 2',
+        'my_seconds_bucket{le="1.0"} 3',
+        'my_seconds_bucket{le="+Inf"} 4',
+        "my_seconds_sum 2.65",
+        "my_seconds_count 4",
+    ]
+
+
+def test_observe_route(mocker) -> None:
+    """
+    Make sure only snapping and serialization are observed for cached routes.
+    """
+    observe = mocker.patch.object(prometheus.Histogram, "observe")
+    prometheus.observe_route(models.RouteMetrics(explored=10))
+    assert observe.call_count == len(prometheus.ROUTE_HISTOGRAMS)
+
+    observe.reset_mock()
+    prometheus.observe_route(models.RouteMetrics(cached=True))
+    assert observe.call_count == len(prometheus.PER_REQUEST_METRICS)
+
+
+def test_render() -> None:
+    """
+    Make sure the statistics of the route cache are rendered.
+    """
+    text = prometheus.render({"size": 3, "hits": 2})
+    assert text.endswith("\n")
+    assert "# TYPE routor_route_cache_size gauge\nroutor_route_cache_size 3\n" in text
+    assert "routor_route_cache_hits_total 2" in text
+    assert "routor_route_explored_nodes_count" in text
@@ -4,6 +4,7 @@ import osmnx
 import pytest
 from networkx import DiGraph
 
+from routor.compiled import CompiledGraph
 from routor.engine import Engine
 
 
@@ -44,6 +45,51 @@ def graph(graph_path: Path) -> DiGraph:
     return graph
 
 
+@pytest.fixture
+def compiled_graph_path(tmp_path: Path, graph_path: Path) -> Path:
+    """
+    Return path to the test map in the compiled format.
+    """
+    path = tmp_path / "tiny_bristol.npz"
+    CompiledGraph.from_graph(osmnx.io.load_graphml(str(graph_path))).save(path)
+    return path
+
+
+@pytest.fixture
+def osm_file(tmp_path: Path, graph: DiGraph) -> Path:
+    """
+    Return the test map as OSM XML file, each edge is a one-way street.
+    """
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    for node, data in graph.nodes(data=True):
+        lines.append(f'<node id="{node}" lat="{data["y"]}" lon="{data["x"]}"/>')
+    for way, (start, end, data) in enumerate(graph.edges(data=True), start=1):
+        lines.extend(
+            [
+                f'<way id="{way}">',
+                f'<nd ref="{start}"/>',
+                f'<nd ref="{end}"/>',
+                f'<tag k="highway" v="{data["highway"]}"/>',
+                f'<tag k="maxspeed" v="{data["maxspeed"]}"/>',
+                '<tag k="oneway" v="yes"/>',
+                "</way>",
+            ]
+        )
+    lines.append("</osm>")
+
+    path = tmp_path / "map.osm"
+    path.write_text("\n".join(lines))
+    return path
+
+
+@pytest.fixture
+def compiled_graph(graph: DiGraph) -> CompiledGraph:
+    """
+    Return a compiled graph for testing.
+    """
+    return CompiledGraph.from_graph(graph)
+
+
 @pytest.fixture
 def engine(graph_path: Path) -> Engine:
     """
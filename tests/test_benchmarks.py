@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from benchmarks import suite, synthetic
+
+
+def test_road_grid() -> None:
+    """
+    Make sure synthetic maps are reproducible.
+    """
+    graph = synthetic.road_grid(5, 4, seed=1)
+    assert graph.number_of_nodes() == 20
+    assert list(graph.edges(data=True)) == list(
+        synthetic.road_grid(5, 4, seed=1).edges(data=True)
+    )
+
+
+def test_run(tmp_path: Path) -> None:
+    """
+    Run the suite on a tiny map and compare the result with itself.
+    """
+    result = suite.run(tmp_path, 6, rounds=1, routes=2, matrix_size=2)
+    assert result["metadata"]["nodes"] == 36
+    assert result["results"]["route_travel_time"]["median"] > 0
+
+    rows = suite.compare(result, result)
+    assert {name for name, *_ in rows} == set(result["results"])
+    assert not any(regression for *_, regression in rows)
+    assert suite.save(result, tmp_path / "results").exists()
@@ -0,0 +1,78 @@
+from routor import models
+from routor.cache import RouteCache
+
+ROUTE = models.Route(costs=1, length=2, travel_time=3, path=[])
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_get_put() -> None:
+    """
+    Make sure routes are cached and hits and misses are counted.
+    """
+    cache = RouteCache(max_size=2)
+    assert cache.get("a") is None
+
+    cache.put("a", ROUTE)
+    assert cache.get("a") is ROUTE
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_put__lru() -> None:
+    """
+    Make sure the least recently used routes are evicted.
+    """
+    cache = RouteCache(max_size=2)
+    cache.put("a", ROUTE)
+    cache.put("b", ROUTE)
+    cache.get("a")
+    cache.put("c", ROUTE)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is ROUTE
+    assert cache.get("c") is ROUTE
+    assert cache.evictions == 1
+
+
+def test_put__disabled() -> None:
+    """
+    Make sure nothing is cached without size.
+    """
+    cache = RouteCache(max_size=0)
+    cache.put("a", ROUTE)
+    assert len(cache) == 0
+
+
+def test_get__ttl() -> None:
+    """
+    Make sure expired routes are evicted.
+    """
+    clock = FakeClock()
+    cache = RouteCache(max_size=2, ttl=10, clock=clock)
+    cache.put("a", ROUTE)
+
+    clock.now = 10
+    assert cache.get("a") is ROUTE
+    clock.now = 10.1
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 1, "evictions": 1}
+
+
+def test_validate() -> None:
+    """
+    Make sure the cache is cleared if the token changes.
+    """
+    cache = RouteCache(max_size=2)
+    cache.validate(1)
+    cache.put("a", ROUTE)
+
+    cache.validate(1)
+    assert cache.get("a") is ROUTE
+    cache.validate(2)
+    assert cache.get("a") is None
@@ -1,9 +1,12 @@
 import json
+import shutil
 from pathlib import Path
 
+import pytest
 from click.testing import CliRunner
 
 from routor import cli
+from routor.compiled import CompiledGraph
 
 from . import test_engine
 
@@ -56,7 +59,7 @@ EXPECTED_PATH = [
 ]
 
 
-def test_main(graph_path: Path):
+def route(map_path: Path, *options: str):
     runner = CliRunner()
     origin = f"{test_engine.ORIGIN_LOCATION.latitude},{test_engine.ORIGIN_LOCATION.longitude}"
     destination = f"{test_engine.DESTINATION_LOCATION.latitude},{test_engine.DESTINATION_LOCATION.longitude}"
@@ -64,16 +67,20 @@ def test_main(graph_path: Path):
     result = runner.invoke(
         cli.route,
         [
-            str(graph_path),
+            str(map_path),
             origin,
             destination,
             "routor.weights.travel_time",
             "routor.weights.travel_time",
+            *options,
         ],
     )
     assert result.exit_code == 0
+    return json.loads(result.output)
+
 
-    data = json.loads(result.output)
+def test_main(graph_path: Path):
+    data = route(graph_path)
     expected_data = {
         "costs": 46.20,
         "length": 1449.67,
@@ -83,3 +90,200 @@ def test_main(graph_path: Path):
         ],
     }
     assert json.dumps(data, sort_keys=True) == json.dumps(expected_data, sort_keys=True)
+    assert route(graph_path, "--bidirectional") == data
+
+
+def test_convert(tmp_path: Path, graph_path: Path):
+    """
+    Make sure a converted map can be used for routing.
+    """
+    runner = CliRunner()
+    compiled_path = tmp_path / "map.npz"
+    graphml_path = tmp_path / "map.graphml"
+
+    result = runner.invoke(cli.convert, [str(graph_path), str(compiled_path)])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(cli.convert, [str(compiled_path), str(graphml_path)])
+    assert result.exit_code == 0, result.output
+
+    expected_data = route(graph_path)
+    assert route(compiled_path) == expected_data
+    assert route(graphml_path) == expected_data
+
+
+@pytest.mark.parametrize("suffix", (".npz", ".graphml"))
+def test_convert__enhance(tmp_path: Path, graph_path: Path, suffix: str):
+    """
+    Make sure enhanced maps have the same travel times.
+    """
+    runner = CliRunner()
+    map_path = tmp_path / f"map{suffix}"
+
+    result = runner.invoke(cli.convert, [str(graph_path), str(map_path), "--enhance"])
+    assert result.exit_code == 0, result.output
+
+    assert route(map_path) == route(graph_path)
+
+
+def test_download__osm_file(tmp_path: Path, osm_file: Path):
+    """
+    Make sure a map is built tile by tile from a local OSM file.
+    """
+    runner = CliRunner()
+    map_path = tmp_path / "map.npz"
+    options = ["--tile-size", "0.004", "--tile-cache", str(tmp_path / "tiles")]
+    result = runner.invoke(
+        cli.download, [*options, "--osm-file", str(osm_file), str(map_path)]
+    )
+    assert result.exit_code == 0, result.output
+    assert map_path.exists()
+    assert route(map_path)["costs"] > 0
+
+
+def test_download__tiled_without_area(tmp_path: Path):
+    """
+    Tiled downloads require regions or an OSM file.
+    """
+    runner = CliRunner()
+    result = runner.invoke(
+        cli.download, ["--tile-size", "0.1", str(tmp_path / "map.graphml")]
+    )
+    assert result.exit_code == 2
+    assert "Either REGIONS or --osm-file are required" in result.output
+
+
+@pytest.mark.parametrize("suffix", (".npz", ".graphml"))
+def test_build(tmp_path: Path, osm_file: Path, suffix: str):
+    """
+    Make sure a map is built from a local OSM file.
+    """
+    runner = CliRunner()
+    map_path = tmp_path / f"map{suffix}"
+    result = runner.invoke(cli.build, [str(osm_file), str(map_path)])
+    assert result.exit_code == 0, result.output
+    assert route(map_path)["costs"] > 0
+
+
+def test_update(tmp_path: Path, compiled_graph_path: Path):
+    """
+    Make sure changed travel times are used for routing.
+    """
+    osmids = set(CompiledGraph.load(compiled_graph_path).edge_data["osmid"].tolist())
+    changes = tmp_path / "changes.csv"
+    changes.write_text(
+        "\n".join(["osmid,travel_time", *(f"{osmid},1" for osmid in osmids)])
+    )
+    map_path = tmp_path / "updated.npz"
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli.update,
+        [str(compiled_graph_path), str(changes), "--target", str(map_path)],
+    )
+    assert result.exit_code == 0, result.output
+
+    expected_data = route(compiled_graph_path)
+    data = route(map_path)
+    assert data["travel_time"] == len(data["path"]) - 1
+    assert data["travel_time"] != expected_data["travel_time"]
+
+
+def test_route__traffic(tmp_path: Path, compiled_graph_path: Path):
+    """
+    Make sure live travel times are used for routing.
+    """
+    osmids = set(CompiledGraph.load(compiled_graph_path).edge_data["osmid"].tolist())
+    traffic = tmp_path / "traffic.csv"
+    traffic.write_text(
+        "\n".join(["osmid,travel_time", *(f"{osmid},1" for osmid in osmids)])
+    )
+
+    data = route(compiled_graph_path, "--traffic", str(traffic))
+    assert data["travel_time"] == len(data["path"]) - 1
+
+
+def test_contract(tmp_path: Path, graph_path: Path):
+    """
+    Make sure hierarchies are created next to the map and used for routing.
+    """
+    map_path = Path(shutil.copy(graph_path, tmp_path))
+
+    runner = CliRunner()
+    result = runner.invoke(cli.contract, [str(map_path)])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "tiny_bristol.ch.travel_time.npz").exists()
+    assert (tmp_path / "tiny_bristol.ch.length.npz").exists()
+
+    assert route(map_path) == route(graph_path)
+
+
+def test_landmarks(tmp_path: Path, graph_path: Path):
+    """
+    Make sure landmarks are created next to the map and used for routing.
+    """
+    map_path = Path(shutil.copy(graph_path, tmp_path))
+
+    runner = CliRunner()
+    result = runner.invoke(cli.landmarks, ["--count", "4", str(map_path), "length"])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "tiny_bristol.alt.length.npz").exists()
+    assert not (tmp_path / "tiny_bristol.alt.travel_time.npz").exists()
+
+    assert route(map_path) == route(graph_path)
+
+
+def test_route_batch(tmp_path: Path, graph_path: Path):
+    """
+    Make sure one result per pair is printed in order.
+    """
+    origin, destination = test_engine.ORIGIN_LOCATION, test_engine.DESTINATION_LOCATION
+    input_path = tmp_path / "pairs.csv"
+    input_path.write_text(
+        "origin_latitude,origin_longitude,destination_latitude,destination_longitude\n"
+        f"{origin.latitude},{origin.longitude},{destination.latitude},{destination.longitude}\n"
+        f"{destination.latitude},{destination.longitude},{origin.latitude},{origin.longitude}\n"
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli.route_batch,
+        [
+            str(graph_path),
+            str(input_path),
+            "routor.weights.travel_time",
+            "routor.weights.travel_time",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    results = [json.loads(line) for line in result.output.splitlines()]
+    assert len(results) == 2
+    assert results[0] == {"route": route(graph_path), "error": None}
+    assert results[1]["route"] is None
+    assert "not reachable" in results[1]["error"]
+
+
+def test_route_batch__jsonl(graph_path: Path):
+    """
+    Make sure pairs can be streamed as JSON lines from stdin to worker processes.
+    """
+    origin, destination = test_engine.ORIGIN_LOCATION, test_engine.DESTINATION_LOCATION
+    line = f'{{"origin": {origin.json()}, "destination": {destination.json()}}}'
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli.route_batch,
+        [
+            "--format",
+            "jsonl",
+            "--processes",
+            "2",
+            str(graph_path),
+            "-",
+            "routor.weights.travel_time",
+            "routor.weights.travel_time",
+        ],
+        input=line + "\n" + line + "\n",
+    )
+    assert result.exit_code == 0, result.output
+    results = [json.loads(line) for line in result.output.splitlines()]
+    assert results == [{"route": route(graph_path), "error": None}] * 2
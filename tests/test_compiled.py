@@ -0,0 +1,231 @@
+from pathlib import Path
+
+import networkx
+import numpy
+import pytest
+
+from routor import exceptions
+from routor.compiled import (
+    FORMAT_VERSION,
+    CompiledGraph,
+    decode_column,
+    encode_column,
+    read_npz,
+    to_column,
+)
+
+NODE_ID = 127498
+EDGE_START_ID = NODE_ID
+EDGE_END_ID = 305910
+
+
+@pytest.mark.parametrize(
+    ("values", "dtype"),
+    (
+        ([1, 2, 3], numpy.int64),
+        ([1, None, 3], numpy.float64),
+        ([1.5, 2, 3], numpy.float64),
+        ([True, False], numpy.bool_),
+        ([True, None], object),
+        (["a", None], object),
+        ([[1, 2], 3], object),
+    ),
+)
+def test_to_column(values, dtype) -> None:
+    """
+    Make sure columns use the most compact type possible.
+    """
+    column = to_column(values)
+    assert column.dtype == dtype
+    assert len(column) == len(values)
+
+
+def test_from_graph(graph: networkx.DiGraph, compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure the structure of the graph is kept.
+    """
+    assert compiled_graph.node_count == len(graph.nodes)
+    assert compiled_graph.edge_count == len(graph.edges)
+    assert list(compiled_graph.node_ids) == list(graph.nodes)
+
+    for start, end in graph.edges():
+        edge = compiled_graph.edge_index(
+            compiled_graph.index_of(start), compiled_graph.index_of(end)
+        )
+        assert compiled_graph.node_ids[compiled_graph.sources[edge]] == start
+        assert compiled_graph.node_ids[compiled_graph.targets[edge]] == end
+
+
+def test_from_graph__neighbor_order(
+    graph: networkx.DiGraph, compiled_graph: CompiledGraph
+) -> None:
+    """
+    Make sure neighbors are stored in the same order as in the graph.
+    """
+    index = compiled_graph.index_of(NODE_ID)
+    neighbors = [
+        compiled_graph.node_ids[compiled_graph.targets[edge]]
+        for edge in compiled_graph.neighbors(index)
+    ]
+    assert neighbors == list(graph[NODE_ID])
+
+
+def test_index_of__invalid_node(compiled_graph: CompiledGraph) -> None:
+    """
+    Raise proper exception if node is missing.
+    """
+    assert 0 not in compiled_graph
+    assert NODE_ID in compiled_graph
+    with pytest.raises(exceptions.NodeDoesNotExist):
+        compiled_graph.index_of(0)
+
+
+def test_edge_index__invalid_edge(compiled_graph: CompiledGraph) -> None:
+    """
+    Raise proper exception if edge is missing.
+    """
+    index = compiled_graph.index_of(NODE_ID)
+    with pytest.raises(exceptions.EdgeDoesNotExist):
+        compiled_graph.edge_index(index, index)
+
+
+def test_reverse_adjacency(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure the incoming edges of each node are returned.
+    """
+    offsets, edges = compiled_graph.reverse_adjacency()
+    assert compiled_graph.reverse_adjacency()[1] is edges
+    for node in range(compiled_graph.node_count):
+        incoming = edges[offsets[node] : offsets[node + 1]].tolist()
+        assert incoming == [
+            edge
+            for edge in range(compiled_graph.edge_count)
+            if compiled_graph.targets[edge] == node
+        ]
+
+
+def test_node_attributes(
+    graph: networkx.DiGraph, compiled_graph: CompiledGraph
+) -> None:
+    """
+    Make sure all node attributes are available.
+    """
+    index = compiled_graph.index_of(NODE_ID)
+    assert compiled_graph.node_attributes(index) == graph.nodes[NODE_ID]
+
+
+def test_edge_attributes(
+    graph: networkx.DiGraph, compiled_graph: CompiledGraph
+) -> None:
+    """
+    Make sure all edge attributes are available and missing ones are skipped.
+    """
+    edge = compiled_graph.edge_index(
+        compiled_graph.index_of(EDGE_START_ID), compiled_graph.index_of(EDGE_END_ID)
+    )
+    attributes = compiled_graph.edge_attributes(edge)
+    assert attributes == graph[EDGE_START_ID][EDGE_END_ID][0]
+    assert "bridge" not in attributes
+
+
+@pytest.mark.parametrize(
+    "values",
+    (
+        [1, 2, 3],
+        [1.5, None, 3],
+        ["a", None, "b", "a"],
+        [[1, 2], None, "a", 3],
+    ),
+)
+def test_encode_column(values) -> None:
+    """
+    Make sure columns survive the encoding.
+    """
+    column = to_column(values)
+
+    codes, categories = encode_column(column)
+    assert codes.dtype != object
+    assert categories is None or categories.dtype != object
+
+    decoded = decode_column(codes, categories)
+    assert decoded.dtype == column.dtype
+    assert [None if value != value else value for value in decoded.tolist()] == values
+
+
+def test_save_load(tmp_path: Path, compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure a compiled graph is saved and loaded unchanged.
+    """
+    path = tmp_path / "map.npz"
+    compiled_graph.save(path)
+
+    graph = CompiledGraph.load(path)
+    assert graph.node_ids.tolist() == compiled_graph.node_ids.tolist()
+    assert graph.offsets.tolist() == compiled_graph.offsets.tolist()
+    assert graph.targets.tolist() == compiled_graph.targets.tolist()
+    assert graph.graph_data == compiled_graph.graph_data
+    assert graph.node_data.keys() == compiled_graph.node_data.keys()
+    assert graph.edge_data.keys() == compiled_graph.edge_data.keys()
+    for index in range(graph.node_count):
+        assert graph.node_attributes(index) == compiled_graph.node_attributes(index)
+    for edge in range(graph.edge_count):
+        assert graph.edge_attributes(edge) == compiled_graph.edge_attributes(edge)
+
+
+def test_load__mmap(compiled_graph_path: Path, compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure numeric arrays are memory mapped read-only.
+    """
+    graph = CompiledGraph.load(compiled_graph_path, mmap=True)
+
+    for array in (
+        graph.node_ids,
+        graph.offsets,
+        graph.targets,
+        graph.sources,
+        graph.edge_data["length"],
+        graph.node_data["x"],
+    ):
+        assert isinstance(array, numpy.memmap)
+        assert not array.flags.writeable
+    # object columns can not be mapped
+    assert not isinstance(graph.edge_data["highway"], numpy.memmap)
+
+    for edge in range(graph.edge_count):
+        assert graph.edge_attributes(edge) == compiled_graph.edge_attributes(edge)
+
+
+def test_read_npz__mmap_compressed(tmp_path: Path) -> None:
+    """
+    Make sure compressed files are loaded into memory instead.
+    """
+    path = tmp_path / "data.npz"
+    numpy.savez_compressed(path, values=numpy.arange(5), empty=numpy.arange(0))
+
+    arrays = read_npz(path, mmap=True)
+    assert not isinstance(arrays["values"], numpy.memmap)
+    assert arrays["values"].tolist() == list(range(5))
+    assert arrays["empty"].tolist() == []
+
+
+def test_load__unsupported_version(tmp_path: Path) -> None:
+    """
+    Raise proper exception for maps in an incompatible format.
+    """
+    path = tmp_path / "map.npz"
+    numpy.savez(path, format_version=numpy.array(FORMAT_VERSION + 1))
+
+    with pytest.raises(exceptions.GraphException):
+        CompiledGraph.load(path)
+
+
+def test_to_graph(graph: networkx.DiGraph, compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure the compiled graph can be converted back.
+    """
+    converted = compiled_graph.to_graph()
+    assert list(converted.nodes(data=True)) == list(graph.nodes(data=True))
+    assert list(converted.edges(keys=True, data=True)) == list(
+        graph.edges(keys=True, data=True)
+    )
+    assert converted.graph == graph.graph
@@ -1,5 +1,14 @@
-from routor import models, weights
-from routor.engine import Engine
+import shutil
+from functools import partial
+from pathlib import Path
+
+import numpy
+import pytest
+
+import routor.engine
+from routor import exceptions, models, weights
+from routor.cache import RouteCache
+from routor.engine import Engine, ShortestPath
 
 ORIGIN_LOCATION = models.Location(latitude=51.4996612, longitude=-2.6823825)
 ORIGN_NODE_ID = 1468922197
@@ -63,6 +72,374 @@ def test_get_closest_node(engine: Engine) -> None:
     assert node.node_id == ORIGN_NODE_ID
 
 
+def test_engine__mmap(compiled_graph_path: Path) -> None:
+    """
+    Make sure the engine works with a memory mapped map.
+    """
+    engine = Engine(compiled_graph_path, mmap=True)
+    origin = engine.get_closest_node(ORIGIN_LOCATION)
+    destination = engine.get_closest_node(DESTINATION_LOCATION)
+
+    path = engine.find_path(origin, destination, weights.travel_time)
+    assert [node.node_id for node in path] == PATH
+
+
+@pytest.fixture
+def map_copy(tmp_path: Path, graph_path: Path) -> Path:
+    """
+    Return a copy of the test map, so that files next to it can be created.
+    """
+    return Path(shutil.copy(graph_path, tmp_path))
+
+
+def test_find_path__hierarchy(mocker, map_copy: Path) -> None:
+    """
+    Make sure contraction hierarchies are used if available.
+    """
+    Engine(map_copy).build_hierarchy(weights.travel_time)
+    engine = Engine(map_copy)
+    assert engine.hierarchy(weights.travel_time)
+    assert engine.hierarchy(weights.length) is None
+
+    astar_search = mocker.patch("routor.engine.astar_search")
+    origin = engine.get_closest_node(ORIGIN_LOCATION)
+    destination = engine.get_closest_node(DESTINATION_LOCATION)
+
+    path = engine.find_path(origin, destination, weights.travel_time)
+    assert [node.node_id for node in path] == PATH
+    astar_search.assert_not_called()
+
+
+def test_hierarchy__outdated(map_copy: Path) -> None:
+    """
+    Make sure hierarchies are ignored if the costs have changed.
+    """
+    Engine(map_copy).build_hierarchy(weights.travel_time)
+    assert Engine(map_copy).hierarchy(weights.travel_time)
+
+    engine = Engine(map_copy)
+    engine.graph.edge_data["travel_time"] = engine.graph.edge_data["travel_time"] * 2
+    assert engine.hierarchy(weights.travel_time) is None
+
+
+def test_hierarchy__not_vectorized(map_copy: Path) -> None:
+    """
+    Scalar weight functions can not use a hierarchy.
+    """
+
+    def my_weight(prev_edge, edge) -> float:
+        return 1
+
+    engine = Engine(map_copy)
+    assert engine.hierarchy(my_weight) is None
+    with pytest.raises(ValueError):
+        engine.build_hierarchy(
+            weights.vectorized(lambda edge_data: edge_data["length"])
+        )
+
+
+@partial(
+    weights.vectorized_turns,
+    min_costs_per_meter=partial(weights.min_costs_per_meter_by_attr, "travel_time"),
+)
+def sharp_turns(prev_edge_data, edge_data):
+    """
+    Travel time with a penalty for sharp turns.
+    """
+    costs = edge_data["travel_time"]
+    if prev_edge_data is None:
+        return costs
+    angle = numpy.abs(edge_data["bearing"] - prev_edge_data["bearing"]) % 360
+    return costs + 30 * (numpy.minimum(angle, 360 - angle) > 120)
+
+
+def test_find_path__turns(engine: Engine) -> None:
+    """
+    Make sure turn costs are calculated on an edge-based graph.
+    """
+    origin = engine.get_closest_node(ORIGIN_LOCATION)
+    destination = engine.get_closest_node(DESTINATION_LOCATION)
+
+    path = engine.find_path(origin, destination, sharp_turns)
+    assert path[0].node_id == ORIGN_NODE_ID
+    assert path[-1].node_id == DESTINATION_NODE_ID
+
+    costs = engine.costs_for_path(path, sharp_turns)
+    scalar_costs = engine.costs_for_path(path, lambda p, e: sharp_turns(p, e))
+    assert costs == pytest.approx(scalar_costs)
+    assert costs >= engine.costs_for_path(path, weights.travel_time)
+
+
+def test_find_path__turns_hierarchy(mocker, map_copy: Path) -> None:
+    """
+    Make sure hierarchies are available for turn costs.
+    """
+    weights.register(sharp_turns, "sharp_turns")
+    try:
+        engine = Engine(map_copy)
+        origin = engine.get_closest_node(ORIGIN_LOCATION)
+        destination = engine.get_closest_node(DESTINATION_LOCATION)
+        expected = engine.find_path(origin, destination, sharp_turns)
+
+        Engine(map_copy).build_hierarchy(sharp_turns)
+        engine = Engine(map_copy)
+        astar_search = mocker.patch("routor.engine.astar_search")
+        assert engine.find_path(origin, destination, sharp_turns) == expected
+        astar_search.assert_not_called()
+    finally:
+        weights.unregister("sharp_turns")
+
+
+@pytest.mark.parametrize("weight", (weights.length, weights.travel_time, sharp_turns))
+def test_heuristic(mocker, engine: Engine, weight) -> None:
+    """
+    Make sure A* uses an admissible heuristic if the weight function declares one.
+    """
+    astar_search = mocker.spy(routor.engine, "astar_search")
+    origin = engine.get_closest_node(ORIGIN_LOCATION)
+    destination = engine.get_closest_node(DESTINATION_LOCATION)
+
+    path = engine.find_path(origin, destination, weight)
+    heuristic = astar_search.call_args.kwargs["heuristic"]
+    source, target = astar_search.call_args.args[1:3]
+    assert heuristic(source, target) > 0
+    assert heuristic(source, target) <= engine.costs_for_path(path, weight)
+    assert heuristic(target, target) == 0
+
+
+def test_heuristic__not_declared(engine: Engine) -> None:
+    """
+    Weight functions without a lower bound are routed without heuristic.
+    """
+
+    def my_weight(prev_edge, edge) -> float:
+        return 1
+
+    assert engine.min_costs_per_meter(my_weight) == 0
+    assert engine.heuristic(my_weight) is None
+    assert engine.heuristic(weights.vectorized(lambda edge_data: 1)) is None
+
+
+def test_heuristic__landmarks(mocker, map_copy: Path) -> None:
+    """
+    Make sure landmarks are used as heuristic if available.
+    """
+    my_weight = weights.vectorized(lambda edge_data: edge_data["length"] + 1)
+    weights.register(my_weight, "my_weight")
+    try:
+        engine = Engine(map_copy)
+        assert engine.landmarks(my_weight) is None
+        assert engine.heuristic(my_weight) is None
+
+        Engine(map_copy).build_landmarks(my_weight, count=4)
+        engine = Engine(map_copy)
+        assert len(engine.landmarks(my_weight).landmarks) == 4
+
+        astar_search = mocker.spy(routor.engine, "astar_search")
+        origin = engine.get_closest_node(ORIGIN_LOCATION)
+        destination = engine.get_closest_node(DESTINATION_LOCATION)
+        path = engine.find_path(origin, destination, my_weight)
+
+        heuristic = astar_search.call_args.kwargs["heuristic"]
+        source, target = astar_search.call_args.args[1:3]
+        costs = engine.costs_for_path(path, my_weight)
+        assert 0 < heuristic(source, target) <= costs + 1e-6
+    finally:
+        weights.unregister("my_weight")
+
+
+def test_heuristic__landmarks_and_distance(map_copy: Path) -> None:
+    """
+    Make sure the larger estimation of landmarks and distance is used.
+    """
+    Engine(map_copy).build_landmarks(weights.length, count=2)
+    engine = Engine(map_copy)
+    landmarks = engine.landmarks(weights.length).heuristic()
+    distance = engine._distance_heuristic(weights.length)
+    heuristic = engine.heuristic(weights.length)
+
+    for node in range(0, engine.graph.node_count, 7):
+        assert heuristic(node, 0) == max(landmarks(node, 0), distance(node, 0))
+
+
+def test_landmarks__outdated(map_copy: Path) -> None:
+    """
+    Make sure landmarks are ignored if the costs have changed.
+    """
+    Engine(map_copy).build_landmarks(weights.length, count=2)
+    engine = Engine(map_copy)
+    engine.graph.edge_data["length"] = engine.graph.edge_data["length"] * 2
+    assert engine.landmarks(weights.length) is None
+
+
+def test_get_closest_nodes(engine: Engine) -> None:
+    """
+    Identify the closest nodes of multiple locations at once.
+    """
+    nodes = engine.get_closest_nodes(
+        [ORIGIN_LOCATION, DESTINATION_LOCATION, ORIGIN_LOCATION]
+    )
+    assert [node.node_id for node in nodes] == [
+        ORIGN_NODE_ID,
+        DESTINATION_NODE_ID,
+        ORIGN_NODE_ID,
+    ]
+    assert engine.get_closest_nodes([]) == []
+
+
+def test_route__cache(mocker, graph_path: Path) -> None:
+    """
+    Make sure routes are cached per pair of nodes and weight functions.
+    """
+    engine = Engine(graph_path, route_cache=RouteCache(max_size=10))
+    search_path = mocker.spy(engine, "search_path")
+
+    route = engine.route(
+        ORIGIN_LOCATION, DESTINATION_LOCATION, weights.length, weights.travel_time
+    )
+    assert (
+        engine.route(
+            ORIGIN_LOCATION, DESTINATION_LOCATION, weights.length, weights.travel_time
+        )
+        is route
+    )
+    assert search_path.call_count == 1
+
+    engine.route(
+        ORIGIN_LOCATION, DESTINATION_LOCATION, weights.travel_time, weights.travel_time
+    )
+    assert search_path.call_count == 2
+    assert engine.route_cache.stats()["hits"] == 1
+
+
+def test_route__cache_invalidation(mocker, graph_path: Path) -> None:
+    """
+    Make sure cached routes are dropped if the map or weight functions change.
+    """
+    engine = Engine(graph_path, route_cache=RouteCache(max_size=10))
+    search_path = mocker.spy(engine, "search_path")
+    args = (ORIGIN_LOCATION, DESTINATION_LOCATION, weights.length, weights.length)
+
+    engine.route(*args)
+    engine.invalidate_caches()
+    engine.route(*args)
+    assert search_path.call_count == 2
+
+    weights.register(weights.length, "my_length")
+    weights.unregister("my_length")
+    engine.route(*args)
+    assert search_path.call_count == 3
+    engine.route(*args)
+    assert search_path.call_count == 3
+
+
+def test_route_batch(mocker, engine: Engine) -> None:
+    """
+    Make sure locations are snapped per chunk and identical pairs routed once.
+    """
+    get_closest_nodes = mocker.spy(engine, "get_closest_nodes")
+    search_path = mocker.spy(engine, "search_path")
+    pairs = [
+        (ORIGIN_LOCATION, DESTINATION_LOCATION),
+        (ORIGIN_LOCATION, DESTINATION_LOCATION),
+        (DESTINATION_LOCATION, ORIGIN_LOCATION),
+    ]
+
+    results = list(
+        engine.route_batch(
+            iter(pairs), weights.travel_time, weights.travel_time, batch_size=2
+        )
+    )
+    assert get_closest_nodes.call_count == 2
+    assert search_path.call_count == 2
+
+    expected = engine.route(
+        ORIGIN_LOCATION, DESTINATION_LOCATION, weights.travel_time, weights.travel_time
+    )
+    assert [result.route for result in results] == [expected, expected, None]
+    assert results[0].error is None
+    assert "not reachable" in results[2].error
+
+
+def test_route_batch__error(mocker, engine: Engine) -> None:
+    """
+    Make sure errors do not abort the batch.
+    """
+    mocker.patch.object(
+        engine,
+        "search_path",
+        side_effect=[
+            exceptions.NodeDoesNotExist("no path"),
+            ShortestPath(0.0, [], [], {}, 0),
+        ],
+    )
+    pairs = [
+        (ORIGIN_LOCATION, DESTINATION_LOCATION),
+        (DESTINATION_LOCATION, ORIGIN_LOCATION),
+    ]
+
+    results = list(engine.route_batch(pairs, weights.length, weights.travel_time))
+    assert results[0].route is None
+    assert results[0].error == "no path"
+    assert results[1].route.costs == 0
+    assert results[1].error is None
+
+
+@pytest.mark.parametrize(
+    "weight",
+    (weights.travel_time, weights.length, sharp_turns, lambda p, e: e.length + 1),
+)
+def test_matrix(mocker, engine: Engine, weight) -> None:
+    """
+    Make sure the matrix matches the routes of all pairs.
+    """
+    shortest_path_tree = mocker.spy(routor.engine, "shortest_path_tree")
+    locations = [ORIGIN_LOCATION, DESTINATION_LOCATION, ORIGIN_LOCATION]
+
+    matrix = engine.matrix(locations, locations[:2], weight, weights.travel_time)
+    assert shortest_path_tree.call_count == 2
+    assert matrix.costs.shape == (3, 2)
+    for row, origin in enumerate(locations):
+        for column, destination in enumerate(locations[:2]):
+            try:
+                route = engine.route(origin, destination, weight, weights.travel_time)
+            except exceptions.PathDoesNotExist:
+                assert numpy.isnan(matrix.costs[row, column])
+                assert numpy.isnan(matrix.lengths[row, column])
+                assert numpy.isnan(matrix.travel_times[row, column])
+                continue
+            assert matrix.costs[row, column] == pytest.approx(route.costs, abs=0.01)
+            assert matrix.lengths[row, column] == pytest.approx(route.length, abs=0.01)
+            assert matrix.travel_times[row, column] == pytest.approx(
+                route.travel_time, abs=0.01
+            )
+
+
+def test_matrix__travel_time_func(engine: Engine) -> None:
+    """
+    Make sure travel times of any weight function are calculated.
+    """
+    locations = [ORIGIN_LOCATION, DESTINATION_LOCATION]
+    expected = engine.matrix(
+        locations, locations, weights.travel_time, weights.travel_time
+    )
+
+    matrix = engine.matrix(
+        locations, locations, weights.travel_time, lambda p, e: e.travel_time
+    )
+    numpy.testing.assert_allclose(matrix.travel_times, expected.travel_times)
+
+
+def test_matrix__empty(engine: Engine) -> None:
+    """
+    Make sure empty inputs result in empty arrays.
+    """
+    matrix = engine.matrix([ORIGIN_LOCATION], [], weights.length, weights.travel_time)
+    assert matrix.costs.shape == (1, 0)
+    matrix = engine.matrix([], [ORIGIN_LOCATION], weights.length, weights.travel_time)
+    assert matrix.lengths.shape == (0, 1)
+
+
 def test_find_path(engine: Engine) -> None:
     """
     Make sure we calculate a proper path.
@@ -90,6 +467,202 @@ def test_route__weight_func(mocker, engine: Engine) -> None:
     assert weights.travel_time.call_count == edge_count  # type: ignore
 
 
+def test_route__single_pass(mocker, engine: Engine) -> None:
+    """
+    Make sure the route summary reuses the costs and edges of the search.
+    """
+    mocker.spy(models.Edge, "from_compiled")
+    costs_for_path = mocker.spy(engine, "costs_for_path")
+    route = engine.route(
+        ORIGIN_LOCATION, DESTINATION_LOCATION, weights.length, weights.travel_time
+    )
+    assert models.Edge.from_compiled.call_count == 0  # type: ignore
+    costs_for_path.assert_not_called()
+
+    origin = engine.get_closest_node(ORIGIN_LOCATION)
+    destination = engine.get_closest_node(DESTINATION_LOCATION)
+    path = engine.find_path(origin, destination, weights.length)
+    assert route.costs == round(engine.costs_for_path(path, weights.length), 2)
+    assert route.length == round(engine.length_of_path(path), 2)
+    assert route.travel_time == round(
+        engine.travel_time_of_path(path, weights.travel_time), 2
+    )
+    assert [location.latitude for location in route.path] == [
+        node.latitude for node in path
+    ]
+
+
+@pytest.mark.parametrize(
+    "travel_time_func",
+    (weights.travel_time, sharp_turns, lambda p, e: e.travel_time),
+)
+def test_route__edges(engine: Engine, travel_time_func) -> None:
+    """
+    Make sure the details of each edge are only added if requested.
+    """
+    args = (ORIGIN_LOCATION, DESTINATION_LOCATION, weights.travel_time)
+    assert engine.route(*args, travel_time_func).edges is None
+
+    route = engine.route(*args, travel_time_func, edges=True)
+    assert len(route.edges) == len(route.path) - 1
+    assert sum(edge.length for edge in route.edges) == pytest.approx(
+        route.length, abs=0.05
+    )
+    assert sum(edge.travel_time for edge in route.edges) == pytest.approx(
+        route.travel_time, abs=0.05
+    )
+
+
+@pytest.mark.parametrize(
+    "weight",
+    (weights.travel_time, sharp_turns, lambda p, e: e.travel_time),
+)
+def test_isochrone(engine: Engine, weight) -> None:
+    """
+    Make sure all nodes within the costs are reached with the costs of their routes.
+    """
+    isochrone = engine.isochrone(ORIGIN_LOCATION, 60, weight, polygon=True)
+    origin = engine.get_closest_node(ORIGIN_LOCATION)
+    assert isochrone.nodes[0].osm_id == origin.osm_id
+    assert isochrone.nodes[0].costs == 0
+    assert 1 < len(isochrone.nodes) < engine.graph.node_count
+
+    reached = {node.osm_id: node.costs for node in isochrone.nodes}
+    matrix = engine.matrix(
+        [ORIGIN_LOCATION],
+        [models.Location(**node.dict()) for node in isochrone.nodes],
+        weight,
+        weights.travel_time,
+    )
+    assert matrix.costs[0].round(2).tolist() == list(reached.values())
+    assert max(reached.values()) <= 60
+    assert isochrone.polygon[0] == isochrone.polygon[-1]
+
+    unreached = [
+        node_id for node_id in engine.graph.node_ids.tolist() if node_id not in reached
+    ]
+    node = models.Node.from_compiled(engine.graph, engine.graph.index_of(unreached[0]))
+    with pytest.raises(exceptions.PathDoesNotExist):
+        engine.find_path(origin, node, weight)
+    assert engine.isochrone(ORIGIN_LOCATION, 60, weight).polygon is None
+
+
+@pytest.mark.parametrize(
+    "weight",
+    (weights.travel_time, weights.length, sharp_turns, lambda p, e: e.length),
+)
+def test_search_path__bidirectional(engine: Engine, weight) -> None:
+    """
+    Make sure a bidirectional search finds the same path and reports explored nodes.
+    """
+    origin = engine.graph.index_of(ORIGN_NODE_ID)
+    destination = engine.graph.index_of(DESTINATION_NODE_ID)
+
+    expected = engine.search_path(origin, destination, weight)
+    path = engine.search_path(origin, destination, weight, bidirectional=True)
+    assert path.nodes == expected.nodes
+    assert path.costs == pytest.approx(expected.costs)
+    assert 0 < path.explored <= engine.graph.node_count * 3
+    assert 0 < expected.explored
+
+
+def test_route__metrics(graph_path: Path) -> None:
+    """
+    Make sure measurements of a route are collected if requested.
+    """
+    engine = Engine(graph_path, route_cache=RouteCache(max_size=10))
+
+    def my_weight(prev_edge, edge) -> float:
+        return edge.length
+
+    metrics = models.RouteMetrics()
+    engine.route(
+        ORIGIN_LOCATION,
+        DESTINATION_LOCATION,
+        my_weight,
+        weights.travel_time,
+        metrics=metrics,
+    )
+    assert not metrics.cached
+    assert 0 < metrics.explored <= metrics.relaxed + 1
+    assert metrics.weight_calls >= metrics.relaxed
+    assert 0 < metrics.weight_time < metrics.search_time
+    assert metrics.snapping_time > 0
+    assert metrics.summary_time > 0
+
+    metrics = models.RouteMetrics()
+    engine.route(
+        ORIGIN_LOCATION,
+        DESTINATION_LOCATION,
+        my_weight,
+        weights.travel_time,
+        metrics=metrics,
+    )
+    assert metrics.cached
+    assert metrics.explored == 0
+
+    metrics = models.RouteMetrics()
+    engine.route(
+        ORIGIN_LOCATION,
+        DESTINATION_LOCATION,
+        weights.length,
+        weights.travel_time,
+        metrics=metrics,
+    )
+    assert metrics.explored > 0
+    assert metrics.weight_calls == 0
+
+
+def test_search_path__scalar(engine: Engine) -> None:
+    """
+    Make sure edges created by scalar weight functions are kept for reuse.
+    """
+
+    def my_weight(prev_edge, edge) -> float:
+        return edge.length
+
+    origin = engine.graph.index_of(ORIGN_NODE_ID)
+    destination = engine.graph.index_of(DESTINATION_NODE_ID)
+    path = engine.search_path(origin, destination, my_weight)
+    assert path.nodes == [engine.graph.index_of(node_id) for node_id in PATH]
+    assert path.edges == engine.graph.edge_indices(path.nodes)
+    assert set(path.edges) <= set(path.edge_models)
+    assert path.costs == pytest.approx(
+        engine.graph.edge_data["length"][path.edges].sum()
+    )
+
+
+def test_find_path__vectorized(mocker, engine: Engine) -> None:
+    """
+    Make sure vectorized weight functions do not create edges.
+    """
+    mocker.spy(models.Edge, "from_compiled")
+    origin = engine.get_closest_node(ORIGIN_LOCATION)
+    destination = engine.get_closest_node(DESTINATION_LOCATION)
+
+    path = engine.find_path(origin, destination, weights.travel_time)
+    assert [node.node_id for node in path] == PATH
+    assert models.Edge.from_compiled.call_count == 0  # type: ignore
+
+
+def test_edge_costs(engine: Engine) -> None:
+    """
+    Make sure the costs are only calculated once.
+    """
+    costs = engine.edge_costs(weights.length)
+    assert costs is engine.edge_costs(weights.length)
+    assert len(costs) == engine.graph.edge_count
+
+
+def test_edge_costs__invalid_shape(engine: Engine) -> None:
+    """
+    Make sure a vectorized weight function returns costs for each edge.
+    """
+    invalid_weight = weights.vectorized(lambda edge_data: numpy.ones(3))
+    with pytest.raises(ValueError):
+        engine.edge_costs(invalid_weight)
+
+
 def test_costs_for_path(engine: Engine) -> None:
     """
     Make sure costs are summed up correctly.
@@ -102,6 +675,22 @@ def test_costs_for_path(engine: Engine) -> None:
     assert costs == 46.199999999999996
 
 
+def test_costs_for_path__single_edge(engine: Engine) -> None:
+    """
+    Make sure the costs of a path with only one edge are not lost.
+    """
+    path = [
+        models.Node.from_compiled(engine.graph, engine.graph.index_of(node_id))
+        for node_id in PATH[:2]
+    ]
+
+    def my_travel_time(*args, **kwargs) -> float:
+        return 1
+
+    assert engine.costs_for_path(path, my_travel_time) == 1
+    assert engine.costs_for_path(path, weights.length) > 0
+
+
 def test_length_of_path(engine: Engine) -> None:
     """
     Make sure the length is derived correctly.
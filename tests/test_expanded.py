@@ -0,0 +1,99 @@
+from typing import Optional
+
+import networkx
+import numpy
+import pytest
+
+from routor.algorithms.astar import astar_path
+from routor.compiled import CompiledGraph
+from routor.expanded import EdgeExpandedGraph, turns
+
+
+@pytest.fixture
+def grid() -> CompiledGraph:
+    """
+    Return a bidirectional grid with random edge lengths.
+    """
+    rng = numpy.random.default_rng(42)
+    graph = networkx.DiGraph()
+    for start, end in networkx.grid_2d_graph(5, 5).edges():
+        graph.add_edge(start, end, length=float(rng.integers(1, 10)))
+        graph.add_edge(end, start, length=float(rng.integers(1, 10)))
+    return CompiledGraph.from_graph(networkx.convert_node_labels_to_integers(graph))
+
+
+def expand(graph: CompiledGraph, penalty: float = 0, turn=None) -> EdgeExpandedGraph:
+    prev_edges, edges = turns(graph)
+    lengths = graph.edge_data["length"]
+    turn_costs = lengths[edges].copy()
+    if turn:
+        turn_costs[(prev_edges == turn[0]) & (edges == turn[1])] += penalty
+    return EdgeExpandedGraph.build(graph, prev_edges, edges, lengths, turn_costs)
+
+
+def search(expanded: EdgeExpandedGraph, source: int, target: int):
+    def weight(prev_edge: Optional[int], edge: int) -> float:
+        return expanded.costs.item(edge)
+
+    path = astar_path(
+        expanded.graph, expanded.source(source), expanded.target(target), weight
+    )
+    return expanded.to_node_path(path), path[1:-1]
+
+
+def test_turns(grid: CompiledGraph) -> None:
+    """
+    Make sure all pairs of consecutive edges are returned.
+    """
+    prev_edges, edges = turns(grid)
+
+    expected = [
+        (prev_edge, edge)
+        for prev_edge in range(grid.edge_count)
+        for edge in grid.neighbors(grid.targets[prev_edge])
+    ]
+    assert list(zip(prev_edges.tolist(), edges.tolist())) == expected
+
+
+def test_shortest_path(grid: CompiledGraph) -> None:
+    """
+    Without turn costs paths are as short as on the original graph.
+    """
+    expanded = expand(grid)
+    lengths = grid.edge_data["length"]
+
+    def weight(prev_edge: Optional[int], edge: int) -> float:
+        return lengths.item(edge)
+
+    for source, target in ((0, 24), (3, 20), (12, 7), (5, 5)):
+        path, edges = search(expanded, source, target)
+        expected = astar_path(grid, source, target, weight)
+        assert path[0] == source
+        assert path[-1] == target
+        assert grid.edge_indices(path) == edges
+        assert expanded.path_costs(source, edges) == pytest.approx(
+            float(lengths[grid.edge_indices(expected)].sum())
+        )
+
+
+def test_shortest_path__turn_costs(grid: CompiledGraph) -> None:
+    """
+    Make sure turn costs are taken into account.
+    """
+    _, edges = search(expand(grid), 0, 24)
+    turn = (edges[0], edges[1])
+
+    expanded = expand(grid, penalty=1000, turn=turn)
+    path, edges = search(expanded, 0, 24)
+    assert turn not in zip(edges, edges[1:])
+    assert (path[0], path[-1]) == (0, 24)
+    assert expanded.path_costs(0, edges) < 1000
+
+
+def test_base_node_list(grid: CompiledGraph) -> None:
+    """
+    Make sure the original nodes are only converted once.
+    """
+    expanded = expand(grid)
+    assert expanded.base_node_list == expanded.base_nodes.tolist()
+    assert expanded.base_node_list is expanded.base_node_list
@@ -3,6 +3,7 @@ import pytest
 from pydantic import ValidationError
 
 from routor import exceptions, models
+from routor.compiled import CompiledGraph
 
 NODE_ID = 127498
 EDGE_START_ID = NODE_ID
@@ -89,6 +90,32 @@ def test_edge__from_nodes(graph: networkx.DiGraph) -> None:
     assert edge.grade == 0.0
 
 
+def test_node__from_compiled(
+    graph: networkx.DiGraph, compiled_graph: CompiledGraph
+) -> None:
+    """
+    Make sure nodes of a compiled graph match nodes of the original graph.
+    """
+    index = compiled_graph.index_of(NODE_ID)
+
+    node = models.Node.from_compiled(compiled_graph, index)
+    assert node == models.Node.from_graph(graph, NODE_ID)
+
+
+def test_edge__from_compiled(
+    graph: networkx.DiGraph, compiled_graph: CompiledGraph
+) -> None:
+    """
+    Make sure edges of a compiled graph match edges of the original graph.
+    """
+    edge_index = compiled_graph.edge_index(
+        compiled_graph.index_of(EDGE_START_ID), compiled_graph.index_of(EDGE_END_ID)
+    )
+
+    edge = models.Edge.from_compiled(compiled_graph, edge_index)
+    assert edge == models.Edge.from_graph(graph, EDGE_START_ID, EDGE_END_ID)
+
+
 def test_node__extra_tags(graph: networkx.DiGraph) -> None:
     """
     Make sure that extra attributes are attached to the node as well.
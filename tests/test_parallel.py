@@ -0,0 +1,65 @@
+import numpy
+import pytest
+
+from routor import models, weights
+from routor.engine import Engine
+from routor.parallel import EnginePool
+
+from .test_engine import DESTINATION_LOCATION, ORIGIN_LOCATION
+
+LOCATIONS = [
+    ORIGIN_LOCATION,
+    DESTINATION_LOCATION,
+    models.Location(latitude=51.4991449, longitude=-2.675861),
+]
+
+
+def length_plus_one(prev_edge, edge) -> float:
+    return edge.length + 1
+
+
+@pytest.fixture
+def pool(engine: Engine) -> EnginePool:
+    """
+    Return a pool of two workers, which is stopped after the test.
+    """
+    with EnginePool(engine, processes=2) as pool:
+        yield pool
+
+
+def test_route_batch(engine: Engine, pool: EnginePool) -> None:
+    """
+    Make sure results are streamed back in order.
+    """
+    pairs = [(origin, destination) for origin in LOCATIONS for destination in LOCATIONS]
+
+    results = list(
+        pool.route_batch(pairs, weights.travel_time, weights.travel_time, batch_size=2)
+    )
+    expected = list(engine.route_batch(pairs, weights.travel_time, weights.travel_time))
+    assert results == expected
+
+
+def test_route_batch__unregistered_weight(engine: Engine, pool: EnginePool) -> None:
+    """
+    Make sure unregistered weight functions are passed to the workers.
+    """
+    pairs = [(ORIGIN_LOCATION, DESTINATION_LOCATION)]
+
+    results = list(pool.route_batch(pairs, length_plus_one, weights.travel_time))
+    expected = list(engine.route_batch(pairs, length_plus_one, weights.travel_time))
+    assert results == expected
+    assert list(pool.route_batch([], weights.length, weights.travel_time)) == []
+
+
+def test_matrix(engine: Engine, pool: EnginePool) -> None:
+    """
+    Make sure the rows of all workers are combined in order.
+    """
+    matrix = pool.matrix(LOCATIONS, LOCATIONS, weights.length, weights.travel_time)
+    expected = engine.matrix(LOCATIONS, LOCATIONS, weights.length, weights.travel_time)
+    for attr in ("costs", "lengths", "travel_times"):
+        numpy.testing.assert_array_equal(getattr(matrix, attr), getattr(expected, attr))
+
+    matrix = pool.matrix([], LOCATIONS, weights.length, weights.travel_time)
+    assert matrix.costs.shape == (0, 3)
@@ -0,0 +1,70 @@
+import numpy
+import osmnx
+import pytest
+
+from routor.compiled import CompiledGraph
+from routor.spatial import NodeCoordinates, NodeIndex
+
+
+def test_query(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure the same nodes as with a brute-force search are found.
+    """
+    latitudes = compiled_graph.node_data["y"]
+    longitudes = compiled_graph.node_data["x"]
+    index = NodeIndex(latitudes, longitudes)
+
+    rng = numpy.random.default_rng(42)
+    query_latitudes = rng.uniform(latitudes.min(), latitudes.max(), 100)
+    query_longitudes = rng.uniform(longitudes.min(), longitudes.max(), 100)
+
+    expected = [
+        numpy.argmin(
+            osmnx.distance.great_circle_vec(latitude, longitude, latitudes, longitudes)
+        )
+        for latitude, longitude in zip(query_latitudes, query_longitudes)
+    ]
+    assert index.query(query_latitudes, query_longitudes).tolist() == expected
+
+
+def test_query__scalar(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure a single location can be queried.
+    """
+    index = NodeIndex(compiled_graph.node_data["y"], compiled_graph.node_data["x"])
+
+    result = index.query(
+        compiled_graph.node_data["y"][3], compiled_graph.node_data["x"][3]
+    )
+    assert result.tolist() == [3]
+
+
+def test_query__lazy(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure the index is only built when it is queried.
+    """
+    index = NodeIndex(compiled_graph.node_data["y"], compiled_graph.node_data["x"])
+    assert index._tree is None
+
+    index.query(compiled_graph.node_data["y"][3], compiled_graph.node_data["x"][3])
+    tree = index.tree
+    index.query(compiled_graph.node_data["y"][4], compiled_graph.node_data["x"][4])
+    assert index.tree is tree
+
+
+def test_distance(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure distances match the ones of osmnx.
+    """
+    latitudes = compiled_graph.node_data["y"]
+    longitudes = compiled_graph.node_data["x"]
+    coordinates = NodeCoordinates(latitudes, longitudes)
+
+    expected = osmnx.distance.great_circle_vec(
+        latitudes[0], longitudes[0], latitudes, longitudes
+    )
+    result = [coordinates.distance(0, node) for node in range(len(latitudes))]
+    assert result == pytest.approx(expected.tolist())
+    assert coordinates.distance(3, 0) == pytest.approx(coordinates.distance(0, 3))
+    # coordinates are not copied
+    assert coordinates.latitudes is latitudes
@@ -0,0 +1,256 @@
+from pathlib import Path
+
+import numpy
+import pytest
+
+from routor import exceptions, weights
+from routor.compiled import CompiledGraph
+from routor.engine import Engine
+from routor.traffic import TrafficOverlay, find_edges
+
+from .test_engine import DESTINATION_LOCATION, ORIGIN_LOCATION
+
+
+def _edge(graph: CompiledGraph, edge: int) -> dict:
+    return {
+        "start": int(graph.node_ids[graph.sources[edge]]),
+        "end": int(graph.node_ids[graph.targets[edge]]),
+    }
+
+
+def test_find_edges(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure edges are selected by their nodes or by their way.
+    """
+    assert find_edges(compiled_graph, _edge(compiled_graph, 3)).tolist() == [3]
+
+    osmid = int(compiled_graph.edge_data["osmid"][3])
+    expected = numpy.flatnonzero(compiled_graph.edge_data["osmid"] == osmid)
+    edges = find_edges(compiled_graph, {"start": "", "osmid": str(osmid)})
+    assert sorted(edges.tolist()) == expected.tolist()
+
+    with pytest.raises(exceptions.EdgeDoesNotExist):
+        find_edges(compiled_graph, {"osmid": -1})
+    with pytest.raises(ValueError):
+        find_edges(compiled_graph, {"start": 1})
+
+
+def test_traffic_overlay__update(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure updates are merged with or replace previous live travel times.
+    """
+    traffic = TrafficOverlay(compiled_graph)
+    assert traffic.edge_count == 0
+
+    traffic.update(numpy.array([0, 1]), numpy.array([10.0, 20.0]))
+    travel_times = traffic.travel_times
+    traffic.update(numpy.array([1, 2]), numpy.array([numpy.nan, 30.0]))
+    assert traffic.travel_times[0] == 10.0
+    assert numpy.isnan(traffic.travel_times[1])
+    assert traffic.travel_times[2] == 30.0
+    # readers of the previous travel times are not affected
+    assert travel_times[1] == 20.0
+
+    traffic.update(numpy.array([4]), numpy.array([5.0]), replace=True)
+    assert numpy.flatnonzero(~numpy.isnan(traffic.travel_times)).tolist() == [4]
+    traffic.clear()
+    assert traffic.edge_count == 0
+    assert traffic.version == 4
+
+    with pytest.raises(ValueError):
+        traffic.update(numpy.array([0]), numpy.array([numpy.inf]))
+
+
+def test_traffic_overlay__parse_rows(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure speeds are converted into travel times and unknown edges skipped.
+    """
+    traffic = TrafficOverlay(compiled_graph)
+    edges, travel_times = traffic.parse_rows(
+        [
+            {**_edge(compiled_graph, 0), "travel_time": "12.5"},
+            {**_edge(compiled_graph, 1), "speed_kph": "36"},
+            {**_edge(compiled_graph, 2), "travel_time": ""},
+            {"start": 1, "end": 2, "travel_time": 1},
+        ]
+    )
+    assert edges.tolist() == [0, 1, 2]
+    length = compiled_graph.edge_data["length"][1]
+    assert travel_times[:2].tolist() == [12.5, round(length / 10, 1)]
+    assert numpy.isnan(travel_times[2])
+
+
+def test_traffic_overlay__watch(tmp_path: Path, compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure the watched file is reloaded once it has been replaced.
+    """
+    path = tmp_path / "traffic.csv"
+    path.write_text(
+        "start,end,travel_time\n{start},{end},7\n".format(**_edge(compiled_graph, 0))
+    )
+    traffic = TrafficOverlay(compiled_graph)
+    traffic.watch(path)
+    assert traffic.travel_times[0] == 7
+    assert not traffic.refresh()
+
+    replacement = tmp_path / "replacement.csv"
+    replacement.write_text(
+        "start,end,speed_kph\n{start},{end},\n".format(**_edge(compiled_graph, 0))
+        + "{start},{end},36\n".format(**_edge(compiled_graph, 1))
+    )
+    replacement.replace(path)
+    assert traffic.refresh()
+    assert numpy.isnan(traffic.travel_times[0])
+    assert traffic.edge_count == 1
+
+    # invalid files are skipped
+    replacement.write_text(
+        "start,end,travel_time\n{start},{end},-1\n".format(**_edge(compiled_graph, 0))
+    )
+    replacement.replace(path)
+    version = traffic.version
+    assert not traffic.refresh()
+    assert traffic.version == version
+
+
+def test_traffic_overlay__load_npy(
+    tmp_path: Path, compiled_graph: CompiledGraph
+) -> None:
+    """
+    Make sure travel times of all edges are loaded from .npy files.
+    """
+    path = tmp_path / "traffic.npy"
+    travel_times = numpy.full(compiled_graph.edge_count, numpy.nan)
+    travel_times[1] = 3
+    numpy.save(path, travel_times)
+    traffic = TrafficOverlay(compiled_graph)
+    traffic.load(path)
+    assert numpy.flatnonzero(~numpy.isnan(traffic.travel_times)).tolist() == [1]
+
+    numpy.save(path, travel_times[1:])
+    with pytest.raises(ValueError):
+        traffic.load(path)
+
+
+def test_engine__traffic(graph_path: Path) -> None:
+    """
+    Make sure live travel times are used without reloading the map.
+    """
+    engine = Engine(graph_path)
+    graph = engine.graph
+    args = (ORIGIN_LOCATION, DESTINATION_LOCATION, weights.travel_time)
+    route = engine.route(*args, weights.travel_time)
+    free_flow = graph.edge_data["travel_time"]
+
+    engine.update_traffic(numpy.arange(graph.edge_count), free_flow * 2)
+    assert engine.graph is graph
+    assert engine.map_version == 1
+    assert numpy.array_equal(graph.edge_data[weights.FREE_FLOW_TRAVEL_TIME], free_flow)
+    assert engine.route(*args, weights.travel_time).travel_time == pytest.approx(
+        route.travel_time * 2, abs=0.1
+    )
+
+    engine.traffic.clear()
+    engine.apply_traffic()
+    assert numpy.array_equal(graph.edge_data["travel_time"], free_flow)
+    assert engine.route(*args, weights.travel_time) == route
+
+
+def test_engine__live_travel_time(graph_path: Path) -> None:
+    """
+    Make sure live travel times of edges reached after the horizon are ignored.
+    """
+    engine = Engine(graph_path)
+    route = engine.route(
+        ORIGIN_LOCATION,
+        DESTINATION_LOCATION,
+        weights.live_travel_time,
+        weights.travel_time,
+    )
+    assert route.costs == pytest.approx(route.travel_time, abs=0.01)
+
+    engine.update_traffic(
+        numpy.arange(engine.graph.edge_count),
+        engine.graph.edge_data["travel_time"] + weights.TRAFFIC_HORIZON,
+    )
+    live_route = engine.route(
+        ORIGIN_LOCATION,
+        DESTINATION_LOCATION,
+        weights.live_travel_time,
+        weights.travel_time,
+    )
+    # the delay of the first edge is paid completely, later ones are ignored
+    assert live_route.costs == pytest.approx(
+        route.travel_time + weights.TRAFFIC_HORIZON, abs=0.1
+    )
+    assert live_route.travel_time > live_route.costs
+
+
+def test_engine__traffic_keeps_unchanged_costs(compiled_graph_path: Path) -> None:
+    """
+    Make sure hierarchies of weight functions not using travel times are kept.
+    """
+    engine = Engine(compiled_graph_path)
+    for weight in (weights.length, weights.travel_time):
+        engine.build_hierarchy(weight)
+    hierarchy = engine.hierarchy(weights.length)
+
+    engine.update_traffic(numpy.array([0]), numpy.array([1000.0]))
+    assert engine.hierarchy(weights.length) is hierarchy
+    assert engine.hierarchy(weights.travel_time) is None
+
+    engine.traffic.clear()
+    engine.apply_traffic()
+    assert engine.hierarchy(weights.length) is hierarchy
+    assert engine.hierarchy(weights.travel_time) is not None
+
+
+def test_engine__traffic_during_lookup(graph_path: Path) -> None:
+    """
+    Make sure costs calculated while traffic is applied are not cached.
+    """
+    engine = Engine(graph_path)
+
+    @weights.vectorized
+    def congested(edge_data):
+        costs = edge_data["travel_time"]
+        # another thread applies traffic meanwhile
+        engine.update_traffic(numpy.array([0]), numpy.array([1000.0]))
+        return costs
+
+    stale_costs = engine.edge_costs(congested)
+    assert stale_costs[0] != 1000.0
+    assert congested not in engine._edge_costs
+    assert engine.edge_costs(congested)[0] == 1000.0
+
+
+def test_engine__live_travel_time_matrix(graph_path: Path) -> None:
+    """
+    Make sure matrices and isochrones enter edges at their arrival, as routes do.
+    """
+    engine = Engine(graph_path)
+    engine.update_traffic(
+        numpy.arange(engine.graph.edge_count),
+        engine.graph.edge_data["travel_time"] * 10,
+    )
+    route = engine.route(
+        ORIGIN_LOCATION,
+        DESTINATION_LOCATION,
+        weights.live_travel_time,
+        weights.travel_time,
+    )
+
+    matrix = engine.matrix(
+        [ORIGIN_LOCATION],
+        [DESTINATION_LOCATION],
+        weights.live_travel_time,
+        weights.live_travel_time,
+    )
+    assert matrix.costs[0][0] == pytest.approx(route.costs, abs=0.1)
+    assert matrix.travel_times[0][0] == pytest.approx(route.costs, abs=0.1)
+
+    isochrone = engine.isochrone(
+        ORIGIN_LOCATION, route.costs + 1, weights.live_travel_time
+    )
+    destination = engine.get_closest_node(DESTINATION_LOCATION)
+    assert destination.node_id in {node.osm_id for node in isochrone.nodes}
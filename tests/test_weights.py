@@ -1,9 +1,11 @@
 from functools import partial
 
 import networkx
+import numpy
 import pytest
 
 from routor import models, weights
+from routor.compiled import CompiledGraph
 
 NODE_ID = 127498
 EDGE_START_ID = NODE_ID
@@ -21,7 +23,15 @@ def test_get_function_names() -> None:
     """
     Make sure names for the registered functions are returned
     """
-    assert weights.get_function_names() == ['travel_time', 'length']
+    assert weights.get_function_names() == ['travel_time', 'length', 'live_travel_time']
+
+
+def test_get_function_name() -> None:
+    """
+    Make sure the name of a registered function can be retrieved.
+    """
+    assert weights.get_function_name(weights.length) == 'length'
+    assert weights.get_function_name(lambda prev_edge, edge: 1) is None
 
 
 def test_register() -> None:
@@ -47,3 +57,141 @@ def test_weight_by_attr(
     method = getattr(weights, func_name)
     value = method(None, edge)
     assert value == expected_value
+
+
+@pytest.mark.parametrize(
+    ("func_name", "attr"), (("travel_time", "travel_time"), ("length", "length"))
+)
+def test_builtin_functions_are_vectorized(
+    compiled_graph: CompiledGraph, func_name: str, attr: str
+) -> None:
+    """
+    Make sure the costs of all edges are derived from the edge attributes.
+    """
+    method = getattr(weights, func_name)
+    assert isinstance(method, weights.VectorizedWeightFunction)
+
+    costs = method.costs(compiled_graph.edge_data)
+    assert costs.tolist() == compiled_graph.edge_data[attr].tolist()
+
+
+def test_vectorized(graph: networkx.DiGraph) -> None:
+    """
+    Make sure a vectorized weight function can be used for single edges.
+    """
+
+    @weights.vectorized
+    def double_length(edge_data):
+        return edge_data["length"] * 2
+
+    edge = models.Edge.from_graph(graph, EDGE_START_ID, EDGE_END_ID)
+    assert double_length(None, edge) == 2 * 61.516
+    assert double_length.__name__ == "double_length"
+
+
+def test_vectorized_turns(graph: networkx.DiGraph) -> None:
+    """
+    Make sure a vectorized turn weight function can be used for single edges.
+    """
+
+    @weights.vectorized_turns
+    def u_turns(prev_edge_data, edge_data):
+        if prev_edge_data is None:
+            return edge_data["length"]
+        return edge_data["length"] + 100 * (
+            prev_edge_data["osmid"] == edge_data["osmid"]
+        )
+
+    edge = models.Edge.from_graph(graph, EDGE_START_ID, EDGE_END_ID)
+    assert weights.is_vectorized(u_turns)
+    assert u_turns(None, edge) == 61.516
+    assert u_turns(edge, edge) == 161.516
+
+
+@pytest.mark.parametrize(
+    ("func_name", "attr"), (("travel_time", "travel_time"), ("length", "length"))
+)
+def test_builtin_functions_min_costs_per_meter(
+    compiled_graph: CompiledGraph, func_name: str, attr: str
+) -> None:
+    """
+    Make sure the lower bound is not larger than the costs per meter of any edge.
+    """
+    method = getattr(weights, func_name)
+    result = method.min_costs_per_meter(compiled_graph.edge_data)
+
+    lengths = compiled_graph.edge_data["length"]
+    assert 0 < result <= (compiled_graph.edge_data[attr] / lengths).min()
+
+
+def test_time_dependent(graph: networkx.DiGraph) -> None:
+    """
+    Make sure a time-dependent weight function returns the costs at departure
+    for single edges.
+    """
+
+    @weights.time_dependent
+    def rush_hour(edge_data):
+        lengths = edge_data["length"]
+        return lambda edge, elapsed: lengths[edge] * (2 if elapsed < 60 else 1)
+
+    edge = models.Edge.from_graph(graph, EDGE_START_ID, EDGE_END_ID)
+    assert not weights.is_vectorized(rush_hour)
+    assert rush_hour(None, edge) == 2 * 61.516
+    assert rush_hour.costs({"length": numpy.array([1.0])})(0, 60) == 1.0
+
+
+@pytest.mark.parametrize("delay", (-30.0, 600.0, 2 * weights.TRAFFIC_HORIZON))
+def test_live_travel_time(delay: float) -> None:
+    """
+    Make sure live travel times fade into free flow without breaking FIFO.
+    """
+    edge_data = {
+        "length": numpy.array([100.0]),
+        "travel_time": numpy.array([60.0 + delay]),
+        weights.FREE_FLOW_TRAVEL_TIME: numpy.array([60.0]),
+    }
+    costs = weights.live_travel_time.costs(edge_data)
+    assert costs(0, 0.0) == 60.0 + delay
+    assert costs(0, max(weights.TRAFFIC_HORIZON, delay)) == 60.0
+
+    departures = numpy.linspace(0, 2 * max(weights.TRAFFIC_HORIZON, delay), 50)
+    arrivals = [departure + costs(0, departure) for departure in departures]
+    assert all(numpy.diff(arrivals) >= 0)
+
+    result = weights.live_travel_time.min_costs_per_meter(edge_data)
+    assert result == pytest.approx(min(60.0, 60.0 + delay) / 100, rel=1e-4)
+
+
+@pytest.mark.parametrize(
+    ("costs", "expected"),
+    (
+        ([10.0, 1.0, numpy.nan], 0.1),
+        ([numpy.nan, numpy.nan, numpy.nan], 0.0),
+        ([-10.0, 1.0, 1.0], 0.0),
+    ),
+)
+def test_min_costs_per_meter_by_attr(costs, expected) -> None:
+    """
+    Make sure missing or negative costs do not break the lower bound.
+    """
+    edge_data = {"length": numpy.array([100.0, 0.0, 5.0]), "costs": numpy.array(costs)}
+    result = weights.min_costs_per_meter_by_attr("costs", edge_data)
+    assert result == pytest.approx(expected, abs=1e-5)
+
+
+def test_registry_version() -> None:
+    """
+    Make sure the version changes whenever weight functions are (un)registered.
+    """
+    version = weights.registry_version()
+    weights.register(weights.length, "my_length")
+    assert weights.registry_version() != version
+
+    version = weights.registry_version()
+    weights.unregister("my_length")
+    assert weights.registry_version() != version
+
+    version = weights.registry_version()
+    weights.unregister("my_length")
+    assert weights.registry_version() == version
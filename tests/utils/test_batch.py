@@ -0,0 +1,54 @@
+import io
+
+import pytest
+
+from routor.models import Location
+from routor.utils import batch
+
+ORIGIN = Location(latitude=51.4996612, longitude=-2.6823825)
+DESTINATION = Location(latitude=51.4973375, longitude=-2.682841)
+
+
+def test_chunked() -> None:
+    """
+    Make sure items are split into lists of the given size.
+    """
+    assert list(batch.chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batch.chunked([], 2)) == []
+
+
+def test_read_pairs__csv() -> None:
+    """
+    Make sure origins and destinations are read from CSV.
+    """
+    file = io.StringIO(
+        "destination_longitude,destination_latitude,origin_latitude,origin_longitude\n"
+        "-2.682841,51.4973375,51.4996612,-2.6823825\n"
+    )
+    assert list(batch.read_pairs(file, "csv")) == [(ORIGIN, DESTINATION)]
+
+
+def test_read_pairs__csv_missing_columns() -> None:
+    """
+    Raise proper exception if columns are missing.
+    """
+    file = io.StringIO("origin_latitude,origin_longitude\n51.4996612,-2.6823825\n")
+    with pytest.raises(ValueError, match="destination_latitude"):
+        list(batch.read_pairs(file, "csv"))
+
+
+def test_read_pairs__jsonl() -> None:
+    """
+    Make sure origins and destinations are read from JSON lines.
+    """
+    line = f'{{"origin": {ORIGIN.json()}, "destination": {DESTINATION.json()}}}\n'
+    file = io.StringIO(line + "\n" + line)
+    assert list(batch.read_pairs(file, "jsonl")) == [(ORIGIN, DESTINATION)] * 2
+
+
+def test_read_pairs__invalid_format() -> None:
+    """
+    Raise proper exception for unknown formats.
+    """
+    with pytest.raises(ValueError):
+        batch.read_pairs(io.StringIO(), "xml")
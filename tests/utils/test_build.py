@@ -0,0 +1,239 @@
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import osmnx
+import pytest
+
+from routor import models, weights
+from routor.compiled import CompiledGraph
+from routor.engine import Engine
+from routor.utils import build
+from routor.utils import graph as graph_utils
+
+# node id -> (latitude, longitude, tags)
+NODES = {
+    1: (51.0, -2.0, {}),
+    2: (51.001, -2.0, {"highway": "traffic_signals"}),
+    3: (51.002, -2.0, {}),
+    4: (51.002, -1.999, {"junction": "circular"}),
+    5: (51.001, -1.999, {}),
+    6: (51.003, -2.0, {}),
+    8: (51.01, -2.0, {}),
+    9: (51.011, -2.0, {}),
+}
+# way id -> (nodes, tags)
+WAYS = {
+    10: ([1, 2, 3], {"highway": "residential", "maxspeed": "20 mph"}),
+    11: ([3, 4, 5, 3], {"highway": "primary", "junction": "roundabout"}),
+    12: ([5, 2], {"highway": "residential", "oneway": "-1"}),
+    # not part of the network
+    13: ([3, 6], {"highway": "footway"}),
+    # node 7 is missing (outside of the extract)
+    14: ([1, 7], {"highway": "primary"}),
+    # not connected to the biggest network
+    15: ([8, 9], {"highway": "residential"}),
+}
+
+
+def write_xml(path: Path, nodes: Dict = NODES, ways: Dict = WAYS) -> Path:
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    for node_id, (latitude, longitude, tags) in nodes.items():
+        lines.append(f'<node id="{node_id}" lat="{latitude}" lon="{longitude}">')
+        lines.extend(f'<tag k="{key}" v="{value}"/>' for key, value in tags.items())
+        lines.append("</node>")
+    for way_id, (refs, tags) in ways.items():
+        lines.append(f'<way id="{way_id}">')
+        lines.extend(f'<nd ref="{ref}"/>' for ref in refs)
+        lines.extend(f'<tag k="{key}" v="{value}"/>' for key, value in tags.items())
+        lines.append("</way>")
+    lines.append("</osm>")
+    path.write_text("\n".join(lines))
+    return path
+
+
+def _varint(value: int) -> bytes:
+    data = bytearray()
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(field: int, value: bytes) -> bytes:
+    return _varint(field << 3 | 2) + _varint(len(value)) + value
+
+
+def _packed(values: List[int], signed: bool = False, delta: bool = False) -> bytes:
+    if delta:
+        values = [value - previous for previous, value in zip([0, *values], values)]
+    if signed:
+        values = [_zigzag(value) for value in values]
+    return b"".join(map(_varint, values))
+
+
+def _blob(blob_type: bytes, data: bytes) -> bytes:
+    blob = _varint(2 << 3) + _varint(len(data)) + _field(3, zlib.compress(data))
+    header = _field(1, blob_type) + _varint(3 << 3) + _varint(len(blob))
+    return struct.pack(">I", len(header)) + header + blob
+
+
+def write_pbf(path: Path) -> Path:
+    """
+    Write the test data as PBF file, nodes are stored as dense nodes.
+    """
+    strings: Dict[str, int] = {"": 0}
+
+    def string(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    keys_values: List[int] = []
+    for _, _, tags in NODES.values():
+        for key, value in tags.items():
+            keys_values.extend([string(key), string(value)])
+        keys_values.append(0)
+    coordinates: List[Tuple[int, int]] = [
+        (round(latitude * 1e7), round(longitude * 1e7))
+        for latitude, longitude, _ in NODES.values()
+    ]
+    dense = (
+        _field(1, _packed(list(NODES), signed=True, delta=True))
+        + _field(8, _packed([lat for lat, _ in coordinates], signed=True, delta=True))
+        + _field(9, _packed([lon for _, lon in coordinates], signed=True, delta=True))
+        + _field(10, _packed(keys_values))
+    )
+
+    ways = b""
+    for way_id, (refs, tags) in WAYS.items():
+        way = (
+            _varint(1 << 3)
+            + _varint(way_id)
+            + _field(2, _packed([string(key) for key in tags]))
+            + _field(3, _packed([string(value) for value in tags.values()]))
+            + _field(8, _packed(refs, signed=True, delta=True))
+        )
+        ways += _field(3, way)
+
+    string_table = b"".join(_field(1, value.encode()) for value in strings)
+    block = _field(1, string_table) + _field(2, _field(2, dense)) + _field(2, ways)
+    path.write_bytes(
+        _blob(b"OSMHeader", _field(4, b"OsmSchema-V0.6")) + _blob(b"OSMData", block)
+    )
+    return path
+
+
+@pytest.fixture(params=("xml", "pbf"))
+def osm_files(request: pytest.FixtureRequest, tmp_path: Path) -> Path:
+    """
+    Return the test extract as OSM XML and PBF file.
+    """
+    if request.param == "pbf":
+        return write_pbf(tmp_path / "map.osm.pbf")
+    return write_xml(tmp_path / "map.osm")
+
+
+def test_build_map(osm_files: Path) -> None:
+    """
+    Make sure ways are split into edges between consecutive nodes.
+    """
+    graph = build.build_map(osm_files)
+
+    assert graph.node_ids.tolist() == [1, 2, 3, 4, 5]
+    edges = {
+        (graph.node_ids[start], graph.node_ids[end]): graph.edge_attributes(edge)
+        for edge, (start, end) in enumerate(zip(graph.sources, graph.targets))
+    }
+    assert set(edges) == {
+        # two-way street
+        (1, 2),
+        (2, 1),
+        (2, 3),
+        (3, 2),
+        # roundabout
+        (3, 4),
+        (4, 5),
+        (5, 3),
+        # reversed one-way street
+        (2, 5),
+    }
+    assert edges[(1, 2)]["osmid"] == 10
+    assert edges[(1, 2)]["oneway"] is False
+    assert edges[(2, 5)]["oneway"] is True
+    assert edges[(1, 2)]["speed_kph"] == round(20 * graph_utils.MPH_TO_KPH, 1)
+    # mean speed of the residential streets
+    assert edges[(2, 5)]["speed_kph"] == round(20 * graph_utils.MPH_TO_KPH, 1)
+    assert edges[(3, 4)]["speed_kph"] == graph_utils.FALLBACK_SPEED
+    assert edges[(1, 2)]["length"] == pytest.approx(111.2, abs=0.1)
+    assert edges[(1, 2)]["bearing"] == 0.0
+    assert edges[(1, 2)]["travel_time"] == round(
+        edges[(1, 2)]["length"] / (edges[(1, 2)]["speed_kph"] / 3.6), 1
+    )
+
+    nodes = {
+        node_id: graph.node_attributes(index)
+        for index, node_id in enumerate(graph.node_ids.tolist())
+    }
+    assert nodes[2]["highway"] == "traffic_signals"
+    assert nodes[2]["street_count"] == 3
+    assert nodes[3]["junction"] == "roundabout"
+    assert nodes[4]["junction"] == "circular"
+    assert "junction" not in nodes[1]
+
+
+def test_build_map__same_as_download(osm_file: Path) -> None:
+    """
+    Make sure the map has the same attributes as maps created by osmnx.
+    """
+    with graph_utils.osmnx_config([], []):
+        expected_graph = osmnx.utils_graph.get_largest_component(
+            osmnx.graph_from_xml(str(osm_file), simplify=False)
+        )
+    graph_utils.enhance_map(expected_graph)
+    expected = CompiledGraph.from_graph(expected_graph)
+
+    graph = build.build_map(osm_file)
+    assert sorted(graph.node_ids.tolist()) == sorted(expected.node_ids.tolist())
+    for index, node_id in enumerate(graph.node_ids.tolist()):
+        expected_index = expected.index_of(node_id)
+        assert graph.node_data["street_count"][index] == (
+            expected.node_data["street_count"][expected_index]
+        )
+
+    assert graph.edge_count == expected.edge_count
+    for edge in range(graph.edge_count):
+        start, end = graph.sources[edge], graph.targets[edge]
+        expected_edge = expected.edge_index(
+            expected.index_of(graph.node_ids[start]),
+            expected.index_of(graph.node_ids[end]),
+        )
+        for attribute in ("osmid", "length", "bearing", "speed_kph", "travel_time"):
+            assert graph.edge_data[attribute][edge] == pytest.approx(
+                expected.edge_data[attribute][expected_edge]
+            ), attribute
+
+
+def test_build_map__routing(tmp_path: Path, osm_files: Path) -> None:
+    """
+    Make sure the engine can route on a built map.
+    """
+    map_path = tmp_path / "map.npz"
+    build.build_map(osm_files).save(map_path)
+    engine = Engine(map_path)
+
+    route = engine.route(
+        models.Location(latitude=51.0, longitude=-2.0),
+        models.Location(latitude=51.001, longitude=-1.999),
+        weights.length,
+        weights.travel_time,
+    )
+    assert [(location.latitude, location.longitude) for location in route.path] == [
+        (51.0, -2.0),
+        (51.001, -2.0),
+        (51.001, -1.999),
+    ]
@@ -1,9 +1,11 @@
 from pathlib import Path
 
 import networkx
+import numpy
 import osmnx
 import pytest
 
+from routor.compiled import CompiledGraph
 from routor.utils import graph as graph_utils
 
 
@@ -17,6 +19,52 @@ def test_load_map(graph_path: Path, graph: networkx.Graph) -> None:
     assert list(graph.edges) == list(expected_graph.edges)
 
 
+def test_load_map__compiled(compiled_graph_path: Path, graph: networkx.Graph) -> None:
+    """
+    Make sure a compiled map is loaded unchanged.
+    """
+    expected_graph = graph
+    graph = graph_utils.load_map(compiled_graph_path)
+    assert list(graph.nodes) == list(expected_graph.nodes)
+    assert list(graph.edges) == list(expected_graph.edges)
+
+
+@pytest.mark.parametrize("suffix", (".graphml", ".npz"))
+def test_load_compiled_map(tmp_path: Path, graph: networkx.Graph, suffix: str) -> None:
+    """
+    Make sure both formats can be loaded as compiled graph.
+    """
+    path = tmp_path / f"map{suffix}"
+    graph_utils.save_map(graph, path)
+
+    compiled_graph = graph_utils.load_compiled_map(path)
+    assert isinstance(compiled_graph, CompiledGraph)
+    assert compiled_graph.node_ids.tolist() == list(graph.nodes)
+    assert compiled_graph.edge_count == len(graph.edges)
+
+
+def test_load_compiled_map__mmap(compiled_graph_path: Path, graph_path: Path) -> None:
+    """
+    Only compiled maps are memory mapped.
+    """
+    compiled_graph = graph_utils.load_compiled_map(compiled_graph_path, mmap=True)
+    assert isinstance(compiled_graph.targets, numpy.memmap)
+
+    compiled_graph = graph_utils.load_compiled_map(graph_path, mmap=True)
+    assert not isinstance(compiled_graph.targets, numpy.memmap)
+
+
+def test_save_map__compiled(tmp_path: Path, graph: networkx.Graph) -> None:
+    """
+    Make sure the target format is derived from the suffix.
+    """
+    path = tmp_path / "map.npz"
+    graph_utils.save_map(graph, path)
+
+    compiled_graph = CompiledGraph.load(path)
+    assert compiled_graph.node_count == len(graph.nodes)
+
+
 def test_tag_roundabout_nodes() -> None:
     """
     Make sure nodes are tagged as roundabout as well.
@@ -63,6 +111,79 @@ def test_tag_roundabout_nodes__keep_circular() -> None:
     assert graph.nodes[3] == {"junction": "circular"}
 
 
+@pytest.mark.parametrize(
+    "value, expected",
+    (
+        ("50", 50.0),
+        ("20 mph", 20 * graph_utils.MPH_TO_KPH),
+        (["30", "50"], 40.0),
+        ("none", None),
+        (None, None),
+    ),
+)
+def test_parse_maxspeed(value: object, expected: float) -> None:
+    speed = graph_utils.parse_maxspeed(value)
+    if expected is None:
+        assert numpy.isnan(speed)
+    else:
+        assert speed == pytest.approx(expected)
+
+
+def test_edge_speeds() -> None:
+    """
+    Missing speeds are the mean speed of the same highway type.
+    """
+    speeds = graph_utils.edge_speeds(
+        numpy.array(["primary", "primary", "primary", "residential"], dtype=object),
+        numpy.array(["50", "70", None, None], dtype=object),
+    )
+    assert speeds.tolist() == [50.0, 70.0, 60.0, graph_utils.FALLBACK_SPEED]
+
+
+def test_enhance_map(osm_file: Path) -> None:
+    """
+    Make sure the attributes are the same as calculated by osmnx.
+    """
+    with graph_utils.osmnx_config([], []):
+        graph = osmnx.graph_from_xml(str(osm_file), simplify=False)
+    expected = graph.copy()
+    osmnx.add_edge_bearings(expected)
+    osmnx.add_edge_speeds(expected, fallback=graph_utils.FALLBACK_SPEED)
+    osmnx.add_edge_travel_times(expected)
+    street_counts = osmnx.utils_graph.count_streets_per_node(expected)
+
+    graph_utils.enhance_map(graph)
+
+    for node, data in graph.nodes(data=True):
+        assert data["street_count"] == street_counts[node]
+    for start, end, key, data in graph.edges(keys=True, data=True):
+        expected_data = expected.edges[start, end, key]
+        for attribute in ("length", "bearing", "speed_kph", "travel_time"):
+            assert data[attribute] == pytest.approx(expected_data[attribute])
+
+
+def test_enhance_compiled_map(graph: networkx.Graph) -> None:
+    """
+    Make sure compiled maps are enhanced the same as networkx graphs.
+    """
+    compiled_graph = CompiledGraph.from_graph(graph)
+    for attribute in ("bearing", "speed_kph", "travel_time"):
+        del compiled_graph.edge_data[attribute]
+    del compiled_graph.node_data["street_count"]
+
+    graph_utils.enhance_compiled_map(compiled_graph)
+
+    graph_utils.enhance_map(graph)
+    expected = CompiledGraph.from_graph(graph)
+    assert compiled_graph.node_data["street_count"].tolist() == (
+        expected.node_data["street_count"].tolist()
+    )
+    for attribute in ("bearing", "speed_kph", "travel_time"):
+        assert compiled_graph.edge_data[attribute] == pytest.approx(
+            expected.edge_data[attribute], nan_ok=True
+        ), attribute
+
+
 @pytest.mark.default_cassette("download_nailsea.yaml")
 @pytest.mark.vcr
 def test_download_map() -> None:
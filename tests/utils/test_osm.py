@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import numpy
+
+from routor.utils import osm
+
+from .test_build import _packed
+from .test_update import write_osc
+
+
+def test_packed() -> None:
+    """
+    Make sure short and long packed fields are decoded the same way.
+    """
+    values = [0, 1, 127, 128, 300, 2**35, 2**63 - 1] * 50
+    buffer = _packed(values)
+    assert len(buffer) >= osm.PACKED_NUMPY_SIZE
+    assert osm._packed(buffer).tolist() == values
+    assert osm._packed(_packed(values[:7])).tolist() == values[:7]
+
+
+def test_packed_sint() -> None:
+    """
+    Make sure signed, delta encoded values are restored.
+    """
+    values = [5, -3, 2**40, -(2**40), 0] * 60
+    for count in (5, len(values)):
+        buffer = _packed(values[:count], signed=True, delta=True)
+        decoded = osm._packed_sint(buffer, delta=True)
+        assert numpy.array_equal(decoded, values[:count])
+
+
+def test_read_change(tmp_path: Path) -> None:
+    """
+    Make sure the action of each changed element is returned.
+    """
+    path = write_osc(
+        tmp_path / "change.osc",
+        [
+            ("modify", '<node id="1" lat="51.0" lon="-2.0"><tag k="a" v="b"/></node>'),
+            ("create", '<way id="2"><nd ref="1"/><nd ref="3"/></way>'),
+            ("delete", '<node id="3"/>'),
+        ],
+    )
+    changes = list(osm.read_change(path))
+
+    assert [(action, type(element)) for action, element in changes] == [
+        ("modify", osm.Node),
+        ("create", osm.Way),
+        ("delete", osm.Node),
+    ]
+    assert changes[0][1][1:] == (51.0, -2.0, {"a": "b"})
+    assert changes[1][1].refs.tolist() == [1, 3]
+    assert numpy.isnan(changes[2][1].latitude)
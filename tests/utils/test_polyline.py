@@ -0,0 +1,29 @@
+from routor.utils import polyline
+
+
+def test_encode() -> None:
+    """
+    Make sure the example of the format specification is encoded correctly.
+    """
+    latitudes = [38.5, 40.7, 43.252]
+    longitudes = [-120.2, -120.95, -126.453]
+    assert polyline.encode(latitudes, longitudes) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_encode__empty() -> None:
+    """
+    An empty path results in an empty polyline.
+    """
+    assert polyline.encode([], []) == ""
+    assert polyline.decode("") == []
+
+
+def test_decode() -> None:
+    """
+    Make sure decoding restores the rounded coordinates.
+    """
+    coordinates = [(51.4545141, -2.5879103), (51.45, -2.59), (-33.8688, 151.2093)]
+    encoded = polyline.encode(*zip(*coordinates), precision=6)
+    assert polyline.decode(encoded, precision=6) == [
+        (round(latitude, 6), round(longitude, 6)) for latitude, longitude in coordinates
+    ]
@@ -0,0 +1,178 @@
+import os
+from pathlib import Path
+from typing import Any
+
+import osmnx
+import pytest
+from networkx import MultiDiGraph
+from shapely.geometry import box
+
+from routor.utils import tiles
+
+from .test_build import WAYS, write_xml
+
+
+def test_split_into_tiles() -> None:
+    """
+    Make sure tiles are aligned to the grid and cover the area.
+    """
+    area = box(0.05, 0.05, 0.25, 0.15)
+    result = tiles.split_into_tiles(area, 0.1)
+    assert [tile.bounds for tile in result] == [
+        (0.05, 0.05, 0.1, 0.1),
+        (0.1, 0.05, 0.2, 0.1),
+        (0.2, 0.05, 0.25, 0.1),
+        (0.05, 0.1, 0.1, 0.15),
+        (0.1, 0.1, 0.2, 0.15),
+        (0.2, 0.1, 0.25, 0.15),
+    ]
+    assert sum(tile.area for tile in result) == pytest.approx(area.area)
+
+
+@pytest.mark.parametrize("processes", (1, 2))
+def test_download_tiled_map(tmp_path: Path, osm_file: Path, processes: int) -> None:
+    """
+    Make sure the stitched tiles result in the same map as a single download.
+    """
+    graph = tiles.download_tiled_map(
+        [],
+        tile_size=0.004,
+        cache_dir=tmp_path / "tiles",
+        processes=processes,
+        osm_file=osm_file,
+    )
+    assert len(list((tmp_path / "tiles").glob("*.graphml"))) > 1
+
+    expected_graph = osmnx.utils_graph.get_largest_component(
+        osmnx.graph_from_xml(str(osm_file), simplify=False)
+    )
+    assert set(graph.edges) == set(expected_graph.edges)
+    assert all("travel_time" in data for _, _, data in graph.edges(data=True))
+    assert all("street_count" in data for _, data in graph.nodes(data=True))
+
+
+def test_download_tiled_map__drivable(tmp_path: Path) -> None:
+    """
+    Make sure streets of local OSM files are filtered as downloaded ones.
+    """
+    # osmnx fails on missing nodes
+    ways = {way: value for way, value in WAYS.items() if way != 14}
+    ways[16] = ([5, 6], {"highway": "primary", "motor_vehicle": "no"})
+    osm_file = write_xml(tmp_path / "map.osm", ways=ways)
+    graph = tiles.download_tiled_map(
+        [],
+        tile_size=0.004,
+        cache_dir=tmp_path / "tiles",
+        processes=1,
+        osm_file=osm_file,
+    )
+    assert set(graph.nodes) == {1, 2, 3, 4, 5}
+    assert all("motor_vehicle" not in data for _, _, data in graph.edges(data=True))
+
+
+def test_download_tiled_map__speeds(tmp_path: Path) -> None:
+    """
+    Make sure missing speeds are the mean of the whole map, not of single tiles.
+    """
+    nodes = {
+        1: (51.001, -2.001, {}),
+        2: (51.0015, -2.0015, {}),
+        3: (51.005, -2.002, {}),
+        4: (51.009, -2.0015, {}),
+        5: (51.0095, -2.001, {}),
+    }
+    ways = {
+        10: ([1, 2], {"highway": "residential", "maxspeed": "20 mph"}),
+        11: ([2, 3, 4], {"highway": "primary"}),
+        # within another tile than the residential street with a maxspeed
+        12: ([4, 5], {"highway": "residential"}),
+    }
+    osm_file = write_xml(tmp_path / "map.osm", nodes, ways)
+    graph = tiles.download_tiled_map(
+        [],
+        tile_size=0.004,
+        cache_dir=tmp_path / "tiles",
+        processes=1,
+        osm_file=osm_file,
+    )
+    assert graph.edges[4, 5, 0]["speed_kph"] == graph.edges[1, 2, 0]["speed_kph"]
+
+
+def test_download_tiled_map__load_once(
+    tmp_path: Path, osm_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Make sure workers do not parse the OSM file again.
+    """
+    log = tmp_path / "loaded.log"
+    graph_from_xml = osmnx.graph_from_xml
+
+    def logged_graph_from_xml(*args: Any, **kwargs: Any) -> MultiDiGraph:
+        with open(log, "a") as file:
+            file.write(f"{os.getpid()}\n")
+        return graph_from_xml(*args, **kwargs)
+
+    monkeypatch.setattr(osmnx, "graph_from_xml", logged_graph_from_xml)
+    tiles.download_tiled_map(
+        [],
+        tile_size=0.004,
+        cache_dir=tmp_path / "tiles",
+        processes=2,
+        osm_file=osm_file,
+        overpass_endpoint="http://localhost/api",
+    )
+    assert log.read_text().splitlines() == [str(os.getpid())]
+    # the endpoint is only used for the download
+    assert osmnx.settings.overpass_endpoint != "http://localhost/api"
+
+
+def test_download_tiled_map__resume(
+    tmp_path: Path, osm_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Cached tiles are not downloaded again.
+    """
+    options = {"tile_size": 0.004, "cache_dir": tmp_path / "tiles", "processes": 1}
+    graph = tiles.download_tiled_map([], osm_file=osm_file, **options)
+
+    def fail(task: tiles.TileTask) -> Path:
+        raise AssertionError("Tile was downloaded again")
+
+    monkeypatch.setattr(tiles, "download_tile", fail)
+    cached_graph = tiles.download_tiled_map([], osm_file=osm_file, **options)
+    assert set(cached_graph.edges) == set(graph.edges)
+
+
+@pytest.mark.parametrize(
+    "error, cached",
+    ((ValueError(tiles.NO_NODES_ERROR), True), (ValueError("Invalid polygon"), False)),
+)
+def test_tile_errors(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    error: ValueError,
+    cached: bool,
+) -> None:
+    """
+    Only tiles without streets are cached empty, other errors are raised.
+    """
+
+    def fail(task: tiles.TileTask) -> None:
+        raise error
+
+    monkeypatch.setattr(tiles, "_fetch_tile", fail)
+    task = tiles.TileTask(box(0, 0, 1, 1), tmp_path / "tile.graphml", [], [])
+    if cached:
+        tiles.download_tile(task)
+    else:
+        with pytest.raises(ValueError):
+            tiles.download_tile(task)
+    assert task.path.exists() == cached
+
+
+def test_download_tiled_map__no_area() -> None:
+    """
+    Either locations or an OSM file are required.
+    """
+    with pytest.raises(ValueError):
+        tiles.download_tiled_map([])
@@ -0,0 +1,195 @@
+import io
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy
+import pytest
+
+from routor import weights
+from routor.compiled import CompiledGraph
+from routor.engine import Engine
+from routor.utils import build
+from routor.utils import graph as graph_utils
+from routor.utils import update
+
+from .test_build import NODES, WAYS, write_xml
+
+
+def write_osc(path: Path, changes: List[Tuple[str, str]]) -> Path:
+    """
+    Write an osmChange file, changes are given as action and XML element.
+    """
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osmChange version="0.6">']
+    for action, element in changes:
+        lines.extend([f"<{action}>", element, f"</{action}>"])
+    lines.append("</osmChange>")
+    path.write_text("\n".join(lines))
+    return path
+
+
+def _edges(graph: CompiledGraph) -> Dict[Tuple[int, int], Dict]:
+    return {
+        (graph.node_ids[start], graph.node_ids[end]): graph.edge_attributes(edge)
+        for edge, (start, end) in enumerate(zip(graph.sources, graph.targets))
+    }
+
+
+def _edge(graph: CompiledGraph, edge: int) -> Tuple[int, int]:
+    return graph.node_ids[graph.sources[edge]], graph.node_ids[graph.targets[edge]]
+
+
+def test_read_edge_changes__missing_columns() -> None:
+    with pytest.raises(ValueError):
+        list(update.read_edge_changes(io.StringIO("start,maxspeed\n1,30\n")))
+
+
+def test_apply_edge_changes(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure speeds and travel times are recalculated for changed maxspeeds.
+    """
+    start, end = _edge(compiled_graph, 0)
+    rows = update.read_edge_changes(
+        io.StringIO(f"start,end,maxspeed\n{start},{end},20 mph\n1,2,30\n")
+    )
+    edges = update.apply_edge_changes(compiled_graph, rows)
+
+    # the second edge does not exist
+    assert edges.tolist() == [0]
+    data = compiled_graph.edge_attributes(0)
+    assert data["maxspeed"] == "20 mph"
+    assert data["speed_kph"] == round(20 * graph_utils.MPH_TO_KPH, 1)
+    assert data["travel_time"] == round(data["length"] / (data["speed_kph"] / 3.6), 1)
+
+
+def test_apply_edge_changes__way(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure all edges of a way are changed.
+    """
+    osmid = compiled_graph.edge_data["osmid"][0]
+    speeds = compiled_graph.edge_data["speed_kph"].copy()
+    rows = update.read_edge_changes(io.StringIO(f"osmid,travel_time\n{osmid},1000\n"))
+    edges = update.apply_edge_changes(compiled_graph, rows)
+
+    expected = numpy.flatnonzero(compiled_graph.edge_data["osmid"] == osmid)
+    assert edges.tolist() == expected.tolist()
+    assert set(compiled_graph.edge_data["travel_time"][edges]) == {1000.0}
+    assert numpy.array_equal(compiled_graph.edge_data["speed_kph"], speeds)
+
+
+def test_apply_edge_changes__mixed_columns(compiled_graph: CompiledGraph) -> None:
+    """
+    Make sure speeds and travel times are recalculated per edge and empty costs
+    are kept.
+    """
+    (start, end), (other_start, other_end) = (
+        _edge(compiled_graph, 0),
+        _edge(compiled_graph, 1),
+    )
+    rows = update.read_edge_changes(
+        io.StringIO(
+            "start,end,maxspeed,travel_time\n"
+            f"{start},{end},5,\n"
+            f"{other_start},{other_end},,99\n"
+        )
+    )
+    update.apply_edge_changes(compiled_graph, rows)
+
+    data = compiled_graph.edge_attributes(0)
+    assert data["speed_kph"] == 5
+    assert data["travel_time"] == round(data["length"] / (5 / 3.6), 1)
+    data = compiled_graph.edge_attributes(1)
+    # the removed maxspeed changes the speed, but not the given travel time
+    assert data["travel_time"] == 99
+    assert "maxspeed" not in data
+    assert not numpy.isnan(data["speed_kph"])
+    assert not numpy.isnan(compiled_graph.edge_data["travel_time"]).any()
+
+
+def test_apply_osm_change(tmp_path: Path) -> None:
+    """
+    Make sure the updated map is the same as a map built from the changed extract.
+    """
+    graph = build.build_map(write_xml(tmp_path / "map.osm"))
+    change = write_osc(
+        tmp_path / "change.osc",
+        [
+            ("modify", '<node id="5" lat="51.0015" lon="-1.999"/>'),
+            ("create", '<node id="20" lat="51.0" lon="-1.998"/>'),
+            ("delete", '<way id="12"/>'),
+            (
+                "create",
+                '<way id="16"><nd ref="5"/><nd ref="1"/>'
+                '<tag k="highway" v="residential"/></way>',
+            ),
+            (
+                "create",
+                '<way id="17"><nd ref="5"/><nd ref="20"/>'
+                '<tag k="highway" v="primary"/><tag k="maxspeed" v="40"/></way>',
+            ),
+        ],
+    )
+    updated = update.apply_osm_change(graph, change)
+
+    nodes = {**NODES, 5: (51.0015, -1.999, {}), 20: (51.0, -1.998, {})}
+    ways = {key: value for key, value in WAYS.items() if key != 12}
+    ways[16] = ([5, 1], {"highway": "residential"})
+    ways[17] = ([5, 20], {"highway": "primary", "maxspeed": "40"})
+    expected = build.build_map(write_xml(tmp_path / "changed.osm", nodes, ways))
+
+    assert updated.node_ids.tolist() == expected.node_ids.tolist()
+    for attribute in ("y", "x", "street_count", "junction"):
+        assert updated.node_data[attribute].tolist() == (
+            expected.node_data[attribute].tolist()
+        )
+    edges, expected_edges = _edges(updated), _edges(expected)
+    assert set(edges) == set(expected_edges)
+    for edge, data in edges.items():
+        for attribute in ("osmid", "oneway", "length", "bearing", "speed_kph"):
+            assert data[attribute] == pytest.approx(
+                expected_edges[edge][attribute], nan_ok=True
+            ), (edge, attribute)
+
+
+def test_apply_osm_change__missing_nodes(tmp_path: Path) -> None:
+    """
+    Edges to nodes, which are neither part of the map nor of the change, are skipped.
+    """
+    graph = build.build_map(write_xml(tmp_path / "map.osm"))
+    change = write_osc(
+        tmp_path / "change.osc",
+        [
+            (
+                "modify",
+                '<way id="13"><nd ref="3"/><nd ref="6"/>'
+                '<tag k="highway" v="residential"/></way>',
+            )
+        ],
+    )
+    updated = update.apply_osm_change(graph, change)
+    assert updated.node_ids.tolist() == graph.node_ids.tolist()
+    assert updated.edge_count == graph.edge_count
+
+
+def test_update_map__preprocessed(tmp_path: Path, compiled_graph_path: Path) -> None:
+    """
+    Make sure only outdated hierarchies and landmarks are rebuilt.
+    """
+    engine = Engine(compiled_graph_path)
+    for weight in (weights.length, weights.travel_time):
+        engine.build_hierarchy(weight)
+    engine.build_landmarks(weights.travel_time, 2)
+
+    start, end = _edge(engine.graph, 0)
+    changes = tmp_path / "changes.csv"
+    changes.write_text(f"start,end,speed_kph\n{start},{end},5\n")
+    update.update_map(compiled_graph_path, changes)
+
+    engine = Engine(compiled_graph_path)
+    assert engine.graph.edge_attributes(0)["speed_kph"] == 5
+    assert "updated_date" in engine.graph.graph_data
+    for weight in (weights.length, weights.travel_time):
+        assert engine.hierarchy(weight) is not None
+    landmarks = engine.landmarks(weights.travel_time)
+    assert landmarks is not None
+    assert len(landmarks.landmarks) == 2
+    assert not list(tmp_path.glob("tmp*"))